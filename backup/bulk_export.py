@@ -0,0 +1,212 @@
+import csv
+import json
+import os
+import shutil
+import tempfile
+import time
+from collections import OrderedDict, defaultdict
+from itertools import islice
+from zipfile import ZipFile, ZIP_STORED
+
+from django.contrib.auth.models import User
+from django.core.serializers.json import DjangoJSONEncoder
+from django.core.serializers.python import Serializer
+from django.db import transaction
+from django.db.models import prefetch_related_objects
+from django.http import FileResponse
+
+from backup.compression import write_archives
+from backup.export import get_temp_dir, serialize_archived_messages
+from backup.settings import (
+    ORDERED_QS_NAME_LIST_TO_UNPACK,
+    CHATROOM_QS_NAME,
+    CHAT_MESSAGE_QS_NAME,
+    TASK_QS_NAME,
+    TASK_MESSAGE_QS_NAME,
+    TASK_ATTACHMENT_QS_NAME,
+    MODEL_DICT,
+    SERIALIZE_OPTIONS,
+    BULK_EXPORT_CHUNK_SIZE,
+    BULK_EXPORT_OPEN_FILES,
+)
+from chat.models import ArchivedChatMessageBatch
+from tasktracker.settings import MEDIA_ROOT
+
+
+def get_shard_querysets():
+    """
+    All users' instances of each model ordered by owner, with lookups to prefetch and func returning ids of the users
+    whose backups get the instance (the same as the user's export gets, watch export.json_loads_backup_to_dict)
+    """
+    return {
+        CHATROOM_QS_NAME: (
+            MODEL_DICT[CHATROOM_QS_NAME].objects.order_by('owner_id', 'id'), ('member',),
+            lambda room: (room.owner_id,)),
+        CHAT_MESSAGE_QS_NAME: (
+            MODEL_DICT[CHAT_MESSAGE_QS_NAME].objects.select_related('owner', 'room').order_by('owner_id', 'id'), (),
+            lambda message: {message.owner_id} - {None}),
+        TASK_QS_NAME: (
+            MODEL_DICT[TASK_QS_NAME].objects.order_by('owner_id', 'id'), (),
+            lambda task: {task.owner_id, task.assignee_id} - {None}),
+        TASK_MESSAGE_QS_NAME: (
+            MODEL_DICT[TASK_MESSAGE_QS_NAME].objects.select_related('owner', 'task').order_by('task__owner_id', 'id'),
+            (), lambda message: {message.task.owner_id, message.task.assignee_id} - {None}),
+        TASK_ATTACHMENT_QS_NAME: (
+            MODEL_DICT[TASK_ATTACHMENT_QS_NAME].objects.select_related('owner', 'task').order_by('task__owner_id',
+                                                                                                 'id'),
+            (), lambda attachment: {attachment.task.owner_id, attachment.task.assignee_id} - {None}),
+    }
+
+
+def iterate_chunks(queryset, prefetch_lookups=(), chunk_size=BULK_EXPORT_CHUNK_SIZE):
+    """
+    Read queryset with one query, fetching chunk_size rows at a time, and prefetch lookups for each chunk
+    (iterator() ignores prefetch_related). Unlike slices, rows are neither skipped nor repeated
+    when other rows are added or deleted meanwhile, and there is no OFFSET to scan through
+    """
+    rows = queryset.iterator(chunk_size=chunk_size)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return
+        prefetch_related_objects(chunk, *prefetch_lookups)
+        yield chunk
+
+
+class PrefetchedSerializer(Serializer):
+    """
+    Python serializer, which reads many to many values from prefetch_related cache instead of query per instance
+    """
+
+    def handle_m2m_field(self, obj, field):
+        if not field.remote_field.through._meta.auto_created:
+            return
+        if self.use_natural_foreign_keys and hasattr(field.remote_field.model, 'natural_key'):
+            self._current[field.name] = [related.natural_key() for related in getattr(obj, field.name).all()]
+        else:
+            self._current[field.name] = [self._value_from_field(related, related._meta.pk)
+                                         for related in getattr(obj, field.name).all()]
+
+
+def serialize_chunk(qs_name, chunk):
+    # the same values as "json" serializer gives to user's export
+    data = PrefetchedSerializer().serialize(chunk, **SERIALIZE_OPTIONS[qs_name])
+    return json.loads(json.dumps(data, cls=DjangoJSONEncoder))
+
+
+class ShardWriters:
+    """
+    CSV writers of one model's files in users' shard directories (dirpath/<user id>/<qs_name>).
+    Least recently used files are closed when there are more than max_open of them and reopened to append
+    """
+
+    def __init__(self, dirpath, qs_name, max_open=BULK_EXPORT_OPEN_FILES):
+        self.dirpath = dirpath
+        self.qs_name = qs_name
+        self.max_open = max_open
+        self.files = OrderedDict()
+
+    def get_writer(self, user_id, fieldnames):
+        if user_id in self.files:
+            self.files.move_to_end(user_id)
+            return self.files[user_id][1]
+
+        os.makedirs(os.path.join(self.dirpath, str(user_id)), exist_ok=True)
+        filepath = os.path.join(self.dirpath, str(user_id), self.qs_name)
+        is_new = not os.path.exists(filepath)
+        csv_file = open(filepath, 'a', newline='')
+        writer = csv.DictWriter(csv_file, fieldnames=fieldnames)
+        if is_new:
+            writer.writeheader()
+
+        self.files[user_id] = (csv_file, writer)
+        if len(self.files) > self.max_open:
+            _, (least_used_file, _) = self.files.popitem(last=False)
+            least_used_file.close()
+        return writer
+
+    def write(self, user_id, fields):
+        self.get_writer(user_id, fields.keys()).writerow(fields)
+
+    def close(self):
+        for csv_file, _ in self.files.values():
+            csv_file.close()
+        self.files.clear()
+
+
+def write_shards(dirpath):
+    """
+    Write all users' data to users' shard directories in one pass over each model, in one transaction:
+    with SQLite (and PostgreSQL's repeatable read) all models are read from the same snapshot.
+    Return {user id: names of attachment files}
+    """
+    attachment_files = defaultdict(set)
+    with transaction.atomic():
+        for qs_name, (queryset, prefetch_lookups, get_user_ids) in get_shard_querysets().items():
+            writers = ShardWriters(dirpath, qs_name)
+            try:
+                for chunk in iterate_chunks(queryset, prefetch_lookups):
+                    for instance, data in zip(chunk, serialize_chunk(qs_name, chunk)):
+                        for user_id in get_user_ids(instance):
+                            writers.write(user_id, data['fields'])
+                            if qs_name == TASK_ATTACHMENT_QS_NAME:
+                                attachment_files[user_id].add(data['fields']['file'])
+            finally:
+                writers.close()
+
+        # archived chat messages are appended to the users' messages
+        writers = ShardWriters(dirpath, CHAT_MESSAGE_QS_NAME)
+        try:
+            for owner_id, data in serialize_archived_messages(
+                    ArchivedChatMessageBatch.objects.select_related('room').iterator()):
+                if owner_id is not None:
+                    writers.write(owner_id, data['fields'])
+        finally:
+            writers.close()
+    return attachment_files
+
+
+def export_all_users(dirpath):
+    """
+    Write backup archive of each user, who has any data, to dirpath. Return paths of the archives
+    """
+    shards_path = tempfile.mkdtemp(dir=dirpath)
+    archives = []
+    try:
+        attachment_files = write_shards(shards_path)
+
+        user_ids = [int(user_id) for user_id in os.listdir(shards_path)]
+        for user in User.objects.filter(id__in=user_ids).order_by('id'):
+            user_path = os.path.join(shards_path, str(user.id))
+            # file of empty queryset is written too: import expects all of the backup's files
+            for qs_name in ORDERED_QS_NAME_LIST_TO_UNPACK:
+                open(os.path.join(user_path, qs_name), 'a').close()
+
+            archives.append((os.path.join(dirpath, f"{user.id}-{user.username}.zip"),
+                             [(os.path.join(user_path, qs_name), qs_name)
+                              for qs_name in ORDERED_QS_NAME_LIST_TO_UNPACK]
+                             + [(os.path.join(MEDIA_ROOT, filename), filename)
+                                for filename in sorted(attachment_files[user.id])]))
+        write_archives(archives)
+    finally:
+        shutil.rmtree(shards_path)
+    return [zip_name for zip_name, _ in archives]
+
+
+def export_all(request):
+    temp_dir = get_temp_dir()
+    try:
+        archives = export_all_users(temp_dir)
+
+        # users' archives are compressed already
+        site_backup = tempfile.TemporaryFile()
+        with ZipFile(site_backup, 'w', compression=ZIP_STORED) as zipper:
+            for zip_name in archives:
+                zipper.write(filename=zip_name, arcname=os.path.basename(zip_name))
+    finally:
+        shutil.rmtree(temp_dir)
+
+    site_backup.seek(0)
+    # temporary file is closed (and removed) by the response when it is sent
+    return FileResponse(site_backup, as_attachment=True, filename=time.strftime("all-%Y%m%d-%H%M%S") + '.zip',
+                        content_type='application/zip')
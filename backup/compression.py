@@ -0,0 +1,202 @@
+import os
+import shutil
+import struct
+import tempfile
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from zipfile import ZipInfo, ZIP_DEFLATED, ZIP_STORED
+
+from backup.settings import INCOMPRESSIBLE_EXTENSIONS, EXPORT_COMPRESS_WORKERS
+
+"""
+zipfile writes entries one by one, each through its own compressor, so it can't use several cores for one archive.
+Here entries are deflated (to temporary files) in a thread pool, zlib releases GIL, then they are copied
+to the archive in the given order, with local headers, central directory and zip64 records of the zip format
+(https://pkware.cachefly.net/webdocs/casestudies/APPNOTE.TXT), the archive is read by zipfile as usual
+"""
+# beginning of the file, which is deflated to find out if the whole file is worth deflating
+SAMPLE_SIZE = 64 * 1024
+CHUNK_SIZE = 1024 * 1024
+
+# sizes, offsets and count of entries over these limits are written to zip64 records,
+# usual records get the placeholders instead
+ZIP64_LIMIT = 0xFFFFFFFF
+ZIP64_COUNT_LIMIT = 0xFFFF
+ZIP64_PLACEHOLDER = 0xFFFFFFFF
+ZIP64_COUNT_PLACEHOLDER = 0xFFFF
+ZIP_VERSION = 20
+ZIP64_VERSION = 45
+# general purpose flag: file name is UTF-8
+UTF8_FLAG = 0x800
+
+LOCAL_HEADER = struct.Struct("<4s2B4HL2L2H")
+CENTRAL_HEADER = struct.Struct("<4s4B4HL2L5H2L")
+END_OF_CENTRAL_DIRECTORY = struct.Struct("<4s4H2LH")
+ZIP64_END_OF_CENTRAL_DIRECTORY = struct.Struct("<4sQ2H2L4Q")
+ZIP64_LOCATOR = struct.Struct("<4sLQL")
+
+
+def is_compressible(filename):
+    if os.path.splitext(filename)[1].lower() in INCOMPRESSIBLE_EXTENSIONS:
+        return False
+
+    with open(filename, 'rb') as file:
+        sample = file.read(SAMPLE_SIZE)
+    return len(zlib.compress(sample, 1)) < 0.9 * len(sample)
+
+
+class Entry:
+    """
+    File prepared to be copied to archive: data_filename is the file itself or its deflated copy
+    """
+
+    def __init__(self, filename, arcname):
+        self.info = ZipInfo.from_file(filename, arcname, strict_timestamps=False)
+        self.data_filename = filename
+        self.deflated = False
+        self.header_offset = 0
+
+    @property
+    def file_size(self):
+        return self.info.file_size
+
+    @property
+    def compress_size(self):
+        return self.info.compress_size
+
+
+def deflate_entry(filename, arcname, temp_dir):
+    """
+    Deflate compressible file to temp_dir and count CRC, it's written before the data.
+    Deflated copy, which is not smaller than the file, is dropped: the file is stored as is
+    """
+    entry = Entry(filename, arcname)
+    compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -zlib.MAX_WBITS) \
+        if is_compressible(filename) else None
+    deflated = tempfile.NamedTemporaryFile(dir=temp_dir, delete=False) if compressor else None
+
+    crc, size = 0, 0
+    with open(filename, 'rb') as file:
+        for chunk in iter(lambda: file.read(CHUNK_SIZE), b''):
+            crc = zlib.crc32(chunk, crc)
+            size += len(chunk)
+            if compressor:
+                deflated.write(compressor.compress(chunk))
+
+    entry.info.CRC = crc
+    entry.info.file_size = entry.info.compress_size = size
+    entry.info.compress_type = ZIP_STORED
+    if compressor:
+        deflated.write(compressor.flush())
+        compress_size = deflated.tell()
+        deflated.close()
+        if compress_size < size:
+            entry.info.compress_type = ZIP_DEFLATED
+            entry.info.compress_size = compress_size
+            entry.data_filename = deflated.name
+            entry.deflated = True
+        else:
+            os.remove(deflated.name)
+    return entry
+
+
+def get_value(value, limit=None, placeholder=ZIP64_PLACEHOLDER):
+    return value if value <= (ZIP64_LIMIT if limit is None else limit) else placeholder
+
+
+def get_dos_date_time(date_time):
+    year, month, day, hour, minute, second = date_time
+    return day + (month << 5) + ((year - 1980) << 9), (second // 2) + (minute << 5) + (hour << 11)
+
+
+def get_flags(entry):
+    try:
+        entry.info.filename.encode('ascii')
+        return 0
+    except UnicodeEncodeError:
+        return UTF8_FLAG
+
+
+def write_local_header(archive, entry):
+    zip64 = entry.file_size > ZIP64_LIMIT or entry.compress_size > ZIP64_LIMIT
+    extra = struct.pack("<2H2Q", 1, 16, entry.file_size, entry.compress_size) if zip64 else b''
+    filename = entry.info.filename.encode('utf-8')
+    dos_date, dos_time = get_dos_date_time(entry.info.date_time)
+
+    entry.header_offset = archive.tell()
+    archive.write(LOCAL_HEADER.pack(
+        b"PK\003\004", ZIP64_VERSION if zip64 else ZIP_VERSION, 0, get_flags(entry), entry.info.compress_type,
+        dos_time, dos_date, entry.info.CRC, ZIP64_PLACEHOLDER if zip64 else entry.compress_size,
+        ZIP64_PLACEHOLDER if zip64 else entry.file_size, len(filename), len(extra)))
+    archive.write(filename)
+    archive.write(extra)
+
+
+def write_central_header(archive, entry):
+    # zip64 extra field holds the overflowed values only, in this order
+    zip64_values = [value for value in (entry.file_size, entry.compress_size, entry.header_offset)
+                    if value > ZIP64_LIMIT]
+    extra = struct.pack("<2H%dQ" % len(zip64_values), 1, 8 * len(zip64_values), *zip64_values) \
+        if zip64_values else b''
+    version = ZIP64_VERSION if zip64_values else ZIP_VERSION
+    filename = entry.info.filename.encode('utf-8')
+    dos_date, dos_time = get_dos_date_time(entry.info.date_time)
+
+    archive.write(CENTRAL_HEADER.pack(
+        b"PK\001\002", version, entry.info.create_system, version, 0, get_flags(entry), entry.info.compress_type,
+        dos_time, dos_date, entry.info.CRC, get_value(entry.compress_size),
+        get_value(entry.file_size), len(filename), len(extra), 0, 0, 0, entry.info.external_attr,
+        get_value(entry.header_offset)))
+    archive.write(filename)
+    archive.write(extra)
+
+
+def write_end_of_central_directory(archive, count, start, size):
+    if count > ZIP64_COUNT_LIMIT or start > ZIP64_LIMIT or size > ZIP64_LIMIT:
+        zip64_offset = archive.tell()
+        archive.write(ZIP64_END_OF_CENTRAL_DIRECTORY.pack(
+            b"PK\006\006", ZIP64_END_OF_CENTRAL_DIRECTORY.size - 12, ZIP64_VERSION, ZIP64_VERSION, 0, 0,
+            count, count, size, start))
+        archive.write(ZIP64_LOCATOR.pack(b"PK\006\007", 0, zip64_offset, 1))
+
+    archive.write(END_OF_CENTRAL_DIRECTORY.pack(
+        b"PK\005\006", 0, 0, get_value(count, ZIP64_COUNT_LIMIT, ZIP64_COUNT_PLACEHOLDER),
+        get_value(count, ZIP64_COUNT_LIMIT, ZIP64_COUNT_PLACEHOLDER), get_value(size), get_value(start), 0))
+
+
+def write_archive(zip_name, files, pool=None):
+    """
+    files - iterable of (filename, arcname), written in the given order.
+    Compressible files are deflated in parallel by the pool (new one of EXPORT_COMPRESS_WORKERS threads by default),
+    others (media, archives, random data) are stored as is
+    """
+    if pool is None:
+        with ThreadPoolExecutor(max_workers=EXPORT_COMPRESS_WORKERS) as pool:
+            return write_archive(zip_name, files, pool)
+
+    entries = []
+    with tempfile.TemporaryDirectory(dir=os.path.dirname(os.path.abspath(zip_name))) as temp_dir, \
+            open(zip_name, 'wb') as archive:
+        futures = [pool.submit(deflate_entry, filename, arcname, temp_dir) for filename, arcname in files]
+        for future in futures:
+            entry = future.result()
+            write_local_header(archive, entry)
+            with open(entry.data_filename, 'rb') as data:
+                shutil.copyfileobj(data, archive, CHUNK_SIZE)
+            if entry.deflated:
+                os.remove(entry.data_filename)
+            entries.append(entry)
+
+        start = archive.tell()
+        for entry in entries:
+            write_central_header(archive, entry)
+        write_end_of_central_directory(archive, len(entries), start, archive.tell() - start)
+
+
+def write_archives(archives, workers=EXPORT_COMPRESS_WORKERS):
+    """
+    archives - iterable of (zip_name, files), written one by one, entries of each are deflated by the shared pool
+    """
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for zip_name, files in archives:
+            write_archive(zip_name, files, pool)
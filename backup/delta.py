@@ -0,0 +1,61 @@
+import hashlib
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from backup.models import BackupManifest
+from backup.settings import FIELDS_KEPT_ON_UPDATE
+
+
+def get_content_hash(fields):
+    content = {field: value for field, value in fields.items() if field not in FIELDS_KEPT_ON_UPDATE}
+    return hashlib.sha1(json.dumps(content, sort_keys=True, cls=DjangoJSONEncoder).encode()).hexdigest()
+
+
+def get_hashes(backup_dict):
+    """
+    backup_dict - serialized instances by qs_name (watch export.json_loads_backup_to_dict)
+    """
+    return {
+        qs_name: {str(instance['fields']['backup_id']): get_content_hash(instance['fields']) for instance in data}
+        for qs_name, data in backup_dict.items()
+    }
+
+
+def make_delta(backup_dict, hashes, base_hashes):
+    """
+    Leave instances created or modified since the base export, return them with backup_ids of deleted instances
+    """
+    delta_dict, deleted = {}, {}
+    for qs_name, data in backup_dict.items():
+        current, previous = hashes[qs_name], base_hashes.get(qs_name, {})
+        delta_dict[qs_name] = [instance for instance in data
+                               if previous.get(str(instance['fields']['backup_id'])) != current[
+                                   str(instance['fields']['backup_id'])]]
+        deleted[qs_name] = sorted(set(previous) - set(current))
+    return delta_dict, deleted
+
+
+def prepare_backup(user, backup_dict, delta=False):
+    """
+    Store manifest of the export (older ones are deleted, only the last one is the base of the next delta),
+    return (backup_dict to write - delta if requested and there is a base, manifest file's content)
+    """
+    hashes = get_hashes(backup_dict)
+    base = BackupManifest.objects.filter(owner=user).first() if delta else None
+    deleted = {}
+    if base:
+        backup_dict, deleted = make_delta(backup_dict, hashes, base.get_hashes())
+
+    manifest = BackupManifest(owner=user, base=base, kind=BackupManifest.DELTA if base else BackupManifest.FULL)
+    manifest.set_hashes(hashes)
+    manifest.save()
+    BackupManifest.objects.filter(owner=user).exclude(pk=manifest.pk).delete()
+
+    return backup_dict, {
+        'id': manifest.id,
+        'base': base.id if base else None,
+        'kind': manifest.kind,
+        'created_at': manifest.created_at.isoformat(),
+        'deleted': deleted,
+    }
@@ -4,49 +4,77 @@ import os
 import shutil
 import tempfile
 import time
-from zipfile import ZipFile
 
 from django.core.serializers import serialize
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db.models import Q
 from django.http import HttpResponse, Http404
+from django.utils.dateparse import parse_datetime
 
+from backup.compression import write_archive
+from backup.delta import prepare_backup
 from backup.settings import (
     BASE_BACKUP_PATH,
+    MANIFEST_FILE_NAME,
     CHATROOM_QS_NAME,
     CHAT_MESSAGE_QS_NAME,
     TASK_QS_NAME,
     TASK_MESSAGE_QS_NAME,
     TASK_ATTACHMENT_QS_NAME,
-    MODEL_DICT
+    MODEL_DICT,
+    MODEL_NAME_DICT,
+    SERIALIZE_OPTIONS,
 )
+from chat.models import ArchivedChatMessageBatch
 from tasktracker.settings import MEDIA_ROOT
 
 
 def json_loads_backup_to_dict(current_user):
-    return {
-        CHATROOM_QS_NAME: json.loads(
-            serialize("json", MODEL_DICT[CHATROOM_QS_NAME].objects.filter(owner=current_user),
-                      use_natural_primary_keys=True)),
-        CHAT_MESSAGE_QS_NAME: json.loads(
-            serialize("json", MODEL_DICT[CHAT_MESSAGE_QS_NAME].objects.filter(owner=current_user),
-                      use_natural_foreign_keys=True,
-                      use_natural_primary_keys=True)),
-        TASK_QS_NAME: json.loads(serialize("json", MODEL_DICT[TASK_QS_NAME].objects.filter(
-            Q(owner=current_user) | Q(assignee=current_user)), use_natural_primary_keys=True)),
-        TASK_MESSAGE_QS_NAME: json.loads(serialize("json", MODEL_DICT[TASK_MESSAGE_QS_NAME].objects.filter(
-            Q(task__owner=current_user) | Q(task__assignee=current_user)), use_natural_foreign_keys=True,
-                                                   use_natural_primary_keys=True)),
-        TASK_ATTACHMENT_QS_NAME: json.loads(serialize("json", MODEL_DICT[TASK_ATTACHMENT_QS_NAME].objects.filter(
-            Q(task__owner=current_user) | Q(task__assignee=current_user)), use_natural_foreign_keys=True,
-                                                      use_natural_primary_keys=True))
+    querysets = {
+        CHATROOM_QS_NAME: MODEL_DICT[CHATROOM_QS_NAME].objects.filter(owner=current_user),
+        CHAT_MESSAGE_QS_NAME: MODEL_DICT[CHAT_MESSAGE_QS_NAME].objects.filter(owner=current_user),
+        TASK_QS_NAME: MODEL_DICT[TASK_QS_NAME].objects.filter(Q(owner=current_user) | Q(assignee=current_user)),
+        TASK_MESSAGE_QS_NAME: MODEL_DICT[TASK_MESSAGE_QS_NAME].objects.filter(
+            Q(task__owner=current_user) | Q(task__assignee=current_user)),
+        TASK_ATTACHMENT_QS_NAME: MODEL_DICT[TASK_ATTACHMENT_QS_NAME].objects.filter(
+            Q(task__owner=current_user) | Q(task__assignee=current_user)),
     }
+    backup_dict = {qs_name: json.loads(serialize("json", queryset, **SERIALIZE_OPTIONS[qs_name]))
+                   for qs_name, queryset in querysets.items()}
+    # batch holds messages of other users too, they are skipped
+    backup_dict[CHAT_MESSAGE_QS_NAME].extend(data for owner_id, data in serialize_archived_messages(
+        ArchivedChatMessageBatch.objects.filter(owners=current_user).select_related('room').iterator())
+        if owner_id == current_user.id)
+    return backup_dict
+
+
+def serialize_archived_messages(batches):
+    """
+    Generator of (owner id, data) of messages moved to archived batches by chat's retention policy,
+    data is the same as serialized chat message gives, so they are restored as usual messages
+    """
+    encoder = DjangoJSONEncoder()
+    for batch in batches:
+        for message in batch.get_messages():
+            yield message['owner_id'], {
+                'model': MODEL_NAME_DICT[CHAT_MESSAGE_QS_NAME],
+                'fields': {
+                    'body': message['body'],
+                    'owner': [message['owner__username']] if message['owner__username'] is not None else None,
+                    'room': str(batch.room.backup_id),
+                    'creation_date': encoder.default(parse_datetime(message['creation_date'])),
+                    'backup_id': message['backup_id'],
+                },
+            }
 
 
 def write_to_file(filepath, backup_data):
+    # file of empty queryset is written too: import expects all of the backup's files
     if len(backup_data) == 0:
+        open(filepath, 'a+').close()
         return
 
-    with open(filepath, 'a+') as csv_file:
+    with open(filepath, 'a+', newline='') as csv_file:
         writer = csv.DictWriter(csv_file, fieldnames=backup_data[0]['fields'].keys())
         writer.writeheader()
 
@@ -54,24 +82,21 @@ def write_to_file(filepath, backup_data):
             writer.writerow(model_instance['fields'])
 
 
-def compress_attachment_files(zipper, attachment_data):
-    for attachment in attachment_data:
-        zipper.write(filename=os.path.join(MEDIA_ROOT, attachment['fields']['file']),
-                     arcname=attachment['fields']['file'])
+def get_attachment_files(attachment_data):
+    # attachments may share the file, it's stored once
+    arcnames = sorted({attachment['fields']['file'] for attachment in attachment_data})
+    return [(os.path.join(MEDIA_ROOT, arcname), arcname) for arcname in arcnames]
 
 
 def compress(dirpath, attachment_data):
     files = os.listdir(dirpath)
     zip_name = os.path.join(dirpath, time.strftime("%Y%m%d-%H%M%S") + '.zip')
 
-    with ZipFile(zip_name, 'w') as zipper:
-        # we sure that the content of dir is files only,
-        # so we do not check if unit is file or not...
-        for file in files:
-            zipper.write(filename=os.path.join(dirpath, file), arcname=file)
-
-        # compress files separately for convenience when importing
-        compress_attachment_files(zipper, attachment_data)
+    # we sure that the content of dir is files only,
+    # so we do not check if unit is file or not...
+    # attachment files are compressed separately for convenience when importing
+    write_archive(zip_name, [(os.path.join(dirpath, file), file) for file in files]
+                  + get_attachment_files(attachment_data))
 
     return zip_name
 
@@ -86,8 +111,10 @@ def get_temp_dir():
 def export(request):
     current_user = request.user
 
-    # get all query sets available for backup process
-    backup_dict = json_loads_backup_to_dict(current_user)
+    # get all query sets available for backup process,
+    # all of them by default, instances changed since the last export only if delta is requested (?delta=1)
+    backup_dict, manifest = prepare_backup(current_user, json_loads_backup_to_dict(current_user),
+                                           delta=bool(request.GET.get('delta')))
 
     temp_dir = get_temp_dir()
 
@@ -96,6 +123,9 @@ def export(request):
         filepath = os.path.join(temp_dir, qs_name)
         write_to_file(filepath=filepath, backup_data=data_value)
 
+    with open(os.path.join(temp_dir, MANIFEST_FILE_NAME), 'w') as manifest_file:
+        json.dump(manifest, manifest_file)
+
     # compress queryset's files to zip archive
     zip_name = compress(temp_dir, backup_dict[TASK_ATTACHMENT_QS_NAME])
 
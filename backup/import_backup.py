@@ -1,27 +1,34 @@
+import csv
+import io
 import json
 import logging
+import uuid
 import zipfile
 from collections import defaultdict
+from contextlib import ExitStack
 
-import pandas
 from django import forms
 from django.core.serializers import deserialize
 from django.core.serializers.json import DjangoJSONEncoder, DeserializationError
+from django.db import transaction
 from django.http import HttpResponseBadRequest
 from django.shortcuts import render
 
 from backup import utils
 from backup.settings import (
     ORDERED_QS_NAME_LIST_TO_UNPACK,
-    MODEL_NAME_DICT, MODEL_DICT, REQUEST_TO_READ_CSV, FIELDS_NEED_TO_CONVERT, BACKUP_FILE_TO_STORAGE_FUNC,
+    MODEL_NAME_DICT, MODEL_DICT, FIELDS_NEED_TO_CONVERT, BACKUP_FILE_TO_STORAGE_FUNC, IMPORT_BATCH_SIZE,
+    MANIFEST_FILE_NAME, FIELDS_KEPT_ON_UPDATE,
 )
+from backup.models import BackupManifest
 from tasktracker.exceptions import BadFileContent, FileMissed
 
 DIALECT_CLUSTER_SIZE = 1024
 
 
 class UploadFileForm(forms.Form):
-    file = forms.FileField()
+    # full backup and the chain of its deltas can be uploaded at once
+    file = forms.FileField(widget=forms.ClearableFileInput(attrs={'multiple': True}))
 
 
 def validate_zip_content(zip_file):
@@ -32,6 +39,48 @@ def validate_zip_content(zip_file):
             raise FileMissed("File: \"{}\" - not exists".format(qs_name))
 
 
+def read_manifest(zip_file):
+    # archive without manifest is a full backup made before incremental backups
+    if MANIFEST_FILE_NAME not in zip_file.namelist():
+        return {'id': None, 'base': None, 'kind': BackupManifest.FULL, 'created_at': '', 'deleted': {}}
+
+    try:
+        return json.loads(zip_file.read(MANIFEST_FILE_NAME))
+    except ValueError:
+        raise BadFileContent(f"Can't parse content of the file: {MANIFEST_FILE_NAME}.")
+
+
+def order_backup_chain(manifests):
+    """
+    manifests - list of (manifest, zip_file). Order archives by export time, check that the chain starts
+    with a full backup and each delta is based on the previous archive
+    """
+    chain = sorted(manifests, key=lambda item: item[0]['created_at'])
+    if chain and chain[0][0]['kind'] == BackupManifest.DELTA:
+        raise BadFileContent(f"Backup {chain[0][0]['id']} contains changes since backup {chain[0][0]['base']}, "
+                             f"which is missed in the uploaded chain")
+    for (previous, _), (manifest, _) in zip(chain, chain[1:]):
+        if manifest['kind'] == BackupManifest.DELTA and manifest['base'] != previous['id']:
+            raise BadFileContent(f"Backup {manifest['id']} is based on backup {manifest['base']}, "
+                                 f"which is missed in the uploaded chain")
+    return chain
+
+
+def parse_backup_ids(backup_ids):
+    result = set()
+    for backup_id in backup_ids:
+        try:
+            result.add(uuid.UUID(str(backup_id)))
+        except ValueError:
+            continue
+    return result
+
+
+def get_update_fields(model):
+    return [field.name for field in model._meta.concrete_fields
+            if not field.primary_key and field.name not in FIELDS_KEPT_ON_UPDATE]
+
+
 def add_log_and_report_to_user(qs_name, report_dict, request_user, err_msg=None, creation_msg=None):
     if creation_msg:
         report_dict['restored_models'][MODEL_NAME_DICT[qs_name]].append(creation_msg)
@@ -40,20 +89,36 @@ def add_log_and_report_to_user(qs_name, report_dict, request_user, err_msg=None,
         logging.warning(err_msg + f"Request user: {request_user}")
 
 
-def iterate_deserialized_data(deserialized_data, qs_name, report_dict, request_user, zip_file):
+def iterate_deserialized_data(deserialized_data, qs_name, report_dict, request_user, zip_file, existing_ids=None,
+                              update_existing=False):
+    """
+    update_existing - instances of delta backup replace existing ones with the same backup_id
+    """
+    model = MODEL_DICT[qs_name]
     for deserialized_instance in deserialized_data:
-        if MODEL_DICT[qs_name].objects.filter(
-                backup_id=deserialized_instance.object.backup_id).first():
-            add_log_and_report_to_user(qs_name, report_dict, request_user,
-                                       err_msg=f"Instance {str(deserialized_instance.object)} already exists.")
-            continue
+        backup_id = deserialized_instance.object.backup_id
+        existing_instance = None
+        if backup_id in existing_ids if existing_ids is not None else model.objects.filter(
+                backup_id=backup_id).exists():
+            if not update_existing:
+                add_log_and_report_to_user(qs_name, report_dict, request_user,
+                                           err_msg=f"Instance {str(deserialized_instance.object)} already exists.")
+                continue
+
+            existing_instance = model.objects.filter(backup_id=backup_id).first()
+            if not utils.is_owner(request_user, existing_instance):
+                add_log_and_report_to_user(qs_name, report_dict, request_user,
+                                           err_msg=f"User is not instance's owner {str(existing_instance)}.")
+                continue
+            deserialized_instance.object.pk = existing_instance.pk
 
         if not utils.is_owner(request_user, deserialized_instance.object):
             add_log_and_report_to_user(qs_name, report_dict, request_user,
                                        err_msg=f"User is not instance's owner {str(deserialized_instance)}.")
             continue
 
-        if qs_name in BACKUP_FILE_TO_STORAGE_FUNC.keys():
+        if qs_name in BACKUP_FILE_TO_STORAGE_FUNC.keys() and (
+                existing_instance is None or existing_instance.file.name != deserialized_instance.object.file.name):
             try:
                 BACKUP_FILE_TO_STORAGE_FUNC[qs_name](zip_file, deserialized_instance.object.file)
             except Exception as e:
@@ -62,71 +127,134 @@ def iterate_deserialized_data(deserialized_data, qs_name, report_dict, request_u
                         e))
                 continue
 
+        if existing_instance is not None:
+            deserialized_instance.save(update_fields=get_update_fields(model))
+            add_log_and_report_to_user(qs_name, report_dict, request_user,
+                                       creation_msg=f"Instance of {type(deserialized_instance.object)} with backup_id : {backup_id} - updated")
+            continue
+
         deserialized_instance.save()
+        if existing_ids is not None:
+            existing_ids.add(backup_id)
         add_log_and_report_to_user(qs_name, report_dict, request_user,
                                    creation_msg=f"Instance of {type(deserialized_instance.object)} with backup_id : {deserialized_instance.object.backup_id} - created")
 
 
-def restore(zip_file, qs_name, request_user, report_dict):
-    with zip_file.open(qs_name, 'r') as csv_file:
+def read_records(csv_file):
+    """
+    Generator of backup file's rows as dicts of strings, file is read lazily, row by row
+    """
+    yield from csv.DictReader(io.TextIOWrapper(csv_file, encoding="utf-8", newline=""))
+
+
+def convert_records(records, qs_name, report_dict, request_user):
+    """
+    Apply FIELDS_NEED_TO_CONVERT to each row, rows with invalid values are reported and skipped
+    """
+    for record in records:
         try:
-            df = REQUEST_TO_READ_CSV[qs_name](csv_file)
-        except pandas.errors.ParserError:
-            add_log_and_report_to_user(qs_name, report_dict, request_user,
-                                       err_msg=f"Can't parse content of the file: {qs_name}.", )
-        except pandas.errors.EmptyDataError:
+            yield {field: FIELDS_NEED_TO_CONVERT[field](value) if field in FIELDS_NEED_TO_CONVERT else value
+                   for field, value in record.items()}
+        except BadFileContent as e:
+            add_log_and_report_to_user(qs_name, report_dict, request_user, err_msg=f"For file '{qs_name}': '{str(e)}'.")
+
+
+def deserialize_records(records, qs_name, report_dict, request_user):
+    for record in records:
+        obj_model_as_dict = {
+            'model': MODEL_NAME_DICT[qs_name],
+            'fields': record
+        }
+
+        obj_model_as_json = f"[{json.dumps(obj_model_as_dict, cls=DjangoJSONEncoder)}]"
+        try:
+            yield from deserialize("json", obj_model_as_json)
+        except DeserializationError:
             add_log_and_report_to_user(qs_name, report_dict, request_user,
-                                       err_msg=f"Can't parse content of the file: {qs_name}. File is empty/has no header...", )
+                                       err_msg=f"For file '{qs_name}'. Bad json model format: '{obj_model_as_json}'.")
 
-        df_fields = set(df.columns)
 
-        # Check if we have fields to convert or edit on current model
-        fields_to_convert = df_fields.intersection(set(FIELDS_NEED_TO_CONVERT.keys()))
+def get_existing_backup_ids(qs_name, deserialized_batch):
+    backup_ids = parse_backup_ids(deserialized_instance.object.backup_id for deserialized_instance in deserialized_batch)
+    return set(MODEL_DICT[qs_name].objects.filter(backup_id__in=backup_ids).values_list('backup_id', flat=True))
+
+
+def restore(zip_file, qs_name, request_user, report_dict, update_existing=False):
+    # file -> rows -> converted rows -> model instances, restored by batches: memory doesn't depend on backup's size
+    with zip_file.open(qs_name, 'r') as csv_file:
+        records = convert_records(read_records(csv_file), qs_name, report_dict, request_user)
+        deserialized_data = deserialize_records(records, qs_name, report_dict, request_user)
 
         try:
-            if fields_to_convert:
-                for field_to_convert in fields_to_convert:
-                    df[field_to_convert] = FIELDS_NEED_TO_CONVERT[field_to_convert](df)
-        except BadFileContent as e:
-            add_log_and_report_to_user(qs_name, report_dict, request_user, err_msg=f"For file '{qs_name}': '{str(e)}'.")
+            for deserialized_batch in utils.batched(deserialized_data, IMPORT_BATCH_SIZE):
+                existing_ids = get_existing_backup_ids(qs_name, deserialized_batch)
+                # instances are saved one by one, so signals keep task's counters, stats and history up to date
+                with transaction.atomic():
+                    iterate_deserialized_data(deserialized_batch, qs_name, report_dict, request_user, zip_file,
+                                              existing_ids=existing_ids, update_existing=update_existing)
+        except (csv.Error, UnicodeDecodeError):
+            add_log_and_report_to_user(qs_name, report_dict, request_user,
+                                       err_msg=f"Can't parse content of the file: {qs_name}.", )
 
-        for record in df.to_dict(orient='records'):
-            obj_model_as_dict = {
-                'model': MODEL_NAME_DICT[qs_name],
-                'fields': record
-            }
 
-            obj_model_as_json = f"[{json.dumps(obj_model_as_dict, cls=DjangoJSONEncoder)}]"
-            try:
-                deserialized_data = deserialize("json", obj_model_as_json)
-                iterate_deserialized_data(deserialized_data, qs_name, report_dict, request_user, zip_file)
-            except DeserializationError:
+def apply_deletions(deleted, request_user, report_dict):
+    # dependent instances first, instances are deleted one by one to keep signals (files, stats, history)
+    for qs_name in reversed(ORDERED_QS_NAME_LIST_TO_UNPACK):
+        backup_ids = parse_backup_ids(deleted.get(qs_name, ()))
+        for instance in MODEL_DICT[qs_name].objects.filter(backup_id__in=backup_ids):
+            if not utils.is_owner(request_user, instance):
                 add_log_and_report_to_user(qs_name, report_dict, request_user,
-                                           err_msg=f"For file '{qs_name}'. Bad json model format: '{obj_model_as_json}'.")
+                                           err_msg=f"User is not instance's owner {str(instance)}.")
+                continue
+
+            instance.delete()
+            add_log_and_report_to_user(qs_name, report_dict, request_user,
+                                       creation_msg=f"Instance of {type(instance)} with backup_id : {instance.backup_id} - deleted")
+
+
+def restore_archive(zip_file, manifest, request_user, report_dict):
+    update_existing = manifest['kind'] == BackupManifest.DELTA
+    for qs_name in ORDERED_QS_NAME_LIST_TO_UNPACK:
+        restore(zip_file, qs_name, request_user, report_dict, update_existing=update_existing)
+    apply_deletions(manifest.get('deleted', {}), request_user, report_dict)
 
 
 def handle_request(request):
-    file = request.FILES['file']
+    files = request.FILES.getlist('file')
+
+    for file in files:
+        if not zipfile.is_zipfile(file):
+            logging.warning(f"User: \"{request.user}\" sent not zip file")
+            return HttpResponseBadRequest("File gavno - ne zip")
 
-    if not zipfile.is_zipfile(file):
-        logging.warning(f"User: \"{request.user}\" sent not zip file")
-        return HttpResponseBadRequest("File gavno - ne zip")
+    with ExitStack() as stack:
+        manifests = []
+        for file in files:
+            zip_file = stack.enter_context(zipfile.ZipFile(file))
+            try:
+                validate_zip_content(zip_file)
+                manifests.append((read_manifest(zip_file), zip_file))
+            except FileMissed as e:
+                logging.warning(e)
+                return HttpResponseBadRequest("Not enough files for backup")
+            except BadFileContent as e:
+                logging.warning(f"User: \"{request.user}\". Err: {e}")
+                return HttpResponseBadRequest(e)
 
-    with zipfile.ZipFile(file) as zip_file:
         try:
-            validate_zip_content(zip_file)
-        except FileMissed as e:
-            logging.warning(e)
-            return HttpResponseBadRequest("Not enough files for backup")
+            chain = order_backup_chain(manifests)
+        except BadFileContent as e:
+            logging.warning(f"User: \"{request.user}\". Err: {e}")
+            return HttpResponseBadRequest(e)
 
         report_dict = {
             'errors': [],
             'restored_models': defaultdict(list)
         }
 
-        for qs_name in ORDERED_QS_NAME_LIST_TO_UNPACK:
+        for manifest, zip_file in chain:
             try:
-                restore(zip_file, qs_name, request.user, report_dict)
+                restore_archive(zip_file, manifest, request.user, report_dict)
             except Exception as e:
                 logging.warning(f"User: \"{request.user}\". Err: {e}")
                 return HttpResponseBadRequest(e)
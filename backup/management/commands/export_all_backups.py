@@ -0,0 +1,21 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand
+
+from backup.bulk_export import export_all_users
+from backup.settings import BASE_BACKUP_PATH
+
+
+class Command(BaseCommand):
+    help = "Export backup archive of each user to the directory in one pass over each model's table"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--output", help="directory for users' archives, new directory in media/backup by default")
+
+    def handle(self, *args, **options):
+        output = options["output"] or os.path.join(BASE_BACKUP_PATH, time.strftime("all-%Y%m%d-%H%M%S"))
+        os.makedirs(output, exist_ok=True)
+
+        archives = export_all_users(output)
+        self.stdout.write(self.style.SUCCESS(f"Exported backups of {len(archives)} users to {output}"))
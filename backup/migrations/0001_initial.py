@@ -0,0 +1,31 @@
+# Generated by Django 3.1.7 on 2026-10-19 13:16
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BackupManifest',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('full', 'full'), ('delta', 'delta')], default='full', max_length=5)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('hashes', models.BinaryField()),
+                ('base', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='backup.backupmanifest')),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='backup_manifests', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-created_at', '-id'],
+            },
+        ),
+    ]
@@ -0,0 +1,37 @@
+import json
+import zlib
+
+from django.contrib.auth.models import User
+from django.db import models
+
+
+class BackupManifest(models.Model):
+    """
+    One export of user's data. Content hashes of the exported instances (zlib compressed JSON:
+    {qs_name: {backup_id: hash}}) are the base of the next, delta, export (watch backup/delta.py)
+    """
+
+    FULL = "full"
+    DELTA = "delta"
+    KIND_CHOICES = (
+        (FULL, "full"),
+        (DELTA, "delta"),
+    )
+
+    class Meta:
+        ordering = ["-created_at", "-id"]
+
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name="backup_manifests")
+    base = models.ForeignKey("self", null=True, blank=True, on_delete=models.SET_NULL)
+    kind = models.CharField(max_length=5, choices=KIND_CHOICES, default=FULL)
+    created_at = models.DateTimeField(auto_now_add=True)
+    hashes = models.BinaryField()
+
+    def __str__(self):
+        return f"{self.kind} backup of {self.owner} at {self.created_at}"
+
+    def get_hashes(self):
+        return json.loads(zlib.decompress(self.hashes))
+
+    def set_hashes(self, hashes):
+        self.hashes = zlib.compress(json.dumps(hashes).encode())
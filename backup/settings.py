@@ -1,7 +1,6 @@
 import os
 
-import pandas
-from django.utils.datetime_safe import datetime
+from django.utils import timezone
 
 from chat.models import ChatMessageModel, ChatRoomModel
 from tasktracker.settings import MEDIA_ROOT
@@ -58,44 +57,93 @@ MODEL_NAME_DICT = {
     TASK_ATTACHMENT_QS_NAME: 'trackerapp.attachment'
 }
 
-
-def has_creation_date(file):
-    return pandas.read_csv(file, parse_dates=['creation_date'])
+"""
+Serializer's options for each model, the same for user's export and bulk export of all users
+"""
+SERIALIZE_OPTIONS = {
+    CHATROOM_QS_NAME: {'use_natural_primary_keys': True},
+    CHAT_MESSAGE_QS_NAME: {'use_natural_foreign_keys': True, 'use_natural_primary_keys': True},
+    TASK_QS_NAME: {'use_natural_primary_keys': True},
+    TASK_MESSAGE_QS_NAME: {'use_natural_foreign_keys': True, 'use_natural_primary_keys': True},
+    TASK_ATTACHMENT_QS_NAME: {'use_natural_foreign_keys': True, 'use_natural_primary_keys': True},
+}
 
 
-def has_no_creation_date(file):
-    return pandas.read_csv(file)
+"""
+Incremental backups: every export stores BackupManifest with content hashes of the exported instances,
+next delta export (?delta=1) includes instances created or modified since then (with their files) and backup_ids
+of deleted ones. Only the last manifest of the user is kept. Uploaded chain must start with a full backup.
+Archive's manifest file: {"id", "base" - id of the previous export, "kind" - full/delta, "created_at", "deleted"}
+"""
+MANIFEST_FILE_NAME = 'manifest.json'
 
+"""
+Fields that are not compared by content hash and not overwritten when delta updates existing instance:
+creation date is kept, task's activity counters and room's last message are recounted by signals
+"""
+FIELDS_KEPT_ON_UPDATE = ('creation_date', 'message_count', 'attachment_count', 'last_activity_at',
+                         'last_message_at', 'last_message_preview')
 
-REQUEST_TO_READ_CSV = {
-    CHATROOM_QS_NAME: has_no_creation_date,
-    CHAT_MESSAGE_QS_NAME: has_creation_date,
-    TASK_QS_NAME: has_creation_date,
-    TASK_MESSAGE_QS_NAME: has_creation_date,
-    TASK_ATTACHMENT_QS_NAME: has_creation_date
-}
+"""
+Count of backup's rows restored in one transaction (with one query to find already existing instances)
+"""
+IMPORT_BATCH_SIZE = 500
 
+"""
+Backup files are read row by row with csv module, all values are strings.
+Value converters for the fields, which need it, are applied to each row:
+"""
 FIELDS_NEED_TO_CONVERT = {
-    # member is many to many field and stored to file like "[1,2,3]" when serializing,
+    # member is many to many field and stored to file like "[1, 2, 3]" when serializing,
     # so list representing as string. To unpack it correctly let's use func (watch sub)
-    'member': lambda pandas_dataframe: pandas_dataframe.member.apply(utils.m2m_format),
+    'member': utils.m2m_format,
 
     # for models serialized with - use_natural_foreign_keys=True attr, such fields as owner, assignee, task, room
     # stored to file with it's username for owner or assignee, and another appropriate values for appropriate fields,
     # thanks django let us to do this, but ...
     # Django deserializer can't deserialize that data correct (LOL OMG WTF !!!!), that's why we need
     # dance with a tambourine around the data to deserialize it (LOL OMG WTF !!!!)
-    'owner': lambda pandas_dataframe: pandas_dataframe.owner.apply(utils.get_user_id_by_username),
-    'assignee': lambda pandas_dataframe: pandas_dataframe.assignee.apply(utils.get_user_id_by_username),
-    'task': lambda pandas_dataframe: pandas_dataframe.task.apply(
-        lambda backup_id: utils.get_model_id_by_backup_id(TaskModel, backup_id)),
-    'room': lambda pandas_dataframe: pandas_dataframe.room.apply(
-        lambda backup_id: utils.get_model_id_by_backup_id(ChatRoomModel, backup_id)),
-
-    # replace creation date with datetime.now()
-    'creation_date': lambda pandas_dataframe: pandas_dataframe.creation_date.apply(lambda x: datetime.now()),
+    # Empty value of nullable foreign key is None.
+    'owner': utils.empty_to_none(utils.get_user_id_by_username),
+    'assignee': utils.empty_to_none(utils.get_user_id_by_username),
+    'task': utils.empty_to_none(lambda backup_id: utils.get_model_id_by_backup_id(TaskModel, backup_id)),
+    'room': utils.empty_to_none(lambda backup_id: utils.get_model_id_by_backup_id(ChatRoomModel, backup_id)),
+    # nullable room's retention_days, empty - the default retention policy
+    'retention_days': utils.empty_to_none(int),
+
+    # replace creation date with timezone.now()
+    'creation_date': lambda value: timezone.now(),
+
+    # task's activity counters are recounted when restoring related messages and attachments
+    'message_count': lambda value: 0,
+    'attachment_count': lambda value: 0,
+    'last_activity_at': lambda value: None,
+
+    # room's last message is set again when restoring room's messages
+    'last_message_at': lambda value: None,
+    'last_message_preview': lambda value: '',
 }
 
 BACKUP_FILE_TO_STORAGE_FUNC = {
     TASK_ATTACHMENT_QS_NAME: utils.restore_file
 }
+
+"""
+Compression of backup archive's entries:
+files of INCOMPRESSIBLE_EXTENSIONS (already compressed media and archives) are stored as is, others are deflated.
+Entries of an archive are deflated by EXPORT_COMPRESS_WORKERS threads at once (watch compression.py)
+"""
+INCOMPRESSIBLE_EXTENSIONS = {
+    '.jpg', '.jpeg', '.png', '.gif', '.webp', '.heic',
+    '.mp3', '.ogg', '.mp4', '.mov', '.avi', '.mkv', '.webm',
+    '.zip', '.gz', '.tgz', '.bz2', '.xz', '.7z', '.rar',
+    '.pdf', '.docx', '.xlsx', '.pptx', '.odt', '.ods',
+}
+EXPORT_COMPRESS_WORKERS = os.cpu_count() or 1
+
+"""
+Bulk export of all users' data (watch bulk_export.py): rows are read by chunks of BULK_EXPORT_CHUNK_SIZE,
+at most BULK_EXPORT_OPEN_FILES user's shard files are kept open at once
+"""
+BULK_EXPORT_CHUNK_SIZE = 1000
+BULK_EXPORT_OPEN_FILES = 128
@@ -0,0 +1,280 @@
+import csv
+import io
+import json
+import zipfile
+from datetime import timedelta
+from unittest import mock
+
+from django.test import TestCase
+from django.urls import reverse_lazy
+from django.utils import timezone
+
+from backup.models import BackupManifest
+from backup.settings import ORDERED_QS_NAME_LIST_TO_UNPACK, TASK_QS_NAME, TASK_MESSAGE_QS_NAME, MANIFEST_FILE_NAME
+from chat.models import ChatRoomModel, ChatMessageModel, RoomReadMarker, ArchivedChatMessageBatch
+from chat.retention import apply_chat_retention
+from trackerapp.models import TaskModel, Message
+from trackerapp.tests import initiators
+
+
+class BaseBackupTestCase(TestCase):
+    def setUp(self) -> None:
+        initiators.initial_test_conditions(self)
+        Message.objects.create(body="message", owner=self.user1, task=self.task1)
+        self.client.force_login(self.user1)
+
+    def export(self, **params):
+        response = self.client.get(reverse_lazy("export-backup"), params)
+        self.assertEqual(response.status_code, 200)
+        return response.content
+
+    def import_backup(self, *contents):
+        backups = []
+        for number, content in enumerate(contents):
+            backup = io.BytesIO(content)
+            backup.name = f"backup{number}.zip"
+            backups.append(backup)
+        return self.client.post(reverse_lazy("import-backup"), {"file": backups})
+
+    def read_file(self, content, name):
+        with zipfile.ZipFile(io.BytesIO(content)) as zip_file:
+            return zip_file.read(name).decode()
+
+    def replace_file(self, content, qs_name, file_content):
+        result = io.BytesIO()
+        with zipfile.ZipFile(io.BytesIO(content)) as source, zipfile.ZipFile(result, "w") as target:
+            for name in source.namelist():
+                target.writestr(name, file_content if name == qs_name else source.read(name))
+        return result.getvalue()
+
+
+class BackupTestCase(BaseBackupTestCase):
+    def test_export_contains_all_files(self):
+        with zipfile.ZipFile(io.BytesIO(self.export())) as zip_file:
+            self.assertTrue(set(ORDERED_QS_NAME_LIST_TO_UNPACK).issubset(zip_file.namelist()))
+
+    def test_restore_deleted_task_with_messages(self):
+        content = self.export()
+        self.task1.delete()
+
+        response = self.import_backup(content)
+
+        self.assertEqual(response.status_code, 200)
+        task = TaskModel.objects.get(title="task1")
+        self.assertEqual((task.owner, task.assignee), (self.user1, self.user2))
+        self.assertEqual(list(task.message_set.values_list("body", flat=True)), ["message"])
+        self.assertEqual(task.message_count, 1)
+
+    def test_existing_instances_are_reported(self):
+        response = self.import_backup(self.export())
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(TaskModel.objects.count(), 2)
+        self.assertTrue(any("already exists" in error for error in response.context["errors"]))
+
+    def test_invalid_row_is_skipped(self):
+        content = self.export()
+        TaskModel.objects.all().delete()
+        with zipfile.ZipFile(io.BytesIO(content)) as zip_file:
+            rows = list(csv.DictReader(io.StringIO(zip_file.read(TASK_QS_NAME).decode())))
+        rows[0]["owner"] = "['nobody']"
+        tasks = io.StringIO()
+        writer = csv.DictWriter(tasks, fieldnames=rows[0].keys())
+        writer.writeheader()
+        writer.writerows(rows)
+        content = self.replace_file(content, TASK_QS_NAME, tasks.getvalue())
+
+        response = self.import_backup(content)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(TaskModel.objects.count(), len(rows) - 1)
+        self.assertTrue(any("nobody" in error for error in response.context["errors"]))
+
+    def test_empty_file_restores_nothing(self):
+        content = self.replace_file(self.export(), TASK_MESSAGE_QS_NAME, "")
+        self.task1.delete()
+
+        response = self.import_backup(content)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(Message.objects.exists())
+
+
+class DeltaBackupTestCase(BaseBackupTestCase):
+    def test_export_is_full_by_default(self):
+        self.export()
+        manifest = json.loads(self.read_file(self.export(), MANIFEST_FILE_NAME))
+
+        self.assertEqual((manifest["kind"], manifest["base"]), (BackupManifest.FULL, None))
+        self.assertIn("task1", self.read_file(self.export(), TASK_QS_NAME))
+
+    def test_first_delta_export_is_full(self):
+        manifest = json.loads(self.read_file(self.export(delta=1), MANIFEST_FILE_NAME))
+
+        self.assertEqual((manifest["kind"], manifest["base"]), (BackupManifest.FULL, None))
+
+    def test_old_manifests_are_deleted(self):
+        for _ in range(3):
+            manifest = json.loads(self.read_file(self.export(), MANIFEST_FILE_NAME))
+
+        self.assertEqual(list(BackupManifest.objects.filter(owner=self.user1).values_list("id", flat=True)),
+                         [manifest["id"]])
+
+    def test_delta_contains_changes_only(self):
+        full = json.loads(self.read_file(self.export(), MANIFEST_FILE_NAME))
+        self.task1.title = "new title"
+        self.task1.save()
+        message_backup_id = str(Message.objects.get().backup_id)
+        Message.objects.all().delete()
+
+        content = self.export(delta=1)
+
+        manifest = json.loads(self.read_file(content, MANIFEST_FILE_NAME))
+        self.assertEqual((manifest["kind"], manifest["base"]), (BackupManifest.DELTA, full["id"]))
+        tasks = list(csv.DictReader(io.StringIO(self.read_file(content, TASK_QS_NAME))))
+        self.assertEqual([task["title"] for task in tasks], ["new title"])
+        self.assertEqual(self.read_file(content, TASK_MESSAGE_QS_NAME), "")
+        self.assertEqual(manifest["deleted"][TASK_MESSAGE_QS_NAME], [message_backup_id])
+
+    def test_counters_do_not_make_delta(self):
+        self.export()
+        Message.objects.create(body="second message", owner=self.user1, task=self.task1)
+
+        content = self.export(delta=1)
+
+        self.assertEqual(self.read_file(content, TASK_QS_NAME), "")
+        self.assertIn("second message", self.read_file(content, TASK_MESSAGE_QS_NAME))
+
+    def test_import_chain_of_deltas(self):
+        full = self.export()
+        self.task1.title = "new title"
+        self.task1.save()
+        first_delta = self.export(delta=1)
+        Message.objects.all().delete()
+        second_delta = self.export(delta=1)
+        TaskModel.objects.filter(owner=self.user1).delete()
+
+        response = self.import_backup(second_delta, full, first_delta)
+
+        self.assertEqual(response.status_code, 200)
+        task = TaskModel.objects.get(owner=self.user1)
+        self.assertEqual(task.title, "new title")
+        self.assertFalse(task.message_set.exists())
+
+    def test_delta_updates_existing_instances(self):
+        full = self.export()
+        creation_date = TaskModel.objects.get(pk=self.task1.pk).creation_date
+        self.task1.title = "new title"
+        self.task1.save()
+        delta = self.export(delta=1)
+        TaskModel.objects.filter(pk=self.task1.pk).update(title="task1")
+
+        response = self.import_backup(full, delta)
+
+        self.assertEqual(response.status_code, 200)
+        task = TaskModel.objects.get(pk=self.task1.pk)
+        self.assertEqual((task.title, task.creation_date, task.message_count), ("new title", creation_date, 1))
+
+    def test_broken_chain_is_rejected(self):
+        full = self.export()
+        self.task1.title = "new title"
+        self.task1.save()
+        self.export(delta=1)
+        Message.objects.all().delete()
+        second_delta = self.export(delta=1)
+
+        response = self.import_backup(full, second_delta)
+
+        self.assertEqual(response.status_code, 400)
+
+    def test_chain_without_full_backup_is_rejected(self):
+        self.export()
+        self.task1.title = "new title"
+        self.task1.save()
+        delta = self.export(delta=1)
+        TaskModel.objects.filter(pk=self.task1.pk).update(title="task1")
+
+        response = self.import_backup(delta)
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(TaskModel.objects.get(pk=self.task1.pk).title, "task1")
+
+    def test_delta_can_not_change_other_users_instances(self):
+        self.client.force_login(self.user2)
+        full = self.export()
+        self.task2.title = "new title"
+        self.task2.save()
+        delta = self.export(delta=1)
+        TaskModel.objects.filter(pk=self.task2.pk).update(title="task2")
+        self.client.force_login(self.hacker)
+
+        response = self.import_backup(full, delta)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(TaskModel.objects.get(pk=self.task2.pk).title, "task2")
+
+
+class ChatBackupTestCase(BaseBackupTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.room = ChatRoomModel.objects.create(name="room", owner=self.user1)
+        ChatMessageModel.objects.create(body="chat message", owner=self.user1, room=self.room)
+
+    def test_restore_deleted_room_with_messages(self):
+        room = ChatRoomModel.objects.create(name="kept for 30 days", owner=self.user1, retention_days=30)
+        ChatMessageModel.objects.create(body="another message", owner=self.user1, room=room)
+        content = self.export()
+        ChatRoomModel.objects.all().delete()
+
+        response = self.import_backup(content)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse([error for error in response.context["errors"] if "chat" in error])
+        self.assertEqual(dict(ChatRoomModel.objects.values_list("name", "retention_days")),
+                         {"room": None, "kept for 30 days": 30})
+        room = ChatRoomModel.objects.get(name="room")
+        self.assertEqual(list(room.chatmessagemodel_set.values_list("body", flat=True)), ["chat message"])
+
+    def test_restored_room_gets_last_message(self):
+        ChatRoomModel.objects.create(name="empty room", owner=self.user1)
+        content = self.export()
+        ChatRoomModel.objects.all().delete()
+
+        self.import_backup(content)
+
+        rooms = {room.name: room for room in ChatRoomModel.objects.all()}
+        self.assertEqual(set(rooms), {"room", "empty room"})
+        self.assertEqual(rooms["room"].last_message_preview, "chat message")
+        self.assertIsNotNone(rooms["room"].last_message_at)
+        self.assertIsNone(rooms["empty room"].last_message_at)
+
+    def test_restored_room_has_read_markers(self):
+        self.room.member.add(self.user2)
+        content = self.export()
+        ChatRoomModel.objects.all().delete()
+
+        self.import_backup(content)
+
+        self.assertEqual(sorted(RoomReadMarker.objects.filter(room__name="room").values_list("user", "unread_count")),
+                         [(self.user1.id, 0), (self.user2.id, 1)])
+
+    def test_archived_messages_are_exported(self):
+        ChatMessageModel.objects.filter(room=self.room).update(creation_date=timezone.now() - timedelta(days=100))
+        ChatMessageModel.objects.create(body="new message", owner=self.user1, room=self.room)
+        apply_chat_retention(archive_days=90)
+        content = self.export()
+        ChatRoomModel.objects.all().delete()
+
+        self.import_backup(content)
+
+        room = ChatRoomModel.objects.get(name="room")
+        self.assertEqual(sorted(room.chatmessagemodel_set.values_list("body", flat=True)),
+                         ["chat message", "new message"])
+
+    def test_archived_messages_of_others_are_not_read(self):
+        ChatMessageModel.objects.filter(room=self.room).update(creation_date=timezone.now() - timedelta(days=100))
+        apply_chat_retention(archive_days=90)
+        self.client.force_login(self.user2)
+
+        with mock.patch.object(ArchivedChatMessageBatch, "get_messages", side_effect=AssertionError):
+            self.export()
@@ -0,0 +1,121 @@
+import csv
+import io
+import os
+import tempfile
+import zipfile
+from datetime import timedelta
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse_lazy
+from django.utils import timezone
+
+from backup.bulk_export import export_all_users, iterate_chunks, ShardWriters
+from backup.settings import ORDERED_QS_NAME_LIST_TO_UNPACK, CHATROOM_QS_NAME, CHAT_MESSAGE_QS_NAME, TASK_QS_NAME
+from chat.models import ChatRoomModel, ChatMessageModel
+from chat.retention import apply_chat_retention
+from trackerapp.models import Message
+from trackerapp.tests import initiators
+
+
+def read_rows(content, qs_name):
+    with zipfile.ZipFile(io.BytesIO(content)) as zip_file:
+        return sorted(tuple(row.items()) for row in csv.DictReader(io.StringIO(zip_file.read(qs_name).decode())))
+
+
+class BulkExportTestCase(TestCase):
+    def setUp(self) -> None:
+        initiators.initial_test_conditions(self)
+        Message.objects.create(body="message", owner=self.user1, task=self.task1)
+        room = ChatRoomModel.objects.create(name="room", owner=self.user1)
+        room.member.add(self.user2)
+        ChatMessageModel.objects.create(body="chat message", owner=self.user2, room=room)
+
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def read_archive(self, user):
+        with open(os.path.join(self.directory, f"{user.id}-{user.username}.zip"), "rb") as archive:
+            return archive.read()
+
+    def test_archives_match_users_export(self):
+        archives = export_all_users(self.directory)
+
+        self.assertEqual(len(archives), 2)
+        for user in (self.user1, self.user2):
+            self.client.force_login(user)
+            export = self.client.get(reverse_lazy("export-backup")).content
+            for qs_name in ORDERED_QS_NAME_LIST_TO_UNPACK:
+                self.assertEqual(read_rows(self.read_archive(user), qs_name), read_rows(export, qs_name))
+
+    def test_archived_messages_are_exported(self):
+        ChatMessageModel.objects.update(creation_date=timezone.now() - timedelta(days=100))
+        apply_chat_retention(archive_days=90)
+
+        self.test_archives_match_users_export()
+        rows = read_rows(self.read_archive(self.user2), CHAT_MESSAGE_QS_NAME)
+        self.assertEqual([dict(row)["body"] for row in rows], ["chat message"])
+
+    def test_query_count_does_not_depend_on_users(self):
+        with CaptureQueriesContext(connection) as queries:
+            export_all_users(self.directory)
+        count = len(queries)
+        for number in range(5):
+            user = initiators.get_user((f"user{number + 10}", "12Asasas12", f"user{number}@a.com"))
+            task = initiators.get_item(initiators.TaskModel, None, "task", user, self.user1, None,
+                                       initiators.DEFAULT_STATUS)
+            Message.objects.create(body="message", owner=user, task=task)
+            ChatRoomModel.objects.create(name=f"room{number}", owner=user).member.add(self.user1)
+
+        with CaptureQueriesContext(connection) as queries:
+            archives = export_all_users(tempfile.mkdtemp(dir=self.directory))
+
+        self.assertEqual(len(archives), 7)
+        self.assertEqual(len(queries), count)
+
+    def test_chunks_are_read_with_one_query(self):
+        for number in range(4):
+            ChatRoomModel.objects.create(name=f"room{number}", owner=self.user2).member.add(self.user1)
+        rooms = ChatRoomModel.objects.order_by("owner_id", "id")
+
+        with CaptureQueriesContext(connection) as queries:
+            chunks = [[(room.name, [member.username for member in room.member.all()]) for room in chunk]
+                      for chunk in iterate_chunks(rooms, ("member",), chunk_size=2)]
+
+        self.assertEqual(chunks, [[("room", ["user2"]), ("room0", ["user1"])],
+                                  [("room1", ["user1"]), ("room2", ["user1"])],
+                                  [("room3", ["user1"])]])
+        room_queries = [query["sql"] for query in queries if 'FROM "chat_chatroommodel"' in query["sql"]]
+        self.assertEqual(len(room_queries), 1)
+        self.assertNotIn("OFFSET", room_queries[0])
+
+    def test_reopened_shard_file_is_appended(self):
+        writers = ShardWriters(self.directory, TASK_QS_NAME, max_open=1)
+        writers.write(1, {"title": "first"})
+        writers.write(2, {"title": "other"})
+        writers.write(1, {"title": "second"})
+        writers.close()
+
+        with open(os.path.join(self.directory, "1", TASK_QS_NAME)) as shard:
+            self.assertEqual(shard.read().splitlines(), ["title", "first", "second"])
+
+    def test_command(self):
+        call_command("export_all_backups", output=self.directory, stdout=io.StringIO())
+
+        rooms = read_rows(self.read_archive(self.user1), CHATROOM_QS_NAME)
+        self.assertEqual([dict(room)["name"] for room in rooms], ["room"])
+
+    def test_endpoint_for_staff_only(self):
+        self.client.force_login(self.user1)
+        self.assertEqual(self.client.get(reverse_lazy("export-all-backups")).status_code, 302)
+
+        self.user1.is_staff = True
+        self.user1.save()
+        response = self.client.get(reverse_lazy("export-all-backups"))
+
+        self.assertEqual(response.status_code, 200)
+        with zipfile.ZipFile(io.BytesIO(b"".join(response.streaming_content))) as zip_file:
+            self.assertEqual(zip_file.namelist(), [f"{self.user1.id}-user1.zip", f"{self.user2.id}-user2.zip"])
@@ -0,0 +1,109 @@
+import os
+import tempfile
+import threading
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from backup import compression
+from backup.compression import write_archive, write_archives
+
+
+class CompressionTestCase(SimpleTestCase):
+    def setUp(self) -> None:
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def make_file(self, name, content):
+        filename = os.path.join(self.directory, name)
+        with open(filename, 'wb') as file:
+            file.write(content)
+        return filename, name
+
+    def compress(self, files, pool=None):
+        zip_name = os.path.join(self.directory, "archive.zip")
+        write_archive(zip_name, files, pool)
+        zip_file = zipfile.ZipFile(zip_name)
+        self.addCleanup(zip_file.close)
+        return zip_file
+
+    def test_compressible_files_are_deflated(self):
+        content = b"task,message\n" * 1000
+        zip_file = self.compress([self.make_file("task_qs", content)])
+
+        self.assertIsNone(zip_file.testzip())
+        self.assertEqual(zip_file.getinfo("task_qs").compress_type, zipfile.ZIP_DEFLATED)
+        self.assertLess(zip_file.getinfo("task_qs").compress_size, len(content))
+        self.assertEqual(zip_file.read("task_qs"), content)
+
+    def test_media_is_stored(self):
+        content = b"jpeg" * 1000
+        zip_file = self.compress([self.make_file("picture.JPG", content)])
+
+        self.assertEqual(zip_file.getinfo("picture.JPG").compress_type, zipfile.ZIP_STORED)
+        self.assertEqual(zip_file.read("picture.JPG"), content)
+
+    def test_incompressible_content_is_stored(self):
+        content = os.urandom(10000)
+        zip_file = self.compress([self.make_file("random.bin", content)])
+
+        self.assertEqual(zip_file.getinfo("random.bin").compress_type, zipfile.ZIP_STORED)
+        self.assertEqual(zip_file.read("random.bin"), content)
+
+    def test_many_files(self):
+        files = [self.make_file(f"file{number}.txt", str(number).encode() * 1000) for number in range(20)]
+        files.append(self.make_file("empty.txt", b""))
+
+        zip_file = self.compress(files)
+
+        self.assertIsNone(zip_file.testzip())
+        self.assertEqual(zip_file.namelist(), [arcname for _, arcname in files])
+        self.assertEqual(zip_file.read("file7.txt"), b"7" * 1000)
+        self.assertEqual(zip_file.read("empty.txt"), b"")
+
+    def test_entries_are_deflated_in_parallel(self):
+        files = [self.make_file(f"file{number}.txt", str(number).encode() * 1000) for number in range(4)]
+        # every entry waits for another one, so the archive is written only when two threads deflate at once
+        barrier = threading.Barrier(2, timeout=5)
+        thread_ids = set()
+        deflate_entry = compression.deflate_entry
+
+        def deflate_entry_together(*args):
+            thread_ids.add(threading.get_ident())
+            barrier.wait()
+            return deflate_entry(*args)
+
+        with mock.patch("backup.compression.deflate_entry", deflate_entry_together), \
+                ThreadPoolExecutor(max_workers=2) as pool:
+            zip_file = self.compress(files, pool)
+
+        self.assertEqual(len(thread_ids), 2)
+        self.assertIsNone(zip_file.testzip())
+        self.assertEqual(zip_file.namelist(), [arcname for _, arcname in files])
+
+    def test_non_ascii_name_and_zip64_records(self):
+        content = b"task,message\n" * 1000
+        files = [self.make_file("задача.txt", content), self.make_file("picture.png", b"png" * 100)]
+
+        # small limit makes sizes and offsets overflow, so zip64 records are written for them
+        with mock.patch("backup.compression.ZIP64_LIMIT", 100), mock.patch("backup.compression.ZIP64_COUNT_LIMIT", 1):
+            zip_file = self.compress(files)
+
+        self.assertIsNone(zip_file.testzip())
+        self.assertEqual(zip_file.namelist(), ["задача.txt", "picture.png"])
+        self.assertEqual(zip_file.read("задача.txt"), content)
+        self.assertEqual(zip_file.read("picture.png"), b"png" * 100)
+
+    def test_several_archives(self):
+        archives = [(os.path.join(self.directory, f"{number}.zip"),
+                     [self.make_file(f"file{number}.txt", str(number).encode() * 1000)]) for number in range(5)]
+
+        write_archives(archives, workers=3)
+
+        for number, (zip_name, _) in enumerate(archives):
+            with zipfile.ZipFile(zip_name) as zip_file:
+                self.assertEqual(zip_file.namelist(), [f"file{number}.txt"])
+                self.assertEqual(zip_file.read(f"file{number}.txt"), str(number).encode() * 1000)
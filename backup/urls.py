@@ -1,9 +1,12 @@
+from django.contrib import admin
 from django.urls import path
 
+from backup.bulk_export import export_all
 from backup.export import export
 from backup.import_backup import import_backup
 
 urlpatterns = [
     path("export/", export, name="export-backup"),
-    path("import/", import_backup, name="import-backup")
+    path("import/", import_backup, name="import-backup"),
+    path("export-all/", admin.site.admin_view(export_all), name="export-all-backups"),
 ]
@@ -14,14 +14,36 @@ def restore_file(zip_file, file_path):
         return default_storage.save(file.name, file)
 
 
-def m2m_format(members_as_string):
-    members = []
+def empty_to_none(convert):
+    """
+    Wrap value converter to skip empty value of nullable field
+    """
 
-    try:
-        members.extend(members_as_string[1:-1].split(','))
-    except IndexError:
+    def wrapper(value):
+        if value == "":
+            return None
+        return convert(value)
+
+    return wrapper
+
+
+def batched(iterable, size):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def m2m_format(members_as_string):
+    if not (members_as_string.startswith('[') and members_as_string.endswith(']')):
         raise BadFileContent(
             f"Invalid format of m2m field. Must be '[1,2,..]' - where digits are member's id. Has: '{members_as_string}'")
+
+    members = [member for member in members_as_string[1:-1].split(',') if member.strip()]
     res = []
     for member in members:
         try:
@@ -32,6 +54,10 @@ def m2m_format(members_as_string):
 
 
 def get_user_id_by_username(username):
+    # owner of the model serialized without natural foreign keys is stored as user's ID
+    if isinstance(username, str) and username.isdigit():
+        username = int(username)
+
     if type(username) != int:
         try:
             username = username[2:-2]
@@ -1,7 +1,7 @@
 # Register your models here.
 from django.contrib import admin
 
-from .models import ChatRoomModel, ChatMessageModel
+from .models import ChatRoomModel, ChatMessageModel, ArchivedChatMessageBatch
 
 admin.site.register(
     ChatRoomModel,
@@ -15,3 +15,11 @@ admin.site.register(
     list_display_links=["id"],
     list_filter=("owner", "room"),
 )
+
+admin.site.register(
+    ArchivedChatMessageBatch,
+    list_display=["id", "room", "first_date", "last_date", "message_count"],
+    list_display_links=["id"],
+    list_filter=("room",),
+    exclude=("payload",),
+)
@@ -1,41 +1,118 @@
+import asyncio
 import json
 
 from channels.db import database_sync_to_async
 from channels.generic.websocket import AsyncWebsocketConsumer
 from django.core.exceptions import PermissionDenied
 
-from chat.models import ChatRoomModel, ChatMessageModel
+from chat import presence, protocol
+from chat.models import ChatRoomModel, ChatMessageModel, RoomReadMarker
+from chat.throttling import TokenBucket, get_chat_limits_config
+
+
+def get_user_group(user_id):
+    # all connections of the user, they get rooms read by the user's other connections
+    return 'chat_user_%s' % user_id
+
+
+def get_room_unread_group(room_pk):
+    # connections of the room's owner and members in other rooms, they count the room's unread messages
+    return 'chat_unread_%s' % room_pk
 
 
 class ChatConsumer(AsyncWebsocketConsumer):
     async def connect(self):
         try:
-            self.room_group_pk = 'chat_pk_%s' % self.scope['url_route']['kwargs']['pk']
+            self.room_pk = self.scope['url_route']['kwargs']['pk']
+            self.room_group_pk = 'chat_pk_%s' % self.room_pk
         except KeyError as e:
             raise KeyError(e)
 
-        if self.scope["user"].is_anonymous:
+        self.joined = False
+        if self.scope["user"].is_anonymous or not await database_sync_to_async(self.can_join)():
             # Reject the connection
             await self.close()
+            return
 
         # Join room group
         await self.channel_layer.group_add(
             self.room_group_pk,
             self.channel_name
         )
-
-        await self.accept()
+        await self.channel_layer.group_add(get_user_group(self.scope['user'].id), self.channel_name)
+        # unread counts of the other rooms the user follows, changed by the rooms' events without queries
+        self.unread_counts = await database_sync_to_async(RoomReadMarker.get_user_unread_counts)(self.scope['user'])
+        self.unread_counts.pop(int(self.room_pk), None)
+        for room_pk in self.unread_counts:
+            await self.channel_layer.group_add(get_room_unread_group(room_pk), self.channel_name)
+        self.joined = True
+
+        self.protocol, subprotocol = protocol.choose_protocol(
+            self.scope.get('subprotocols', []), deflate=protocol.has_permessage_deflate(self.scope.get('headers', [])))
+        # ids of users, whose usernames the client knows (compact protocols reference users by id)
+        self.known_users = set()
+        await self.accept(subprotocol=subprotocol)
+
+        limits = get_chat_limits_config()
+        self.inbound_bucket = TokenBucket(limits["INBOUND_RATE"], limits["INBOUND_BURST"])
+        self.flush_interval = limits["FLUSH_INTERVAL_MS"] / 1000
+        # room's messages waiting to be sent to the client in one frame
+        self.outbox = []
+        self.flush_task = None
+        self.last_flush = 0
+
+        # unread messages since the last visit, the client is in the room now, so they are read
+        await self.mark_read()
+
+        # presence last sent to the client, None until snapshot is sent
+        self.presence = None
+        self.room_presence = presence.get_room_presence(self.channel_layer, self.room_group_pk)
+        await self.room_presence.add(self.channel_name, self.scope['user'], self.send_presence_diff)
+        self.snapshot_task = asyncio.ensure_future(self.send_presence_snapshot())
+
+    def can_join(self):
+        # the same rule as room's page has (watch ChatRoomPermission)
+        room = ChatRoomModel.objects.filter(pk=self.room_pk).first()
+        return room is not None and (not room.is_private or room.has_member(self.scope['user']))
 
     async def disconnect(self, close_code):
+        if not getattr(self, 'joined', False):
+            return
+
+        self.snapshot_task.cancel()
+        if self.flush_task:
+            self.flush_task.cancel()
+        # messages received while connected are read
+        await database_sync_to_async(RoomReadMarker.mark_read)(self.scope['user'], self.room_pk)
+        await self.send_room_read()
+        await self.room_presence.remove(self.channel_name)
+
         # Leave room group
         await self.channel_layer.group_discard(
             self.room_group_pk,
             self.channel_name
         )
+        await self.channel_layer.group_discard(get_user_group(self.scope['user'].id), self.channel_name)
+        for room_pk in self.unread_counts:
+            await self.channel_layer.group_discard(get_room_unread_group(room_pk), self.channel_name)
 
     # Receive message from WebSocket
-    async def receive(self, text_data):
-        text_data_json = json.loads(text_data)
+    async def receive(self, text_data=None, bytes_data=None):
+        if not self.inbound_bucket.consume():
+            await self.send_frame(self.protocol.error_frame(
+                'rate_limited', retry_after=round(self.inbound_bucket.get_wait_time(), 3)))
+            return
+
+        # client of binary protocol may send text JSON frames too
+        text_data_json = self.protocol.loads(bytes_data) if bytes_data is not None else json.loads(text_data)
+
+        if 'typing' in text_data_json:
+            await self.room_presence.set_typing(self.channel_name, bool(text_data_json['typing']))
+            return
+
+        if text_data_json.get('read'):
+            await self.mark_read()
+            return
 
         try:
             message = text_data_json['message']
@@ -59,21 +136,107 @@ class ChatConsumer(AsyncWebsocketConsumer):
             raise PermissionDenied(f"User: \"{message_owner}\" has no permission to write in room: \"{room.name}\"")
 
         await database_sync_to_async(ChatMessageModel(body=message, owner=message_owner, room=room).save)()
+        await self.send_room_message(room, message_owner)
 
         # Send message to room group
         await self.channel_layer.group_send(
             self.room_group_pk,
             {
                 'type': 'chat_message',
-                'message': {'body': message, 'owner': message_owner.username},
+                'owner_id': message_owner.id,
+                'owner': message_owner.username,
+                'encoded': protocol.encode_message(message, message_owner.id, message_owner.username),
             }
         )
 
     # Receive message from room group
     async def chat_message(self, event):
-        message = event['message']
+        if event['owner_id'] not in self.known_users:
+            self.known_users.add(event['owner_id'])
+            users_frame = self.protocol.users_frame({event['owner_id']: event['owner']})
+            if users_frame is not None:
+                await self.send_frame(users_frame)
+
+        self.outbox.append(event['encoded'][self.protocol.subprotocol])
+        if self.flush_task:
+            return
 
-        # Send message to WebSocket
-        await self.send(text_data=json.dumps({
-            'message': message
+        # the first message after the quiet interval is sent at once, the following ones are coalesced
+        delay = self.last_flush + self.flush_interval - asyncio.get_event_loop().time()
+        if delay <= 0:
+            await self.flush_messages()
+        else:
+            self.flush_task = asyncio.ensure_future(self.flush_messages_later(delay))
+
+    async def flush_messages_later(self, delay):
+        await asyncio.sleep(delay)
+        self.flush_task = None
+        await self.flush_messages()
+
+    async def flush_messages(self):
+        messages, self.outbox = self.outbox, []
+        self.last_flush = asyncio.get_event_loop().time()
+
+        # Send messages to WebSocket
+        if messages:
+            await self.send_frame(self.protocol.message_frame(messages))
+
+    async def mark_read(self):
+        marker = await database_sync_to_async(RoomReadMarker.mark_read)(self.scope['user'], self.room_pk)
+        await self.send_frame(self.protocol.unread_frame({
+            'room': int(self.room_pk),
+            'count': marker.unread_count if marker else 0,
+            'last_read_at': marker.last_read_at.isoformat() if marker and marker.last_read_at else None,
         }))
+        await self.send_room_read()
+
+    async def send_room_read(self):
+        # the user's connections to other rooms show the room read
+        await self.channel_layer.group_send(get_user_group(self.scope['user'].id), {
+            'type': 'unread_count', 'room': int(self.room_pk), 'name': None, 'count': 0})
+
+    async def send_room_message(self, room, owner):
+        # one event for all of the room's followers, each connection counts unread messages itself
+        await self.channel_layer.group_send(get_room_unread_group(room.pk), {
+            'type': 'room_message', 'room': room.pk, 'name': room.name, 'owner_id': owner.id})
+
+    # Receive new message of other room the user follows
+    async def room_message(self, event):
+        if event['owner_id'] == self.scope['user'].id:
+            return
+        count = self.unread_counts[event['room']] = self.unread_counts.get(event['room'], 0) + 1
+        await self.send_frame(self.protocol.unread_frame({
+            'room': event['room'], 'name': event['name'], 'count': count}))
+
+    # Receive room read by the user's other connection
+    async def unread_count(self, event):
+        # messages of this room are delivered to the client anyway
+        if event['room'] == int(self.room_pk):
+            return
+        if event['room'] in self.unread_counts:
+            self.unread_counts[event['room']] = event['count']
+        await self.send_frame(self.protocol.unread_frame({
+            'room': event['room'], 'name': event['name'], 'count': event['count']}))
+
+    async def send_frame(self, frame):
+        if self.protocol.binary:
+            await self.send(bytes_data=frame)
+        else:
+            await self.send(text_data=frame)
+
+    async def send_presence_snapshot(self):
+        await asyncio.sleep(presence.SNAPSHOT_DELAY_SECONDS)
+        self.presence = presence.registry.snapshot(self.room_group_pk)
+        self.known_users.update(self.presence)
+        await self.send_frame(self.protocol.presence_frame({'users': list(self.presence.values())}))
+
+    async def send_presence_diff(self):
+        if self.presence is None:
+            return
+
+        current = presence.registry.snapshot(self.room_group_pk)
+        diff = presence.get_presence_diff(self.presence, current)
+        self.presence = current
+        if diff:
+            self.known_users.update(user['id'] for user in diff['online'])
+            await self.send_frame(self.protocol.presence_frame(diff))
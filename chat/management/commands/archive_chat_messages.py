@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+
+from chat.models import ChatRoomModel
+from chat.retention import apply_chat_retention
+
+COLUMNS = ("messages", "expired", "archived", "remaining")
+
+
+class Command(BaseCommand):
+    help = "Delete expired chat messages and move old ones into monthly archived batches " \
+           "according to CHAT_RETENTION settings and rooms' retention_days (run it monthly)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--room", type=int, action="append", help="room's id, could be repeated (default: all)")
+        parser.add_argument("--archive-days", type=int, help="archive messages older than that (default: from settings)")
+        parser.add_argument("--batch-size", type=int)
+        parser.add_argument("--dry-run", action="store_true", help="only report messages, which would be moved")
+
+    def handle(self, *args, **options):
+        rooms = ChatRoomModel.objects.filter(id__in=options["room"]).order_by("id") if options["room"] else None
+        report = apply_chat_retention(
+            rooms=rooms,
+            archive_days=options["archive_days"],
+            batch_size=options["batch_size"],
+            dry_run=options["dry_run"],
+        )
+
+        if options["dry_run"]:
+            self.stdout.write("Dry run, nothing changed")
+        self.stdout.write("room".ljust(30) + "".join(column.rjust(12) for column in COLUMNS))
+        for row in report:
+            row["remaining"] = row["messages"] - row["expired"] - row["archived"]
+            self.stdout.write(row["room"].ljust(30) + "".join(str(row[column]).rjust(12) for column in COLUMNS))
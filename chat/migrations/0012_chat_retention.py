@@ -0,0 +1,46 @@
+# Generated by Django 3.1.7 on 2026-10-19 13:26
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0011_auto_20210521_0831'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedChatMessageBatch',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('first_date', models.DateTimeField()),
+                ('last_date', models.DateTimeField()),
+                ('message_count', models.IntegerField()),
+                ('payload', models.BinaryField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['room', 'first_date'],
+            },
+        ),
+        migrations.AddField(
+            model_name='chatroommodel',
+            name='retention_days',
+            field=models.PositiveIntegerField(blank=True, help_text="days to keep room's messages, empty - keep according to the default policy", null=True),
+        ),
+        migrations.AddIndex(
+            model_name='chatmessagemodel',
+            index=models.Index(fields=['room', 'creation_date'], name='chat_chatme_room_id_19a429_idx'),
+        ),
+        migrations.AddField(
+            model_name='archivedchatmessagebatch',
+            name='room',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_messages', to='chat.chatroommodel'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedchatmessagebatch',
+            index=models.Index(fields=['room', 'last_date'], name='chat_archiv_room_id_b69a32_idx'),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 3.1.7 on 2026-10-19 13:40
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def create_read_markers(apps, schema_editor):
+    ChatRoomModel = apps.get_model('chat', 'ChatRoomModel')
+    RoomReadMarker = apps.get_model('chat', 'RoomReadMarker')
+    markers = [RoomReadMarker(user_id=room.owner_id, room_id=room.id) for room in ChatRoomModel.objects.all()]
+    markers += [RoomReadMarker(user_id=member.user_id, room_id=member.chatroommodel_id)
+                for member in ChatRoomModel.member.through.objects.all()]
+    RoomReadMarker.objects.bulk_create(markers, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('chat', '0012_chat_retention'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RoomReadMarker',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('unread_count', models.PositiveIntegerField(default=0)),
+                ('last_read_at', models.DateTimeField(blank=True, null=True)),
+                ('room', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='read_markers', to='chat.chatroommodel')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='room_read_markers', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('user', 'room')},
+            },
+        ),
+        migrations.RunPython(create_read_markers, migrations.RunPython.noop),
+    ]
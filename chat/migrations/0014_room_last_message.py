@@ -0,0 +1,37 @@
+# Generated by Django 3.1.7 on 2026-10-19 13:45
+
+from django.db import migrations, models
+
+
+def fill_last_message(apps, schema_editor):
+    ChatRoomModel = apps.get_model('chat', 'ChatRoomModel')
+    ChatMessageModel = apps.get_model('chat', 'ChatMessageModel')
+    for room in ChatRoomModel.objects.all():
+        message = ChatMessageModel.objects.filter(room=room).order_by('-creation_date').first()
+        if message:
+            ChatRoomModel.objects.filter(pk=room.pk).update(last_message_at=message.creation_date,
+                                                            last_message_preview=message.body[:100])
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0013_room_read_marker'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chatroommodel',
+            name='last_message_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='chatroommodel',
+            name='last_message_preview',
+            field=models.CharField(blank=True, editable=False, max_length=100),
+        ),
+        migrations.AddIndex(
+            model_name='chatroommodel',
+            index=models.Index(fields=['-is_private', 'name'], name='chat_room_list_idx'),
+        ),
+        migrations.RunPython(fill_last_message, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 3.1.7 on 2026-10-19 14:55
+
+import json
+import zlib
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def fill_owners(apps, schema_editor):
+    ArchivedChatMessageBatch = apps.get_model('chat', 'ArchivedChatMessageBatch')
+    for batch in ArchivedChatMessageBatch.objects.all():
+        messages = json.loads(zlib.decompress(batch.payload))
+        batch.owners.set({message['owner_id'] for message in messages if message['owner_id'] is not None})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('chat', '0014_room_last_message'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='archivedchatmessagebatch',
+            name='owners',
+            field=models.ManyToManyField(blank=True, related_name='archived_chat_messages', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.RunPython(fill_owners, migrations.RunPython.noop),
+    ]
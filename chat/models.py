@@ -1,12 +1,19 @@
 # Create your models here.
+import json
 import uuid
+import zlib
 
 from django.contrib.auth.models import User
 from django.db import models
+from django.db.models import Count, F, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce, Substr
+from django.dispatch import receiver
 from django.urls import reverse
+from django.utils import timezone
 
 ROOM_NAME_MAX_LENGTH = 30
 MESSAGE_BODY_MAX_LENGTH = 1500
+LAST_MESSAGE_PREVIEW_LENGTH = 100
 
 
 class ChatRoomModelManager(models.Manager):
@@ -20,11 +27,19 @@ class ChatRoomModel(models.Model):
     owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name="owner")
     member = models.ManyToManyField(User, related_name="member", blank=True)
     backup_id = models.UUIDField(default=uuid.uuid4, editable=False, unique=True)
+    retention_days = models.PositiveIntegerField(
+        null=True, blank=True,
+        help_text="days to keep room's messages, empty - keep according to the default policy")
+    # denormalized from the latest message (watch signals below), so room list doesn't query messages
+    last_message_at = models.DateTimeField(null=True, blank=True, editable=False)
+    last_message_preview = models.CharField(max_length=LAST_MESSAGE_PREVIEW_LENGTH, blank=True, editable=False)
 
     objects = ChatRoomModelManager
 
     class Meta:
         ordering = ["-is_private", "name"]
+        # room list is read in this order
+        indexes = [models.Index(fields=["-is_private", "name"], name="chat_room_list_idx")]
 
     def __str__(self):
         return f'Room name: "{self.name}", is_private: "{self.is_private}"'
@@ -44,6 +59,10 @@ class ChatRoomModel(models.Model):
     def get_members(self):
         return self.member.all()
 
+    def has_member(self, user):
+        # the owner is a member too
+        return self.owner_id == user.id or self.member.filter(pk=user.pk).exists()
+
     def get_absolute_url(self):
         """
         Returns the url to access a particular instance of the model.
@@ -65,6 +84,10 @@ class ChatMessageModel(models.Model):
 
     objects = MessageModelManager
 
+    class Meta:
+        # room's history is read by creation date (watch views and retention.py)
+        indexes = [models.Index(fields=["room", "creation_date"])]
+
     def __str__(self):
         return (f'Chat message:\n"{self.body}"\nowner: {self.owner}')
 
@@ -76,3 +99,171 @@ class ChatMessageModel(models.Model):
 
     def get_owner(self):
         return self.owner
+
+
+class ArchivedChatMessageBatch(models.Model):
+    """
+    Room's messages of one month moved out of the messages table by retention policy (watch retention.py),
+    stored as zlib compressed JSON list of messages' values ordered by creation date
+    """
+
+    class Meta:
+        indexes = [models.Index(fields=["room", "last_date"])]
+        ordering = ["room", "first_date"]
+
+    room = models.ForeignKey(ChatRoomModel, on_delete=models.CASCADE, related_name="archived_messages")
+    first_date = models.DateTimeField()
+    last_date = models.DateTimeField()
+    message_count = models.IntegerField()
+    payload = models.BinaryField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+    # authors of the messages, so user's backup reads the user's batches only
+    owners = models.ManyToManyField(User, related_name="archived_chat_messages", blank=True)
+
+    def __str__(self):
+        return f"Room {self.room_id}: {self.message_count} messages since {self.first_date}"
+
+    def get_messages(self):
+        return json.loads(zlib.decompress(self.payload))
+
+    def set_owners(self, messages):
+        self.owners.set({message["owner_id"] for message in messages if message["owner_id"] is not None})
+
+
+class RoomReadMarker(models.Model):
+    """
+    User's position in the room: unread_count is maintained incrementally (watch signals below),
+    so room list shows unread messages without counting them. Messages of other users newer than last_read_at
+    (set when the marker is created too) are unread, expired ones are subtracted by retention (watch retention.py).
+    Markers are kept for the room's owner and members only
+    """
+
+    class Meta:
+        unique_together = ("user", "room")
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="room_read_markers")
+    room = models.ForeignKey(ChatRoomModel, on_delete=models.CASCADE, related_name="read_markers")
+    unread_count = models.PositiveIntegerField(default=0)
+    last_read_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.user} in room {self.room_id}: {self.unread_count} unread"
+
+    @classmethod
+    def mark_read(cls, user, room_id):
+        """
+        Reset user's unread count of the room. Return the marker as it was before reading
+        (None for the first visit, if the user is not the room's member or if there is no such room)
+        """
+        marker = cls.objects.filter(user=user, room_id=room_id).first()
+        if marker is None:
+            # room created before read markers
+            if ChatRoomModel.objects.filter(Q(owner=user) | Q(member=user), pk=room_id).exists():
+                cls.objects.get_or_create(user=user, room_id=room_id, defaults={"last_read_at": timezone.now()})
+            return None
+
+        cls.objects.filter(pk=marker.pk).update(unread_count=0, last_read_at=timezone.now())
+        return marker
+
+    @classmethod
+    def get_user_unread_counts(cls, user):
+        """
+        {room id: unread count} of the rooms the user follows
+        """
+        return dict(cls.objects.filter(user=user).values_list("room_id", "unread_count"))
+
+
+def recount_unread_counts(room_ids=None):
+    """
+    Recount unread messages of the rooms' (all of them by default) read markers with single UPDATE query,
+    for example after bulk inserts, which bypass signals
+    """
+    unread = ChatMessageModel.objects.filter(
+        Q(owner__isnull=True) | ~Q(owner=OuterRef("user")),
+        room=OuterRef("room"), creation_date__gt=OuterRef("last_read_at"),
+    ).order_by().values("room")
+    markers = RoomReadMarker.objects.all() if room_ids is None else RoomReadMarker.objects.filter(
+        room_id__in=room_ids)
+    return markers.update(unread_count=Coalesce(Subquery(unread.annotate(count=Count("id")).values("count")),
+                                                Value(0)))
+
+
+# owner and members follow the room's unread count from the time they join.
+# Raw saves too: room restored from backup gets the owner's marker
+@receiver(models.signals.post_save, sender=ChatRoomModel)
+def create_owner_read_marker(sender, instance, created, **kwargs):
+    if created:
+        RoomReadMarker.objects.get_or_create(user_id=instance.owner_id, room=instance,
+                                             defaults={"last_read_at": timezone.now()})
+
+
+@receiver(models.signals.m2m_changed, sender=ChatRoomModel.member.through)
+def create_members_read_markers(sender, instance, action, reverse, pk_set, **kwargs):
+    if action != "post_add" or reverse or not pk_set:
+        return
+    now = timezone.now()
+    RoomReadMarker.objects.bulk_create(
+        [RoomReadMarker(user_id=user_id, room=instance, last_read_at=now) for user_id in pk_set],
+        ignore_conflicts=True)
+
+
+@receiver(models.signals.m2m_changed, sender=ChatRoomModel.member.through)
+def delete_members_read_markers(sender, instance, action, reverse, pk_set, **kwargs):
+    # removed members don't follow the room anymore, the owner does
+    if action == "post_clear" and not reverse:
+        markers = RoomReadMarker.objects.filter(room=instance).exclude(user_id=instance.owner_id)
+    elif action == "post_remove" and pk_set and reverse:
+        markers = RoomReadMarker.objects.filter(user=instance, room_id__in=pk_set).exclude(room__owner=instance)
+    elif action == "post_remove" and pk_set:
+        markers = RoomReadMarker.objects.filter(room=instance, user_id__in=pk_set).exclude(user_id=instance.owner_id)
+    else:
+        return
+    markers.delete()
+
+
+@receiver(models.signals.post_save, sender=ChatMessageModel)
+def increment_unread_counts(sender, instance, created, **kwargs):
+    # raw saves too: restored messages get the import time as creation date (watch backup/settings.py),
+    # so they are newer than the markers' last reading
+    if created and instance.room_id:
+        RoomReadMarker.objects.filter(room_id=instance.room_id).exclude(user_id=instance.owner_id).update(
+            unread_count=F("unread_count") + 1)
+
+
+@receiver(models.signals.post_save, sender=ChatMessageModel)
+def update_room_last_message(sender, instance, created, **kwargs):
+    # raw saves too: restored from backup room gets its last message this way
+    if not created or not instance.room_id:
+        return
+    # the condition keeps the latest message, if messages are saved out of order (backup import)
+    ChatRoomModel.objects.filter(
+        models.Q(last_message_at__isnull=True) | models.Q(last_message_at__lte=instance.creation_date),
+        pk=instance.room_id,
+    ).update(last_message_at=instance.creation_date,
+             last_message_preview=instance.body[:LAST_MESSAGE_PREVIEW_LENGTH])
+
+
+@receiver(models.signals.post_delete, sender=ChatMessageModel)
+def recount_room_last_message_on_delete(sender, instance, **kwargs):
+    if not instance.room_id or not ChatRoomModel.objects.filter(
+            pk=instance.room_id, last_message_at=instance.creation_date).exists():
+        return
+    # archived message stays the room's last one (watch retention.py), it's cleared when expires
+    if ArchivedChatMessageBatch.objects.filter(room_id=instance.room_id,
+                                               last_date__gte=instance.creation_date).exists():
+        return
+    recount_room_last_message([instance.room_id])
+
+
+def recount_room_last_message(room_ids=None):
+    """
+    Set rooms' (all of them by default) last message from the newest message in messages table with single
+    UPDATE query, for example after bulk inserts, which bypass signals
+    """
+    latest = ChatMessageModel.objects.filter(room=OuterRef("pk")).order_by("-creation_date", "-id")
+    rooms = ChatRoomModel.objects.all() if room_ids is None else ChatRoomModel.objects.filter(pk__in=room_ids)
+    return rooms.update(
+        last_message_at=Subquery(latest.values("creation_date")[:1]),
+        last_message_preview=Coalesce(Subquery(latest.annotate(
+            preview=Substr("body", 1, LAST_MESSAGE_PREVIEW_LENGTH)).values("preview")[:1]), Value("")),
+    )
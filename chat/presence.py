@@ -0,0 +1,179 @@
+import asyncio
+import time
+
+"""
+Presence and typing of room's connections, kept in memory of each ASGI worker and gossiped through
+the channel layer, no DB writes. Each worker joins the room's presence group once (watch RoomPresence):
+it sends one heartbeat with all of its connections to the room each HEARTBEAT_SECONDS, applies each event
+to its registry once and notifies its connections by calls. Connection without heartbeat
+for PRESENCE_TTL_SECONDS is offline, typing expires in TYPING_TTL_SECONDS.
+Connecting client gets snapshot of the room's presence in SNAPSHOT_DELAY_SECONDS
+(time for other workers to answer the join), then diffs.
+"""
+HEARTBEAT_SECONDS = 10
+PRESENCE_TTL_SECONDS = 25
+TYPING_TTL_SECONDS = 5
+SNAPSHOT_DELAY_SECONDS = 0.2
+
+
+class PresenceRegistry:
+    """
+    {room's group: {channel name: connection's user and expiry time}}, user is online while any of its
+    connections is not expired
+    """
+
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self.rooms = {}
+
+    def update(self, room, channel_name, user_id, username, typing=None):
+        """
+        Refresh connection's expiry; typing - True/False to set/reset typing, None to keep it
+        """
+        now = self.clock()
+        connection = self.rooms.setdefault(room, {}).setdefault(
+            channel_name, {"user_id": user_id, "username": username, "typing_until": 0})
+        connection["expires"] = now + PRESENCE_TTL_SECONDS
+        if typing is not None:
+            connection["typing_until"] = now + TYPING_TTL_SECONDS if typing else 0
+
+    def remove(self, room, channel_name):
+        connections = self.rooms.get(room, {})
+        connections.pop(channel_name, None)
+        if not connections:
+            self.rooms.pop(room, None)
+
+    def snapshot(self, room):
+        """
+        Online users of the room: {user id: {"id", "username", "typing"}}, expired connections are dropped
+        """
+        now = self.clock()
+        connections = self.rooms.get(room, {})
+        users = {}
+        for channel_name, connection in list(connections.items()):
+            if connection["expires"] < now:
+                del connections[channel_name]
+                continue
+            user = users.setdefault(connection["user_id"], {
+                "id": connection["user_id"], "username": connection["username"], "typing": False})
+            user["typing"] = user["typing"] or connection["typing_until"] > now
+        return users
+
+
+def get_presence_diff(previous, current):
+    """
+    Users came online or changed typing state, and ids of users went offline; None when nothing changed
+    """
+    online = [user for user_id, user in current.items() if previous.get(user_id) != user]
+    offline = [user_id for user_id in previous if user_id not in current]
+    if not online and not offline:
+        return None
+    return {"online": online, "offline": offline}
+
+
+class RoomPresence:
+    """
+    Room's presence in this worker. Worker's channel is its only member of the room's presence group,
+    so events are received and applied to the registry once per worker, however many connections to the room
+    the worker has, and one heartbeat carries all of them. Join is sent when the first connection of the worker
+    comes and answered with one heartbeat by each other worker
+    """
+
+    def __init__(self, channel_layer, room, registry):
+        self.channel_layer = channel_layer
+        self.room = room
+        self.group = f"{room}_presence"
+        self.registry = registry
+        # {channel name: connection's user} of this worker's connections and their callbacks
+        self.connections = {}
+        self.listeners = {}
+        self.channel_name = None
+        self.start_task = None
+        self.tasks = []
+
+    async def start(self):
+        self.channel_name = await self.channel_layer.new_channel()
+        await self.channel_layer.group_add(self.group, self.channel_name)
+        self.tasks = [asyncio.ensure_future(self.receive_events()), asyncio.ensure_future(self.heartbeat())]
+
+    async def stop(self):
+        for task in self.tasks:
+            task.cancel()
+        self.registry.rooms.pop(self.room, None)
+        await self.channel_layer.group_discard(self.group, self.channel_name)
+
+    async def add(self, channel_name, user, listener):
+        """
+        listener - coroutine function, called after each change of the room's presence
+        """
+        is_first = self.start_task is None
+        if is_first:
+            self.start_task = asyncio.ensure_future(self.start())
+        await asyncio.shield(self.start_task)
+
+        self.connections[channel_name] = {'channel': channel_name, 'user_id': user.id, 'username': user.username}
+        self.listeners[channel_name] = listener
+        await self.send_update([dict(self.connections[channel_name], typing=None)], join=is_first)
+
+    async def remove(self, channel_name):
+        self.connections.pop(channel_name, None)
+        self.listeners.pop(channel_name, None)
+        await self.channel_layer.group_send(self.group, {'type': 'presence_offline', 'channel': channel_name})
+
+        if not self.connections and room_presences.get(self.room) is self:
+            del room_presences[self.room]
+            await self.stop()
+
+    async def set_typing(self, channel_name, typing):
+        await self.send_update([dict(self.connections[channel_name], typing=typing)])
+
+    async def send_update(self, connections, join=False):
+        await self.channel_layer.group_send(self.group, {
+            'type': 'presence_update', 'worker': self.channel_name, 'connections': connections, 'join': join})
+
+    async def send_heartbeat(self):
+        await self.send_update([dict(connection, typing=None) for connection in self.connections.values()])
+
+    async def heartbeat(self):
+        while True:
+            await asyncio.sleep(HEARTBEAT_SECONDS)
+            # own heartbeat is received too, expired connections of other workers go offline then
+            await self.send_heartbeat()
+
+    async def receive_events(self):
+        while True:
+            await self.apply(await self.channel_layer.receive(self.channel_name))
+
+    async def apply(self, event):
+        if event['type'] == 'presence_offline':
+            self.registry.remove(self.room, event['channel'])
+        else:
+            for connection in event['connections']:
+                self.registry.update(self.room, connection['channel'], connection['user_id'],
+                                     connection['username'], typing=connection['typing'])
+                if connection['typing']:
+                    # typing expires without any event
+                    asyncio.get_event_loop().call_later(
+                        TYPING_TTL_SECONDS + 0.01, lambda: asyncio.ensure_future(self.notify()))
+
+            # joined worker doesn't know connections of this one
+            if event['join'] and event['worker'] != self.channel_name:
+                await self.send_heartbeat()
+
+        await self.notify()
+
+    async def notify(self):
+        for listener in list(self.listeners.values()):
+            await listener()
+
+
+# one registry per worker process, shared by its connections
+registry = PresenceRegistry()
+# {room's group: RoomPresence} of rooms, which have connections in this worker
+room_presences = {}
+
+
+def get_room_presence(channel_layer, room):
+    if room not in room_presences:
+        room_presences[room] = RoomPresence(channel_layer, room, registry)
+    return room_presences[room]
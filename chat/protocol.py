@@ -0,0 +1,169 @@
+import json
+from functools import lru_cache
+
+# optional packages of compact protocols
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import cbor2
+except ImportError:
+    cbor2 = None
+
+"""
+Wire protocols of chat's websocket, negotiated by subprotocol (Sec-WebSocket-Protocol).
+JSON text frames are the default (client offers no known subprotocol):
+    {"message": {"body", "owner": username}}, {"messages": [...]}, {"presence": {...}}, {"unread": {...}},
+    {"error", "retry_after"}
+Compact binary frames (MessagePack/CBOR, when the package is installed) reference users by id:
+    message {"t": "m", "b": body, "o": owner id}, coalesced messages - array of them,
+    {"t": "u", "u": {user id: username}} - sent before the first message of the user unknown to the client,
+    {"t": "p", "p": presence}, {"t": "r", "r": unread}, {"t": "e", "error", "retry_after"}
+Room's message is encoded once per group send for every protocol (watch ChatConsumer.receive),
+coalesced frames are assembled from the encoded messages without re-encoding.
+"""
+JSON_SUBPROTOCOL = "chat.json"
+MSGPACK_SUBPROTOCOL = "chat.msgpack"
+CBOR_SUBPROTOCOL = "chat.cbor"
+
+# preferred by server, unless transport compresses frames (watch choose_protocol)
+SERVER_PREFERENCE = (MSGPACK_SUBPROTOCOL, CBOR_SUBPROTOCOL, JSON_SUBPROTOCOL)
+
+
+class JsonProtocol:
+    subprotocol = JSON_SUBPROTOCOL
+    binary = False
+
+    def dumps(self, data):
+        return json.dumps(data)
+
+    def loads(self, frame):
+        return json.loads(frame)
+
+    def encode_message(self, body, owner_id, owner_username):
+        return self.dumps({"body": body, "owner": owner_username})
+
+    def message_frame(self, encoded_messages):
+        if len(encoded_messages) == 1:
+            return '{"message": %s}' % encoded_messages[0]
+        return '{"messages": [%s]}' % ", ".join(encoded_messages)
+
+    def presence_frame(self, data):
+        return self.dumps({"presence": data})
+
+    def unread_frame(self, data):
+        return self.dumps({"unread": data})
+
+    def error_frame(self, error, **details):
+        return self.dumps(dict(details, error=error))
+
+    def users_frame(self, users):
+        # JSON messages carry username
+        return None
+
+
+class BinaryProtocol(JsonProtocol):
+    binary = True
+
+    def array_header(self, length):
+        raise NotImplementedError
+
+    def encode_message(self, body, owner_id, owner_username):
+        return self.dumps({"t": "m", "b": body, "o": owner_id})
+
+    def message_frame(self, encoded_messages):
+        if len(encoded_messages) == 1:
+            return encoded_messages[0]
+        return self.array_header(len(encoded_messages)) + b"".join(encoded_messages)
+
+    def presence_frame(self, data):
+        return self.dumps({"t": "p", "p": data})
+
+    def unread_frame(self, data):
+        return self.dumps({"t": "r", "r": data})
+
+    def error_frame(self, error, **details):
+        return self.dumps(dict(details, t="e", error=error))
+
+    def users_frame(self, users):
+        return self.dumps({"t": "u", "u": users})
+
+
+class MsgpackProtocol(BinaryProtocol):
+    subprotocol = MSGPACK_SUBPROTOCOL
+
+    def dumps(self, data):
+        return msgpack.packb(data)
+
+    def loads(self, frame):
+        return msgpack.unpackb(frame)
+
+    def array_header(self, length):
+        if length < 16:
+            return bytes([0x90 | length])
+        if length < 2 ** 16:
+            return b"\xdc" + length.to_bytes(2, "big")
+        return b"\xdd" + length.to_bytes(4, "big")
+
+
+class CborProtocol(BinaryProtocol):
+    subprotocol = CBOR_SUBPROTOCOL
+
+    def dumps(self, data):
+        return cbor2.dumps(data)
+
+    def loads(self, frame):
+        return cbor2.loads(frame)
+
+    def array_header(self, length):
+        if length < 24:
+            return bytes([0x80 | length])
+        if length < 2 ** 8:
+            return bytes([0x98, length])
+        if length < 2 ** 16:
+            return b"\x99" + length.to_bytes(2, "big")
+        return b"\x9a" + length.to_bytes(4, "big")
+
+
+@lru_cache(maxsize=None)
+def get_protocols():
+    """
+    {subprotocol: protocol} of the protocols available here: binary ones need their optional package
+    """
+    protocols = {JSON_SUBPROTOCOL: JsonProtocol()}
+    if msgpack is not None:
+        protocols[MSGPACK_SUBPROTOCOL] = MsgpackProtocol()
+    if cbor2 is not None:
+        protocols[CBOR_SUBPROTOCOL] = CborProtocol()
+    return protocols
+
+
+def has_permessage_deflate(headers):
+    return any(name.lower() == b"sec-websocket-extensions" and b"permessage-deflate" in value
+               for name, value in headers)
+
+
+def choose_protocol(offered, deflate=False):
+    """
+    offered - client's subprotocols in its order of preference. Return (protocol, subprotocol to accept or None).
+    Compact protocol is chosen when offered; when the client offers permessage-deflate, JSON redundancy is
+    compressed by transport, so the client's order is followed.
+    """
+    protocols = get_protocols()
+    supported = [subprotocol for subprotocol in offered if subprotocol in protocols]
+    if not supported:
+        return protocols[JSON_SUBPROTOCOL], None
+
+    if not deflate:
+        supported.sort(key=SERVER_PREFERENCE.index)
+    return protocols[supported[0]], supported[0]
+
+
+def encode_message(body, owner_id, owner_username):
+    """
+    Message encoded for every available protocol, to send in group event
+    """
+    return {subprotocol: protocol.encode_message(body, owner_id, owner_username)
+            for subprotocol, protocol in get_protocols().items()}
@@ -0,0 +1,217 @@
+import json
+import zlib
+from bisect import bisect_right
+from collections import defaultdict
+from datetime import timedelta
+from itertools import groupby
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import F, Q
+from django.db.models.functions import Greatest
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from chat.models import ChatRoomModel, ChatMessageModel, ArchivedChatMessageBatch, RoomReadMarker
+
+"""
+Default chat retention policy, overridden by CHAT_RETENTION dict in project's settings.
+ARCHIVE_AFTER_DAYS - messages older than that are moved into ArchivedChatMessageBatch table,
+    a batch per room's month; None - don't archive
+RETENTION_DAYS - messages (archived too) older than that are deleted, overridden by room's retention_days;
+    None - keep forever
+BATCH_SIZE - messages archived per query, max messages in archived batch
+"""
+DEFAULT_CHAT_RETENTION = {
+    "ARCHIVE_AFTER_DAYS": 90,
+    "RETENTION_DAYS": None,
+    "BATCH_SIZE": 1000,
+}
+
+ARCHIVED_FIELDS = ("id", "body", "owner_id", "owner__username", "creation_date", "backup_id")
+
+
+def get_chat_retention_config():
+    config = dict(DEFAULT_CHAT_RETENTION)
+    config.update(getattr(settings, "CHAT_RETENTION", {}))
+    return config
+
+
+def count_newer(sorted_dates, since):
+    return len(sorted_dates) - (bisect_right(sorted_dates, since) if since is not None else 0)
+
+
+def lower_unread_counts(room, expired):
+    """
+    expired - (owner id, creation date) of room's expired messages. Expired messages of other users,
+    which are newer than user's last reading, are subtracted from user's unread count
+    """
+    dates, owned_dates = [], defaultdict(list)
+    for owner_id, creation_date in expired:
+        dates.append(creation_date)
+        owned_dates[owner_id].append(creation_date)
+    dates.sort()
+    for user_dates in owned_dates.values():
+        user_dates.sort()
+
+    for marker in RoomReadMarker.objects.filter(room=room, unread_count__gt=0):
+        unread = count_newer(dates, marker.last_read_at) - count_newer(owned_dates[marker.user_id],
+                                                                         marker.last_read_at)
+        if unread:
+            RoomReadMarker.objects.filter(pk=marker.pk).update(unread_count=Greatest(F("unread_count") - unread, 0))
+
+
+def expire_messages(room, before):
+    """
+    Delete room's messages older than "before", archived ones too. Return count of deleted messages
+    """
+    expired_messages = ChatMessageModel.objects.filter(room=room, creation_date__lt=before)
+    expired = list(expired_messages.values_list("owner_id", "creation_date"))
+    expired_messages.delete()
+
+    for batch in ArchivedChatMessageBatch.objects.filter(room=room, first_date__lt=before):
+        messages = []
+        for message in batch.get_messages():
+            creation_date = parse_datetime(message["creation_date"])
+            if creation_date >= before:
+                messages.append(message)
+            else:
+                expired.append((message["owner_id"], creation_date))
+        if not messages:
+            batch.delete()
+            continue
+
+        batch.first_date = parse_datetime(messages[0]["creation_date"])
+        batch.message_count = len(messages)
+        batch.payload = zlib.compress(json.dumps(messages).encode())
+        batch.save()
+        batch.set_owners(messages)
+
+    # the latest message has expired, so all of them have
+    ChatRoomModel.objects.filter(pk=room.pk, last_message_at__lt=before).update(
+        last_message_at=None, last_message_preview="")
+    lower_unread_counts(room, expired)
+    return len(expired)
+
+
+def archive_messages(room, before, batch_size):
+    """
+    Move room's messages older than "before" into archived batches, one batch per month (and batch_size messages)
+    """
+    old_messages = ChatMessageModel.objects.filter(room=room, creation_date__lt=before).order_by("creation_date", "id")
+    archived = 0
+
+    while True:
+        with transaction.atomic():
+            messages = list(old_messages.values(*ARCHIVED_FIELDS)[:batch_size])
+            if not messages:
+                return archived
+
+            # one batch per month, so batches are created one by one: their ids are needed for owners
+            for _, month_messages in groupby(messages, key=lambda message: message["creation_date"].strftime("%Y%m")):
+                month_messages = list(month_messages)
+                # isoformat keeps microseconds, which DjangoJSONEncoder drops
+                payload = [dict(message, creation_date=message["creation_date"].isoformat()) for message in
+                           month_messages]
+                batch = ArchivedChatMessageBatch.objects.create(
+                    room=room,
+                    first_date=month_messages[0]["creation_date"],
+                    last_date=month_messages[-1]["creation_date"],
+                    message_count=len(month_messages),
+                    payload=zlib.compress(json.dumps(payload, cls=DjangoJSONEncoder).encode()),
+                )
+                batch.set_owners(month_messages)
+            ChatMessageModel.objects.filter(id__in=[message["id"] for message in messages]).delete()
+            archived += len(messages)
+
+
+def apply_chat_retention(rooms=None, archive_days=None, batch_size=None, dry_run=False):
+    """
+    Apply retention policy to rooms' messages (all rooms by default), missing arguments are taken from config.
+    Return report: list of dicts with room's count of messages before, expired and archived messages
+    (to be expired/archived with dry_run).
+    """
+    config = get_chat_retention_config()
+    archive_days = config["ARCHIVE_AFTER_DAYS"] if archive_days is None else archive_days
+    batch_size = batch_size or config["BATCH_SIZE"]
+    now = timezone.now()
+
+    report = []
+    for room in rooms if rooms is not None else ChatRoomModel.objects.order_by("id"):
+        messages = ChatMessageModel.objects.filter(room=room)
+        row = {"room": room.name, "messages": messages.count(), "expired": 0, "archived": 0}
+
+        retention_days = room.retention_days if room.retention_days is not None else config["RETENTION_DAYS"]
+        expire_before = now - timedelta(days=retention_days) if retention_days is not None else None
+        archive_before = now - timedelta(days=archive_days) if archive_days is not None else None
+
+        if expire_before is not None:
+            if dry_run:
+                row["expired"] = messages.filter(creation_date__lt=expire_before).count()
+            else:
+                with transaction.atomic():
+                    row["expired"] = expire_messages(room, expire_before)
+
+        if archive_before is not None:
+            if dry_run:
+                old_messages = messages.filter(creation_date__lt=archive_before)
+                if expire_before is not None:
+                    old_messages = old_messages.filter(creation_date__gte=expire_before)
+                row["archived"] = old_messages.count()
+            else:
+                row["archived"] = archive_messages(room, archive_before, batch_size)
+
+        report.append(row)
+    return report
+
+
+def serialize_message(message):
+    return {
+        "id": message.id,
+        "body": message.body,
+        "owner": message.owner.username if message.owner else None,
+        "creation_date": message.creation_date.isoformat(),
+    }
+
+
+def serialize_archived_message(message):
+    return {
+        "id": message["id"],
+        "body": message["body"],
+        "owner": message["owner__username"],
+        "creation_date": message["creation_date"],
+    }
+
+
+def get_room_history(room, before=None, before_id=None, limit=50):
+    """
+    Room's messages older than ("before", "before_id") cursor - creation date and id of the oldest message
+    of the previous page (all by default), newest first. Id tells apart messages of the same creation date.
+    Read from the messages table by (room, creation_date) index, archived batches are read only
+    when the table has not enough messages
+    """
+    hot_messages = ChatMessageModel.objects.filter(room=room).select_related("owner").order_by("-creation_date",
+                                                                                               "-id")
+    if before is not None:
+        older = Q(creation_date__lt=before)
+        if before_id is not None:
+            older |= Q(creation_date=before, id__lt=before_id)
+        hot_messages = hot_messages.filter(older)
+    history = [serialize_message(message) for message in hot_messages[:limit]]
+
+    if len(history) < limit:
+        if history:
+            before, before_id = parse_datetime(history[-1]["creation_date"]), history[-1]["id"]
+        batches = ArchivedChatMessageBatch.objects.filter(room=room).order_by("-last_date", "-id")
+        if before is not None:
+            batches = batches.filter(first_date__lte=before)
+
+        for batch in batches.iterator():
+            for message in reversed(batch.get_messages()):
+                cursor = (parse_datetime(message["creation_date"]), message["id"])
+                if before is None or cursor < (before, before_id if before_id is not None else float("-inf")):
+                    history.append(serialize_archived_message(message))
+            if len(history) >= limit:
+                break
+    return history[:limit]
@@ -0,0 +1,47 @@
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth import get_user_model
+from django.test import TransactionTestCase, override_settings
+
+from chat import presence
+from chat.models import ChatRoomModel
+from chat.routing import websocket_urlpatterns
+
+IN_MEMORY_CHANNEL_LAYERS = {"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}}
+
+
+def get_communicator(user, room_pk, subprotocols=None):
+    router = URLRouter(websocket_urlpatterns)
+
+    # scope's user is set by AuthMiddlewareStack in asgi.py
+    async def application(scope, receive, send):
+        return await router(dict(scope, user=user), receive, send)
+
+    return WebsocketCommunicator(application, f"/ws/chat/{room_pk}/", subprotocols=subprotocols)
+
+
+@override_settings(CHANNEL_LAYERS=IN_MEMORY_CHANNEL_LAYERS)
+class ConsumerTestCase(TransactionTestCase):
+    """
+    Consumer's DB queries run in another thread, so test data is committed
+    """
+
+    def setUp(self) -> None:
+        presence.registry.rooms.clear()
+        presence.room_presences.clear()
+        self.user1 = get_user_model().objects.create_user(username="user1", password="12Asasas12")
+        self.user2 = get_user_model().objects.create_user(username="user2", password="12Asasas12")
+        self.room = ChatRoomModel.objects.create(name="room", owner=self.user1)
+        self.room_group = f"chat_pk_{self.room.pk}"
+
+    async def connect(self, user, subprotocols=None, skip_until=None):
+        """
+        Connect to the room, skip frames until the one, for which skip_until(frame) is True
+        """
+        communicator = get_communicator(user, self.room.pk, subprotocols=subprotocols)
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        if skip_until:
+            while not skip_until(await communicator.receive_json_from()):
+                pass
+        return communicator
@@ -1,8 +1,10 @@
 from django.contrib.auth import get_user_model
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse_lazy
 
-from chat.models import ChatRoomModel
+from chat.models import ChatRoomModel, ChatMessageModel
 
 USER1_CREDENTIALS = ('user1', '12Asasas12', "shwonder@a.com")
 USER2_CREDENTIALS = ('user2', '12Asasas12', "sharikoff@a.com")
@@ -81,3 +83,51 @@ class ListChatRoomViewTestCase(TestCase):
         response = self.client.get(reverse_lazy("room-list"))
         self.assertEqual(response.status_code, 302)
         self.assertEqual(response.url, reverse_lazy("login") + "?next=/chat/room/")
+
+    def test_public_and_shared_rooms_are_listed_once(self):
+        room = ChatRoomModel.objects.create(name="public", owner=self.user1)
+        room.member.set((self.user1, self.user2))
+        self.client.force_login(self.hacker)
+
+        response = self.client.get(reverse_lazy("room-list"))
+        self.assertEqual(list(response.context['object_list']), [room])
+
+        self.client.force_login(self.user1)
+        response = self.client.get(reverse_lazy("room-list"), {"is_private": "false"})
+        self.assertEqual(list(response.context['object_list']), [room])
+
+    def test_room_list_is_one_query(self):
+        self.client.force_login(self.user2)
+        self.client.get(reverse_lazy("room-list"))
+
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse_lazy("room-list"))
+        room_queries = [query["sql"] for query in queries if 'FROM "chat_chatroommodel"' in query["sql"]]
+        # paginator's COUNT and the page
+        self.assertEqual(len(room_queries), 2)
+        self.assertNotIn("DISTINCT", room_queries[1])
+        self.assertFalse([query for query in queries if 'FROM "chat_chatmessagemodel"' in query["sql"]])
+
+    def test_last_message_is_denormalized(self):
+        room = ChatRoomModel.objects.get(name="0")
+        ChatMessageModel.objects.create(body="first", owner=self.user1, room=room)
+        last = ChatMessageModel.objects.create(body="x" * 200, owner=self.user2, room=room)
+        self.client.force_login(self.user1)
+
+        response = self.client.get(reverse_lazy("room-list"))
+
+        listed = [listed for listed in response.context['object_list'] if listed.pk == room.pk][0]
+        self.assertEqual(listed.last_message_at, last.creation_date)
+        self.assertEqual(listed.last_message_preview, "x" * 100)
+
+    def test_last_message_on_delete(self):
+        room = ChatRoomModel.objects.get(name="0")
+        first = ChatMessageModel.objects.create(body="first", owner=self.user1, room=room)
+        ChatMessageModel.objects.create(body="second", owner=self.user2, room=room).delete()
+
+        room.refresh_from_db()
+        self.assertEqual((room.last_message_at, room.last_message_preview), (first.creation_date, "first"))
+
+        first.delete()
+        room.refresh_from_db()
+        self.assertEqual((room.last_message_at, room.last_message_preview), (None, ""))
@@ -0,0 +1,134 @@
+import asyncio
+from unittest import mock
+
+from channels.layers import get_channel_layer
+from django.contrib.auth.models import AnonymousUser
+from django.test import SimpleTestCase
+
+from chat import presence
+from chat.presence import PresenceRegistry, RoomPresence, get_presence_diff
+from chat.tests.initiators import ConsumerTestCase, get_communicator
+
+
+class PresenceRegistryTestCase(SimpleTestCase):
+    def setUp(self) -> None:
+        self.now = 0
+        self.registry = PresenceRegistry(clock=lambda: self.now)
+
+    def test_user_is_online_while_any_connection_alive(self):
+        self.registry.update("room", "channel1", 1, "user1")
+        self.now = presence.PRESENCE_TTL_SECONDS / 2
+        self.registry.update("room", "channel2", 1, "user1")
+        self.now = presence.PRESENCE_TTL_SECONDS + 1
+
+        self.assertEqual(list(self.registry.snapshot("room")), [1])
+        self.registry.remove("room", "channel2")
+        self.assertEqual(self.registry.snapshot("room"), {})
+
+    def test_typing_expires(self):
+        self.registry.update("room", "channel1", 1, "user1", typing=True)
+        self.assertTrue(self.registry.snapshot("room")[1]["typing"])
+
+        self.now = presence.TYPING_TTL_SECONDS + 1
+        self.registry.update("room", "channel1", 1, "user1")
+        self.assertFalse(self.registry.snapshot("room")[1]["typing"])
+
+    def test_diff(self):
+        user1 = {"id": 1, "username": "user1", "typing": False}
+        user2 = {"id": 2, "username": "user2", "typing": False}
+
+        self.assertIsNone(get_presence_diff({1: user1}, {1: dict(user1)}))
+        self.assertEqual(get_presence_diff({1: user1}, {2: user2}), {"online": [user2], "offline": [1]})
+        self.assertEqual(get_presence_diff({1: user1}, {1: dict(user1, typing=True)}),
+                         {"online": [dict(user1, typing=True)], "offline": []})
+
+
+@mock.patch("chat.presence.SNAPSHOT_DELAY_SECONDS", 0.05)
+class ChatPresenceTestCase(ConsumerTestCase):
+    async def receive_presence(self, communicator):
+        while True:
+            data = await communicator.receive_json_from(timeout=1)
+            if "presence" in data:
+                return data["presence"]
+
+    async def test_snapshot_and_diffs(self):
+        user1 = {"id": self.user1.id, "username": "user1", "typing": False}
+        user2 = {"id": self.user2.id, "username": "user2", "typing": False}
+        first = await self.connect(self.user1)
+        self.assertEqual(await self.receive_presence(first), {"users": [user1]})
+
+        second = await self.connect(self.user2)
+        snapshot = await self.receive_presence(second)
+        self.assertEqual(sorted(snapshot["users"], key=lambda user: user["id"]), [user1, user2])
+        self.assertEqual(await self.receive_presence(first), {"online": [user2], "offline": []})
+
+        await second.send_json_to({"typing": True})
+        self.assertEqual(await self.receive_presence(first), {"online": [dict(user2, typing=True)], "offline": []})
+
+        await second.disconnect()
+        self.assertEqual(await self.receive_presence(first), {"online": [], "offline": [self.user2.id]})
+        await first.disconnect()
+
+    async def test_heartbeat_without_changes_sends_nothing(self):
+        with mock.patch("chat.presence.HEARTBEAT_SECONDS", 0.05):
+            communicator = await self.connect(self.user1)
+            await self.receive_presence(communicator)
+            await asyncio.sleep(0.2)
+
+            self.assertTrue(await communicator.receive_nothing(timeout=0.1))
+            await communicator.disconnect()
+
+    async def test_worker_applies_event_once(self):
+        first = await self.connect(self.user1)
+        second = await self.connect(self.user2)
+        await self.receive_presence(second)
+
+        with mock.patch.object(presence.registry, "update", wraps=presence.registry.update) as update:
+            await presence.room_presences[self.room_group].send_heartbeat()
+            await asyncio.sleep(0.05)
+
+        # one heartbeat of the worker with both connections, applied once
+        self.assertEqual(update.call_count, 2)
+        await first.disconnect()
+        await second.disconnect()
+
+    async def test_join_is_answered_once_by_worker(self):
+        first = await self.connect(self.user1)
+        second = await self.connect(self.user2)
+        await self.receive_presence(second)
+        room_presence = presence.room_presences[self.room_group]
+        other_worker = RoomPresence(get_channel_layer(), self.room_group, PresenceRegistry())
+        sent = []
+
+        async def send_update(connections, join=False, send_update=room_presence.send_update):
+            sent.append(len(connections))
+            await send_update(connections, join)
+
+        with mock.patch.object(room_presence, "send_update", send_update):
+            await other_worker.add("other-channel", self.user1, lambda: asyncio.sleep(0))
+            await asyncio.sleep(0.05)
+
+        self.assertEqual(sent, [2])
+        self.assertEqual(sorted(other_worker.registry.snapshot(self.room_group)), [self.user1.id, self.user2.id])
+        await other_worker.stop()
+        await first.disconnect()
+        await second.disconnect()
+
+    async def test_typing_expiry_is_sent_without_heartbeat(self):
+        user2 = {"id": self.user2.id, "username": "user2", "typing": False}
+        first = await self.connect(self.user1)
+        await self.receive_presence(first)
+        second = await self.connect(self.user2)
+        await self.receive_presence(first)
+
+        with mock.patch("chat.presence.TYPING_TTL_SECONDS", 0.1):
+            await second.send_json_to({"typing": True})
+            self.assertEqual(await self.receive_presence(first), {"online": [dict(user2, typing=True)], "offline": []})
+            self.assertEqual(await self.receive_presence(first), {"online": [user2], "offline": []})
+
+        await first.disconnect()
+        await second.disconnect()
+
+    async def test_anonymous_is_rejected(self):
+        connected, _ = await get_communicator(AnonymousUser(), self.room.pk).connect()
+        self.assertFalse(connected)
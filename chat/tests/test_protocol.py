@@ -0,0 +1,72 @@
+from unittest import skipUnless
+
+from channels.layers import get_channel_layer
+from django.test import SimpleTestCase
+
+from chat.protocol import (
+    choose_protocol, encode_message, get_protocols, has_permessage_deflate, msgpack, cbor2,
+    JSON_SUBPROTOCOL, MSGPACK_SUBPROTOCOL, CBOR_SUBPROTOCOL,
+)
+from chat.tests.initiators import ConsumerTestCase, get_communicator
+
+
+@skipUnless(msgpack and cbor2, "msgpack and cbor2 are optional")
+class ProtocolTestCase(SimpleTestCase):
+    def test_negotiation(self):
+        self.assertEqual(choose_protocol([])[1], None)
+        self.assertEqual(choose_protocol(["unknown"])[1], None)
+        self.assertEqual(choose_protocol([JSON_SUBPROTOCOL, CBOR_SUBPROTOCOL, MSGPACK_SUBPROTOCOL])[1],
+                         MSGPACK_SUBPROTOCOL)
+        self.assertEqual(choose_protocol([JSON_SUBPROTOCOL, MSGPACK_SUBPROTOCOL], deflate=True)[1], JSON_SUBPROTOCOL)
+
+    def test_permessage_deflate_header(self):
+        self.assertTrue(has_permessage_deflate([(b"Sec-WebSocket-Extensions", b"permessage-deflate")]))
+        self.assertFalse(has_permessage_deflate([(b"host", b"permessage-deflate")]))
+
+    def test_coalesced_frames_are_assembled_from_encoded_messages(self):
+        encoded = [encode_message(f"message {number}", 1, "user1") for number in range(30)]
+        messages = [{"t": "m", "b": f"message {number}", "o": 1} for number in range(30)]
+        protocols = get_protocols()
+
+        for count in (1, 2, 20, 30):
+            msgpack_frame = protocols[MSGPACK_SUBPROTOCOL].message_frame(
+                [message[MSGPACK_SUBPROTOCOL] for message in encoded[:count]])
+            cbor_frame = protocols[CBOR_SUBPROTOCOL].message_frame(
+                [message[CBOR_SUBPROTOCOL] for message in encoded[:count]])
+            expected = messages[0] if count == 1 else messages[:count]
+            self.assertEqual(msgpack.unpackb(msgpack_frame), expected)
+            self.assertEqual(cbor2.loads(cbor_frame), expected)
+
+        json_frame = protocols[JSON_SUBPROTOCOL].message_frame([message[JSON_SUBPROTOCOL] for message in encoded[:2]])
+        self.assertEqual(get_protocols()[JSON_SUBPROTOCOL].loads(json_frame),
+                         {"messages": [{"body": "message 0", "owner": "user1"},
+                                       {"body": "message 1", "owner": "user1"}]})
+
+
+@skipUnless(msgpack, "msgpack is optional")
+class CompactProtocolConsumerTestCase(ConsumerTestCase):
+    async def test_msgpack_frames_reference_users_by_id(self):
+        communicator = get_communicator(self.user1, self.room.pk, subprotocols=[MSGPACK_SUBPROTOCOL])
+        connected, subprotocol = await communicator.connect()
+        self.assertTrue(connected)
+        self.assertEqual(subprotocol, MSGPACK_SUBPROTOCOL)
+        unread = msgpack.unpackb(await communicator.receive_from())
+        self.assertEqual((unread["t"], unread["r"]["count"]), ("r", 0))
+        snapshot = msgpack.unpackb(await communicator.receive_from())
+        self.assertEqual(snapshot["t"], "p")
+
+        owner_id = self.user2.id
+        for _ in range(2):
+            await get_channel_layer().group_send(self.room_group, {
+                "type": "chat_message", "owner_id": owner_id, "owner": "user2",
+                "encoded": encode_message("hello", owner_id, "user2")})
+
+        self.assertEqual(msgpack.unpackb(await communicator.receive_from(), strict_map_key=False),
+                         {"t": "u", "u": {owner_id: "user2"}})
+        self.assertEqual(msgpack.unpackb(await communicator.receive_from()), {"t": "m", "b": "hello", "o": owner_id})
+        self.assertEqual(msgpack.unpackb(await communicator.receive_from()), {"t": "m", "b": "hello", "o": owner_id})
+
+        await communicator.send_to(bytes_data=msgpack.packb({"typing": True}))
+        presence_diff = msgpack.unpackb(await communicator.receive_from())
+        self.assertTrue(presence_diff["p"]["online"][0]["typing"])
+        await communicator.disconnect()
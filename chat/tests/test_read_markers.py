@@ -0,0 +1,145 @@
+from channels.db import database_sync_to_async
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse_lazy
+from django.utils import timezone
+
+from chat.models import ChatRoomModel, ChatMessageModel, RoomReadMarker, recount_unread_counts
+from chat.retention import apply_chat_retention
+from chat.tests.initiators import ConsumerTestCase, get_communicator
+
+
+class RoomReadMarkerTestCase(TestCase):
+    def setUp(self) -> None:
+        self.owner = get_user_model().objects.create_user(username="owner", password="12Asasas12")
+        self.member = get_user_model().objects.create_user(username="member", password="12Asasas12")
+        self.visitor = get_user_model().objects.create_user(username="visitor", password="12Asasas12")
+        self.room = ChatRoomModel.objects.create(name="room", owner=self.owner)
+        self.room.member.add(self.member)
+
+    def get_unread_count(self, user):
+        return RoomReadMarker.objects.get(user=user, room=self.room).unread_count
+
+    def test_new_messages_are_unread_for_everyone_but_author(self):
+        for number in range(3):
+            ChatMessageModel.objects.create(body=f"message {number}", owner=self.member, room=self.room)
+
+        self.assertEqual(self.get_unread_count(self.owner), 3)
+        self.assertEqual(self.get_unread_count(self.member), 0)
+        self.assertFalse(RoomReadMarker.objects.filter(user=self.visitor).exists())
+
+    def test_room_list_shows_unread_count(self):
+        ChatMessageModel.objects.create(body="message", owner=self.member, room=self.room)
+        self.client.force_login(self.owner)
+
+        response = self.client.get(reverse_lazy("room-list"))
+
+        self.assertEqual([room.unread_count for room in response.context_data["object_list"]], [1])
+
+    def test_room_page_does_not_write(self):
+        ChatMessageModel.objects.create(body="message", owner=self.member, room=self.room)
+        self.client.force_login(self.owner)
+
+        response = self.client.get(reverse_lazy("chat-room", kwargs={"pk": self.room.pk}))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.get_unread_count(self.owner), 1)
+
+    def test_visitor_does_not_follow_room(self):
+        self.assertIsNone(RoomReadMarker.mark_read(self.visitor, self.room.pk))
+        ChatMessageModel.objects.create(body="message", owner=self.member, room=self.room)
+
+        self.assertIsNone(RoomReadMarker.mark_read(self.visitor, self.room.pk))
+        self.assertFalse(RoomReadMarker.objects.filter(user=self.visitor).exists())
+
+    def test_member_follows_room_created_before_markers(self):
+        RoomReadMarker.objects.all().delete()
+
+        self.assertIsNone(RoomReadMarker.mark_read(self.member, self.room.pk))
+        ChatMessageModel.objects.create(body="message", owner=self.owner, room=self.room)
+
+        self.assertEqual(RoomReadMarker.mark_read(self.member, self.room.pk).unread_count, 1)
+
+    def test_removed_member_does_not_follow_room(self):
+        other_room = ChatRoomModel.objects.create(name="other room", owner=self.member)
+        other_room.member.add(self.owner)
+
+        self.room.member.remove(self.member)
+        self.owner.member.remove(other_room)
+
+        self.assertEqual(sorted(RoomReadMarker.objects.values_list("user__username", "room__name")),
+                         [("member", "other room"), ("owner", "room")])
+
+    def test_recount_unread_counts(self):
+        for number in range(3):
+            ChatMessageModel.objects.create(body=f"message {number}", owner=self.member, room=self.room)
+        RoomReadMarker.objects.update(unread_count=0)
+
+        recount_unread_counts()
+
+        self.assertEqual(self.get_unread_count(self.owner), 3)
+        self.assertEqual(self.get_unread_count(self.member), 0)
+
+    def test_expired_messages_are_not_unread(self):
+        now = timezone.now()
+        RoomReadMarker.objects.update(last_read_at=now - timezone.timedelta(days=60))
+        for days in (40, 35, 1):
+            message = ChatMessageModel.objects.create(body=f"{days} days ago", owner=self.member, room=self.room)
+            ChatMessageModel.objects.filter(pk=message.pk).update(creation_date=now - timezone.timedelta(days=days))
+        ChatMessageModel.objects.create(body="owner's message", owner=self.owner, room=self.room)
+        self.room.retention_days = 30
+        self.room.save()
+
+        apply_chat_retention(archive_days=None)
+
+        self.assertEqual(self.get_unread_count(self.owner), 1)
+        self.assertEqual(self.get_unread_count(self.member), 1)
+
+
+class ChatConsumerReadMarkerTestCase(ConsumerTestCase):
+    async def test_unread_count_is_sent_and_reset(self):
+        await database_sync_to_async(ChatMessageModel.objects.create)(body="message", owner=self.user2, room=self.room)
+
+        communicator = await self.connect(self.user1)
+        unread = await communicator.receive_json_from()
+        self.assertEqual(unread["unread"]["count"], 1)
+
+        await database_sync_to_async(ChatMessageModel.objects.create)(body="message", owner=self.user2, room=self.room)
+        await communicator.send_json_to({"read": True})
+        while "unread" not in (unread := await communicator.receive_json_from()):
+            pass
+        self.assertEqual(unread["unread"]["count"], 1)
+        await communicator.disconnect()
+
+        marker = await database_sync_to_async(RoomReadMarker.objects.get)(user=self.user1, room=self.room)
+        self.assertEqual(marker.unread_count, 0)
+
+    async def test_unread_count_is_pushed_to_other_rooms(self):
+        other_room = await database_sync_to_async(ChatRoomModel.objects.create)(name="other room", owner=self.user1)
+        communicator = await self.connect(self.user1, skip_until=lambda frame: "unread" in frame)
+        writer = get_communicator(self.user2, other_room.pk)
+        await writer.connect()
+
+        await writer.send_json_to({"message": "hello", "pk": other_room.pk})
+        while "unread" not in (frame := await communicator.receive_json_from()):
+            pass
+        self.assertEqual(frame["unread"], {"room": other_room.pk, "name": "other room", "count": 1})
+
+        reader = get_communicator(self.user1, other_room.pk)
+        await reader.connect()
+        while "unread" not in (frame := await communicator.receive_json_from()):
+            pass
+        self.assertEqual(frame["unread"], {"room": other_room.pk, "name": None, "count": 0})
+
+        for connected in (communicator, writer, reader):
+            await connected.disconnect()
+
+    async def test_non_member_is_rejected_from_private_room(self):
+        private_room = await database_sync_to_async(ChatRoomModel.objects.create)(
+            name="private room", owner=self.user1, is_private=True)
+
+        connected, _ = await get_communicator(self.user2, private_room.pk).connect()
+
+        self.assertFalse(connected)
+        self.assertFalse(await database_sync_to_async(
+            RoomReadMarker.objects.filter(user=self.user2, room=private_room).exists)())
@@ -0,0 +1,108 @@
+import io
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.urls import reverse_lazy
+from django.utils import timezone
+
+from chat.models import ChatRoomModel, ChatMessageModel, ArchivedChatMessageBatch
+from chat.retention import apply_chat_retention, get_room_history
+
+MESSAGE_AGES_DAYS = (400, 200, 130, 100, 95, 10, 1)
+
+
+class ChatRetentionTestCase(TestCase):
+    def setUp(self) -> None:
+        self.user = get_user_model().objects.create_user(username="user1", password="12Asasas12")
+        self.hacker = get_user_model().objects.create_user(username="hacker", password="12test12")
+        self.room = ChatRoomModel.objects.create(name="room", owner=self.user, is_private=True)
+        now = timezone.now()
+        for days in MESSAGE_AGES_DAYS:
+            message = ChatMessageModel.objects.create(body=f"{days} days ago", owner=self.user, room=self.room)
+            ChatMessageModel.objects.filter(pk=message.pk).update(creation_date=now - timezone.timedelta(days=days))
+
+    def history_bodies(self, **params):
+        self.client.force_login(self.user)
+        url = reverse_lazy("room-history", kwargs={"pk": self.room.pk}) + "?" + "&".join(
+            f"{key}={value}" for key, value in params.items())
+        bodies = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            bodies.extend(message["body"] for message in response.json()["messages"])
+            url = response.json()["next"]
+        return bodies
+
+    def test_old_messages_are_archived_by_month(self):
+        report = apply_chat_retention(archive_days=90, batch_size=2)
+
+        self.assertEqual(report, [{"room": "room", "messages": 7, "expired": 0, "archived": 5}])
+        self.assertEqual(ChatMessageModel.objects.count(), 2)
+        batches = ArchivedChatMessageBatch.objects.filter(room=self.room)
+        self.assertEqual(sum(batch.message_count for batch in batches), 5)
+        for batch in batches:
+            self.assertEqual(len({message["creation_date"][:7] for message in batch.get_messages()}), 1)
+            self.assertEqual(list(batch.owners.all()), [self.user])
+
+    def test_history_pages_read_archive(self):
+        expected = [f"{days} days ago" for days in sorted(MESSAGE_AGES_DAYS)]
+        self.assertEqual(self.history_bodies(limit=2), expected)
+
+        apply_chat_retention(archive_days=90, batch_size=2)
+
+        self.assertEqual(self.history_bodies(limit=2), expected)
+        self.assertEqual(self.history_bodies(limit=3), expected)
+        self.assertEqual([message["body"] for message in get_room_history(self.room, limit=3)], expected[:3])
+
+    def test_messages_of_the_same_date_are_not_skipped(self):
+        same_date = timezone.now() - timezone.timedelta(days=120)
+        for number in range(3):
+            message = ChatMessageModel.objects.create(body=f"same date {number}", owner=self.user, room=self.room)
+            ChatMessageModel.objects.filter(pk=message.pk).update(creation_date=same_date)
+        expected = self.history_bodies(limit=100)
+        self.assertEqual(len(expected), len(MESSAGE_AGES_DAYS) + 3)
+
+        self.assertEqual(self.history_bodies(limit=2), expected)
+        apply_chat_retention(archive_days=90, batch_size=2)
+        self.assertEqual(self.history_bodies(limit=2), expected)
+
+    def test_room_retention_expires_messages(self):
+        apply_chat_retention(archive_days=90)
+        self.room.retention_days = 150
+        self.room.save()
+
+        report = apply_chat_retention(archive_days=90)
+
+        self.assertEqual(report[0]["expired"], 2)
+        self.assertEqual(self.history_bodies(), [f"{days} days ago" for days in (1, 10, 95, 100, 130)])
+
+    def test_dry_run(self):
+        self.room.retention_days = 300
+        self.room.save()
+
+        report = apply_chat_retention(archive_days=90, dry_run=True)
+
+        self.assertEqual((report[0]["expired"], report[0]["archived"]), (1, 4))
+        self.assertEqual(ChatMessageModel.objects.count(), len(MESSAGE_AGES_DAYS))
+        self.assertFalse(ArchivedChatMessageBatch.objects.exists())
+
+    def test_command(self):
+        out = io.StringIO()
+        call_command("archive_chat_messages", room=[self.room.pk], archive_days=90, stdout=out)
+
+        self.assertIn("room", out.getvalue())
+        self.assertEqual(ChatMessageModel.objects.count(), 2)
+
+    def test_private_room_history_is_forbidden(self):
+        self.client.force_login(self.hacker)
+        response = self.client.get(reverse_lazy("room-history", kwargs={"pk": self.room.pk}))
+        self.assertEqual(response.status_code, 403)
+
+    def test_history_query_uses_index(self):
+        with connection.cursor() as cursor:
+            cursor.execute("EXPLAIN QUERY PLAN SELECT * FROM chat_chatmessagemodel WHERE room_id = %s "
+                           "ORDER BY creation_date DESC LIMIT 100", [self.room.pk])
+            plan = " ".join(str(row) for row in cursor.fetchall())
+        self.assertIn("chat_chatme_room_id_19a429_idx", plan)
@@ -0,0 +1,60 @@
+from channels.layers import get_channel_layer
+from django.test import SimpleTestCase, override_settings
+
+from chat.protocol import encode_message
+from chat.tests.initiators import ConsumerTestCase
+from chat.throttling import TokenBucket
+
+
+class TokenBucketTestCase(SimpleTestCase):
+    def test_burst_then_rate(self):
+        now = [0]
+        bucket = TokenBucket(rate=2, capacity=3, clock=lambda: now[0])
+
+        self.assertEqual([bucket.consume() for _ in range(4)], [True, True, True, False])
+        self.assertEqual(bucket.get_wait_time(), 0.5)
+
+        now[0] = 0.5
+        self.assertTrue(bucket.consume())
+        self.assertFalse(bucket.consume())
+
+        now[0] = 100
+        self.assertEqual([bucket.consume() for _ in range(4)], [True, True, True, False])
+
+
+@override_settings(CHAT_LIMITS={"INBOUND_RATE": 1, "INBOUND_BURST": 2, "FLUSH_INTERVAL_MS": 50})
+class ChatConsumerLimitsTestCase(ConsumerTestCase):
+    async def connect(self):
+        # skip unread counter and presence snapshot
+        return await super().connect(self.user1, skip_until=lambda frame: "presence" in frame)
+
+    async def receive_frames(self, communicator):
+        frames = []
+        while not await communicator.receive_nothing(timeout=0.2):
+            frames.append(await communicator.receive_json_from())
+        return frames
+
+    async def test_inbound_frames_over_limit_are_dropped(self):
+        communicator = await self.connect()
+
+        for _ in range(4):
+            await communicator.send_json_to({"typing": True})
+
+        errors = [frame for frame in await self.receive_frames(communicator) if "error" in frame]
+        self.assertEqual([error["error"] for error in errors], ["rate_limited", "rate_limited"])
+        self.assertGreater(errors[0]["retry_after"], 0)
+        await communicator.disconnect()
+
+    async def test_outbound_messages_are_coalesced(self):
+        communicator = await self.connect()
+        channel_layer = get_channel_layer()
+
+        for number in range(5):
+            await channel_layer.group_send(self.room_group, {
+                "type": "chat_message", "owner_id": self.user2.id, "owner": "user2",
+                "encoded": encode_message(f"message {number}", self.user2.id, "user2")})
+
+        frames = await self.receive_frames(communicator)
+        messages = [{"body": f"message {number}", "owner": "user2"} for number in range(5)]
+        self.assertEqual(frames, [{"message": messages[0]}, {"messages": messages[1:]}])
+        await communicator.disconnect()
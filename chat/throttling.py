@@ -0,0 +1,49 @@
+import time
+
+from django.conf import settings
+
+"""
+Default limits of chat's websocket connections, overridden by CHAT_LIMITS dict in project's settings.
+INBOUND_RATE - frames per second client may send (token bucket refill rate), excess frames are dropped
+INBOUND_BURST - frames client may send at once (token bucket capacity)
+FLUSH_INTERVAL_MS - messages of room's group arrived within the interval since the last frame
+    are coalesced into one frame to the client
+"""
+DEFAULT_CHAT_LIMITS = {
+    "INBOUND_RATE": 5,
+    "INBOUND_BURST": 10,
+    "FLUSH_INTERVAL_MS": 20,
+}
+
+
+def get_chat_limits_config():
+    config = dict(DEFAULT_CHAT_LIMITS)
+    config.update(getattr(settings, "CHAT_LIMITS", {}))
+    return config
+
+
+class TokenBucket:
+    def __init__(self, rate, capacity, clock=time.monotonic):
+        self.rate = rate
+        self.capacity = capacity
+        self.clock = clock
+        self.tokens = capacity
+        self.updated_at = clock()
+
+    def consume(self, tokens=1):
+        """
+        Take tokens if there are enough of them, return False otherwise
+        """
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+        if self.tokens < tokens:
+            return False
+        self.tokens -= tokens
+        return True
+
+    def get_wait_time(self, tokens=1):
+        """
+        Seconds until tokens are available
+        """
+        return max(0.0, (tokens - self.tokens) / self.rate)
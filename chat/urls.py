@@ -9,6 +9,7 @@ urlpatterns = [
         path('create/', views.CreateChatRoomView.as_view(), name='create-room'),
         path('<pk>/', include([
             path('', views.ChatRoomDetail.as_view(), name='chat-room'),
+            path('history/', views.ChatRoomHistoryView.as_view(), name='room-history'),
             path('delete/', views.DeleteChatRoomView.as_view(), name='delete-room'),
             path('update/', views.UpdateChatRoomView.as_view(), name='update-room'),
         ])),
@@ -1,9 +1,14 @@
 # Create your views here.
 from django.contrib.auth.mixins import LoginRequiredMixin
-from django.db.models import Q
+from django.db.models import Q, Exists, OuterRef, Subquery
+from django.http import JsonResponse, HttpResponseBadRequest
 from django.urls import reverse_lazy
+from django.utils.dateparse import parse_datetime
+from django.utils.http import urlencode
+from django.views import generic
 
-from chat.models import ChatRoomModel, ChatMessageModel
+from chat.models import ChatRoomModel, ChatMessageModel, RoomReadMarker
+from chat.retention import get_room_history
 from trackerapp.extended_generics import (
     ExtendedCreateView, ExtendedFilterListView, ExtendedDeleteView, ExtendedUpdateView, ExtendedDetailView
 )
@@ -12,6 +17,7 @@ from trackerapp.permissions import IsOwnerPermissionRequiredMixin, ChatRoomPermi
 
 ITEMS_ON_PAGE = 5
 HISTORY_MESSAGE_COUNT = 100
+HISTORY_PAGE_SIZE = 50
 
 
 class ChatRoomDetail(ChatRoomPermission, ExtendedDetailView):
@@ -20,23 +26,62 @@ class ChatRoomDetail(ChatRoomPermission, ExtendedDetailView):
 
     def get_context_data(self, **kwargs):
         context_data = super(ChatRoomDetail, self).get_context_data()
+        # messages are marked read by the page's websocket connection, GET doesn't write
 
-        message_history_list = ChatMessageModel.objects.filter(room=self.object).order_by('creation_date')[
-                               :HISTORY_MESSAGE_COUNT]
+        # the latest messages by (room, creation_date) index, older ones are loaded from the history view
+        message_history_list = ChatMessageModel.objects.filter(room=self.object).select_related(
+            'owner').order_by('-creation_date', '-id')[:HISTORY_MESSAGE_COUNT]
         extra_data = {
-            'message_history': message_history_list,
+            'message_history': list(message_history_list)[::-1],
         }
 
         context_data.update(extra_data)
         return context_data
 
 
+class ChatRoomHistoryView(ChatRoomPermission, generic.View):
+    """
+    Room's messages as JSON, newest first, paginated by creation date and id:
+    ?before=<creation date of the oldest message of the previous page>&before_id=<its id>&limit=<page size>
+    Archived messages are read through the same pages (watch retention.py)
+    """
+    permission_model = ChatRoomModel
+
+    def get(self, request, *args, **kwargs):
+        room = ChatRoomModel.objects.get(pk=kwargs["pk"])
+
+        before = request.GET.get("before")
+        if before is not None:
+            before = parse_datetime(before)
+            if before is None:
+                return HttpResponseBadRequest("Invalid 'before' date")
+        before_id = request.GET.get("before_id")
+        if before_id is not None:
+            try:
+                before_id = int(before_id)
+            except ValueError:
+                return HttpResponseBadRequest("Invalid 'before_id'")
+        try:
+            limit = max(1, min(int(request.GET.get("limit", HISTORY_PAGE_SIZE)), HISTORY_MESSAGE_COUNT))
+        except ValueError:
+            return HttpResponseBadRequest("Invalid 'limit'")
+
+        messages = get_room_history(room, before=before, before_id=before_id, limit=limit)
+
+        next_page = None
+        if len(messages) == limit:
+            next_page = request.path + "?" + urlencode(
+                {"before": messages[-1]["creation_date"], "before_id": messages[-1]["id"], "limit": limit})
+        return JsonResponse({"messages": messages, "next": next_page})
+
+
 class CreateChatRoomView(LoginRequiredMixin, ExtendedCreateView):
     model = ChatRoomModel
     fields = [
         "name",
         "is_private",
         "member",
+        "retention_days",
     ]
     template_name = "chat/room_form.html"
 
@@ -53,9 +98,16 @@ class ListChatRoomView(LoginRequiredMixin, ExtendedFilterListView):
     filterset_class = ChatRoomFilter
 
     def get_queryset(self):
-        room_list = ChatRoomModel.objects.filter(Q(is_private=False) | Q(Q(is_private=True),
-                                                                         Q(Q(member=self.request.user) | Q(
-                                                                             owner=self.request.user)))).distinct()
+        user = self.request.user
+        # EXISTS instead of join on members: no duplicate rows to remove by DISTINCT
+        is_member = Exists(ChatRoomModel.member.through.objects.filter(chatroommodel_id=OuterRef('pk'),
+                                                                       user_id=user.pk))
+        room_list = ChatRoomModel.objects.annotate(is_member=is_member).filter(
+            Q(is_private=False) | Q(owner=user) | Q(is_member=True)
+        ).select_related('owner').annotate(
+            # maintained by signals, no COUNT of messages; None - user has never visited the public room
+            unread_count=Subquery(RoomReadMarker.objects.filter(room=OuterRef('pk'), user=user).values(
+                'unread_count')[:1]))
 
         filtered_list = ChatRoomFilter(self.request.GET, queryset=room_list)
         return filtered_list.qs
@@ -69,5 +121,5 @@ class DeleteChatRoomView(IsOwnerPermissionRequiredMixin, ExtendedDeleteView):
 
 class UpdateChatRoomView(IsOwnerPermissionRequiredMixin, ExtendedUpdateView):
     model = permission_model = ChatRoomModel
-    fields = ["member", "name", "is_private"]
+    fields = ["member", "name", "is_private", "retention_days"]
     template_name = "chat/room_form.html"
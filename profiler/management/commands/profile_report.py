@@ -0,0 +1,38 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from profiler.settings import get_config
+from profiler.storage import get_storage
+from profiler.views import SORT_FIELDS
+
+COLUMNS = ("requests", "queries_p50", "queries_max", "duplicates_max", "db_ms_p95", "wall_ms_p50", "wall_ms_p95",
+           "wall_ms_p99")
+
+
+class Command(BaseCommand):
+    help = "Print per-view SQL query count and latency percentiles recorded by the query profiler"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sort", choices=SORT_FIELDS, default=SORT_FIELDS[0])
+        parser.add_argument("--json", action="store_true", help="print report as JSON")
+        parser.add_argument("--reset", action="store_true", help="remove recorded samples after report")
+
+    def handle(self, *args, **options):
+        if get_config()["STORAGE"] != "sqlite":
+            self.stderr.write("Samples of 'memory' storage live in the web worker. "
+                              "Use QUERY_PROFILER['STORAGE'] = 'sqlite' to read them from command line.")
+
+        storage = get_storage()
+        rows = storage.report(sort_by=options["sort"])
+
+        if options["json"]:
+            self.stdout.write(json.dumps(rows, indent=2))
+        else:
+            width = max([len(row["view"]) for row in rows] + [4])
+            self.stdout.write("view".ljust(width) + "".join(column.rjust(16) for column in COLUMNS))
+            for row in rows:
+                self.stdout.write(row["view"].ljust(width) + "".join(str(row[column]).rjust(16) for column in COLUMNS))
+
+        if options["reset"]:
+            storage.reset()
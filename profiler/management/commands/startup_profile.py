@@ -0,0 +1,108 @@
+import json
+import os
+import subprocess
+import sys
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+"""
+Worker's startup: what a web (wsgi) or asgi worker imports before it serves the first request
+"""
+STARTUP_SCRIPTS = {
+    "wsgi": "import tasktracker.wsgi",
+    "asgi": "import tasktracker.asgi",
+}
+# heavy packages imported on first use, so they take neither startup time nor memory of a worker,
+# which never serves the pages they are needed for
+LAZY_PACKAGES = ("PIL", "diff_match_patch", "drf_yasg.views")
+# urlconf is loaded by the first request, workers load it anyway, so it's a part of startup
+LOAD_URLCONF = "from django.urls import get_resolver; get_resolver().url_patterns"
+
+# runs in a fresh interpreter, prints allocated memory per top-level package as JSON
+MEMORY_SCRIPT = """
+import json, sys, tracemalloc
+tracemalloc.start()
+{startup}
+snapshot = tracemalloc.take_snapshot()
+files = {{getattr(module, "__file__", None): name.split(".")[0] for name, module in list(sys.modules.items())}}
+memory = {{}}
+for stat in snapshot.statistics("filename"):
+    package = files.get(stat.traceback[0].filename)
+    if package:
+        memory[package] = memory.get(package, 0) + stat.size
+print(json.dumps({{"memory": memory, "modules": sorted(sys.modules)}}))
+"""
+
+
+def run_python(args, script):
+    env = dict(os.environ, DJANGO_SETTINGS_MODULE=os.environ.get("DJANGO_SETTINGS_MODULE", "tasktracker.settings"))
+    process = subprocess.run([sys.executable, *args, "-c", script], cwd=settings.BASE_DIR, env=env,
+                             capture_output=True, text=True)
+    if process.returncode:
+        raise CommandError(process.stderr.strip().splitlines()[-1])
+    return process
+
+
+def parse_import_times(importtime_output):
+    """
+    Sum "self" import time (microseconds) of "python -X importtime" output by top-level package
+    """
+    times = defaultdict(int)
+    for line in importtime_output.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_time, _, module = line[len("import time:"):].split("|")
+        times[module.strip().split(".")[0]] += int(self_time)
+    return times
+
+
+class Command(BaseCommand):
+    help = "Report import time and allocated memory per top-level package at worker's startup"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--worker", choices=sorted(STARTUP_SCRIPTS), default="wsgi")
+        parser.add_argument("--top", type=int, default=20, help="number of the heaviest packages to report")
+        parser.add_argument("--json", action="store_true", help="print report as JSON")
+
+    def handle(self, *args, **options):
+        startup = f"{STARTUP_SCRIPTS[options['worker']]}\n{LOAD_URLCONF}"
+
+        # memory and time are measured in separate runs: tracemalloc slows imports down
+        times = parse_import_times(run_python(["-X", "importtime"], startup).stderr)
+        memory_report = json.loads(run_python([], MEMORY_SCRIPT.format(startup=startup)).stdout)
+        memory = memory_report["memory"]
+
+        packages = sorted(set(times) | set(memory), key=lambda package: times.get(package, 0), reverse=True)
+        rows = [
+            {
+                "package": package,
+                "import_ms": round(times.get(package, 0) / 1000, 1),
+                "memory_kb": round(memory.get(package, 0) / 1024, 1),
+            }
+            for package in packages
+        ]
+        report = {
+            "worker": options["worker"],
+            "import_ms": round(sum(times.values()) / 1000, 1),
+            "memory_kb": round(sum(memory.values()) / 1024, 1),
+            "modules_loaded": len(memory_report["modules"]),
+            "packages": rows[:options["top"]],
+            "lazy_loaded_at_startup": [package for package in LAZY_PACKAGES if package in memory_report["modules"]],
+        }
+
+        if options["json"]:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+
+        self.stdout.write(f"{report['worker']} worker: {report['import_ms']} ms of imports, "
+                          f"{report['memory_kb']} KB allocated, {report['modules_loaded']} modules")
+        if report["lazy_loaded_at_startup"]:
+            self.stdout.write(self.style.WARNING(
+                "Loaded at startup, though should be imported on first use: "
+                + ", ".join(report["lazy_loaded_at_startup"])))
+        self.stdout.write("package".ljust(30) + "import ms".rjust(12) + "memory KB".rjust(12))
+        for row in report["packages"]:
+            self.stdout.write(row["package"].ljust(30) + str(row["import_ms"]).rjust(12)
+                              + str(row["memory_kb"]).rjust(12))
@@ -0,0 +1,67 @@
+import time
+from contextlib import ExitStack
+
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+from profiler.settings import get_config
+from profiler.storage import Sample, get_storage
+
+
+class QueryRecorder:
+    """
+    Database execute wrapper, that remembers every executed query with its duration
+    """
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((sql, repr(params), time.perf_counter() - start))
+
+    @property
+    def db_time(self):
+        return sum(duration for _, _, duration in self.queries)
+
+    @property
+    def duplicates(self):
+        """
+        Count of queries, that were already executed with the same sql and params during the request
+        """
+        return len(self.queries) - len({(sql, params) for sql, params, _ in self.queries})
+
+
+class QueryProfilerMiddleware:
+    """
+    Records SQL query count, duplicate queries, total DB time and wall time of every request
+    with resolved url name. Opt-in: enabled by QUERY_PROFILER["ENABLED"] setting
+    """
+
+    def __init__(self, get_response):
+        if not get_config()["ENABLED"]:
+            raise MiddlewareNotUsed
+
+        self.get_response = get_response
+        self.storage = get_storage()
+
+    def __call__(self, request):
+        recorder = QueryRecorder()
+        start = time.perf_counter()
+
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            response = self.get_response(request)
+
+        wall_time = time.perf_counter() - start
+        resolver_match = getattr(request, "resolver_match", None)
+
+        if resolver_match and resolver_match.view_name:
+            self.storage.add(resolver_match.view_name,
+                             Sample(len(recorder.queries), recorder.duplicates, recorder.db_time, wall_time))
+
+        return response
@@ -0,0 +1,21 @@
+from django.conf import settings
+
+"""
+Default query profiler's config, overridden by QUERY_PROFILER dict in project's settings.
+ENABLED - profiler is opt-in, when disabled middleware is removed from the chain at startup
+STORAGE - "memory" (per process) or "sqlite" (shared by processes, readable by management command)
+SQLITE_PATH - file for "sqlite" storage
+MAX_SAMPLES - how many latest samples to keep per url name
+"""
+DEFAULT_CONFIG = {
+    "ENABLED": False,
+    "STORAGE": "memory",
+    "SQLITE_PATH": "query_profile.sqlite3",
+    "MAX_SAMPLES": 1000,
+}
+
+
+def get_config():
+    config = dict(DEFAULT_CONFIG)
+    config.update(getattr(settings, "QUERY_PROFILER", {}))
+    return config
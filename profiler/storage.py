@@ -0,0 +1,142 @@
+import math
+import sqlite3
+import threading
+import time
+from collections import defaultdict, deque, namedtuple
+
+from profiler.settings import get_config
+
+Sample = namedtuple("Sample", ["queries", "duplicates", "db_time", "wall_time"])
+
+
+def percentile(values, percent):
+    """
+    Nearest-rank percentile of not empty list of values
+    """
+    ordered = sorted(values)
+    index = max(0, math.ceil(percent / 100 * len(ordered)) - 1)
+    return ordered[index]
+
+
+def summarize(view_name, samples):
+    queries = [sample.queries for sample in samples]
+    duplicates = [sample.duplicates for sample in samples]
+    db_times = [sample.db_time * 1000 for sample in samples]
+    wall_times = [sample.wall_time * 1000 for sample in samples]
+
+    return {
+        "view": view_name,
+        "requests": len(samples),
+        "queries_p50": percentile(queries, 50),
+        "queries_max": max(queries),
+        "duplicates_max": max(duplicates),
+        "db_ms_p50": round(percentile(db_times, 50), 2),
+        "db_ms_p95": round(percentile(db_times, 95), 2),
+        "wall_ms_p50": round(percentile(wall_times, 50), 2),
+        "wall_ms_p95": round(percentile(wall_times, 95), 2),
+        "wall_ms_p99": round(percentile(wall_times, 99), 2),
+    }
+
+
+class BaseStorage:
+    def add(self, view_name, sample):
+        raise NotImplementedError
+
+    def samples(self):
+        """
+        Returns dict: view name -> list of samples
+        """
+        raise NotImplementedError
+
+    def reset(self):
+        raise NotImplementedError
+
+    def report(self, sort_by="wall_ms_p95"):
+        rows = [summarize(view_name, samples) for view_name, samples in self.samples().items() if samples]
+        return sorted(rows, key=lambda row: row[sort_by], reverse=True)
+
+
+class MemoryStorage(BaseStorage):
+    """
+    Keeps latest samples in the process memory, so every worker has its own report
+    """
+
+    def __init__(self, max_samples):
+        self.max_samples = max_samples
+        self.lock = threading.Lock()
+        self.data = defaultdict(lambda: deque(maxlen=self.max_samples))
+
+    def add(self, view_name, sample):
+        with self.lock:
+            self.data[view_name].append(sample)
+
+    def samples(self):
+        with self.lock:
+            return {view_name: list(samples) for view_name, samples in self.data.items()}
+
+    def reset(self):
+        with self.lock:
+            self.data.clear()
+
+
+class SQLiteStorage(BaseStorage):
+    """
+    Keeps latest samples in local SQLite file (not in project's database, so profiling
+    does not add queries to the profiled ones), shared by all the workers
+    """
+
+    def __init__(self, path, max_samples):
+        self.path = str(path)
+        self.max_samples = max_samples
+
+        with self.connect() as db:
+            db.execute("CREATE TABLE IF NOT EXISTS samples (view_name TEXT, recorded_at REAL, queries INTEGER, "
+                       "duplicates INTEGER, db_time REAL, wall_time REAL)")
+            db.execute("CREATE INDEX IF NOT EXISTS samples_view_name ON samples (view_name)")
+
+    def connect(self):
+        return sqlite3.connect(self.path, timeout=5)
+
+    def add(self, view_name, sample):
+        with self.connect() as db:
+            db.execute("INSERT INTO samples VALUES (?, ?, ?, ?, ?, ?)", (view_name, time.time(), *sample))
+            db.execute("DELETE FROM samples WHERE view_name = ? AND rowid NOT IN "
+                       "(SELECT rowid FROM samples WHERE view_name = ? ORDER BY rowid DESC LIMIT ?)",
+                       (view_name, view_name, self.max_samples))
+
+    def samples(self):
+        result = defaultdict(list)
+
+        with self.connect() as db:
+            rows = db.execute("SELECT view_name, queries, duplicates, db_time, wall_time FROM samples")
+            for view_name, *values in rows:
+                result[view_name].append(Sample(*values))
+
+        return dict(result)
+
+    def reset(self):
+        with self.connect() as db:
+            db.execute("DELETE FROM samples")
+
+
+_storages = {}
+_storages_lock = threading.Lock()
+
+
+def get_storage():
+    """
+    Storage instance for current config (one per process)
+    """
+    config = get_config()
+    key = (config["STORAGE"], str(config["SQLITE_PATH"]), config["MAX_SAMPLES"])
+
+    with _storages_lock:
+        if key not in _storages:
+            if config["STORAGE"] == "sqlite":
+                _storages[key] = SQLiteStorage(config["SQLITE_PATH"], config["MAX_SAMPLES"])
+            elif config["STORAGE"] == "memory":
+                _storages[key] = MemoryStorage(config["MAX_SAMPLES"])
+            else:
+                raise ValueError("Unknown query profiler storage: {}".format(config["STORAGE"]))
+
+        return _storages[key]
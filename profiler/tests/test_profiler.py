@@ -0,0 +1,107 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse_lazy
+
+from profiler.management.commands.startup_profile import (
+    LAZY_PACKAGES, LOAD_URLCONF, STARTUP_SCRIPTS, parse_import_times, run_python,
+)
+from profiler.middleware import QueryRecorder
+from profiler.storage import get_storage, percentile, Sample, SQLiteStorage
+
+MEMORY_PROFILER = {"ENABLED": True, "STORAGE": "memory", "MAX_SAMPLES": 10}
+
+
+class PercentileTestCase(TestCase):
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 95), 95)
+        self.assertEqual(percentile(values, 100), 100)
+        self.assertEqual(percentile([7], 99), 7)
+
+    def test_duplicates(self):
+        recorder = QueryRecorder()
+        recorder.queries = [("SELECT 1", "()", 0.1), ("SELECT 1", "()", 0.1), ("SELECT 1", "(1,)", 0.1)]
+        self.assertEqual(recorder.duplicates, 1)
+        self.assertAlmostEqual(recorder.db_time, 0.3)
+
+
+@override_settings(QUERY_PROFILER=MEMORY_PROFILER)
+class QueryProfilerMiddlewareTestCase(TestCase):
+    def setUp(self) -> None:
+        self.user = get_user_model().objects.create_user(username="user1", password="12Asasas12", is_staff=True,
+                                                         is_superuser=True)
+        self.client.force_login(self.user)
+        get_storage().reset()
+
+    def test_samples_recorded_per_url_name(self):
+        for _ in range(3):
+            self.client.get(reverse_lazy("index"))
+
+        samples = get_storage().samples()["index"]
+        self.assertEqual(len(samples), 3)
+        self.assertTrue(all(sample.queries > 0 and sample.wall_time > 0 for sample in samples))
+
+    def test_admin_report_page(self):
+        self.client.get(reverse_lazy("index"))
+        response = self.client.get(reverse_lazy("profiler-report"))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("index", [row["view"] for row in response.context["rows"]])
+
+    def test_report_page_for_staff_only(self):
+        self.client.logout()
+        response = self.client.get(reverse_lazy("profiler-report"))
+        self.assertEqual(response.status_code, 302)
+
+    @override_settings(QUERY_PROFILER={"ENABLED": False})
+    def test_disabled_profiler_records_nothing(self):
+        self.client.get(reverse_lazy("index"))
+        self.assertEqual(get_storage().samples(), {})
+
+
+class SQLiteStorageTestCase(TestCase):
+    def setUp(self) -> None:
+        self.path = os.path.join(tempfile.mkdtemp(), "profile.sqlite3")
+
+    def tearDown(self) -> None:
+        os.remove(self.path)
+
+    def test_keeps_max_samples(self):
+        storage = SQLiteStorage(self.path, max_samples=5)
+        for i in range(8):
+            storage.add("index", Sample(i, 0, 0.01, 0.02))
+
+        samples = storage.samples()["index"]
+        self.assertEqual([sample.queries for sample in samples], [3, 4, 5, 6, 7])
+
+    def test_report_command(self):
+        with override_settings(QUERY_PROFILER={"STORAGE": "sqlite", "SQLITE_PATH": self.path}):
+            get_storage().add("index", Sample(4, 1, 0.01, 0.02))
+            out = StringIO()
+            call_command("profile_report", "--json", stdout=out)
+
+        self.assertEqual(json.loads(out.getvalue())[0]["queries_max"], 4)
+
+
+class StartupProfileTestCase(TestCase):
+    def test_parse_import_times(self):
+        output = "\n".join([
+            "import time: self [us] | cumulative | imported package",
+            "import time:       100 |        100 |     pandas._libs",
+            "import time:        50 |        150 |   pandas",
+            "import time:        20 |         20 | json",
+        ])
+        self.assertEqual(parse_import_times(output), {"pandas": 150, "json": 20})
+
+    def test_heavy_packages_are_not_loaded_at_startup(self):
+        for worker, startup in STARTUP_SCRIPTS.items():
+            script = f"{startup}\n{LOAD_URLCONF}\nimport sys\nprint(' '.join(sys.modules))"
+            modules = set(run_python([], script).stdout.split())
+            self.assertEqual([package for package in LAZY_PACKAGES if package in modules], [], worker)
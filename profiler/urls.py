@@ -0,0 +1,8 @@
+from django.contrib import admin
+from django.urls import path
+
+from profiler.views import report
+
+urlpatterns = [
+    path("", admin.site.admin_view(report), name="profiler-report"),
+]
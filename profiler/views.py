@@ -0,0 +1,32 @@
+from django.contrib import admin
+from django.shortcuts import redirect, render
+
+from profiler.settings import get_config
+from profiler.storage import get_storage
+
+SORT_FIELDS = ("wall_ms_p95", "queries_max", "duplicates_max", "db_ms_p95", "requests")
+
+
+def report(request):
+    """
+    Admin page with per-view query / latency percentiles
+    """
+    storage = get_storage()
+
+    if request.method == "POST" and "reset" in request.POST:
+        storage.reset()
+        return redirect("profiler-report")
+
+    sort_by = request.GET.get("sort", SORT_FIELDS[0])
+    if sort_by not in SORT_FIELDS:
+        sort_by = SORT_FIELDS[0]
+
+    context = dict(
+        admin.site.each_context(request),
+        title="Query profiler",
+        config=get_config(),
+        rows=storage.report(sort_by=sort_by),
+        sort_fields=SORT_FIELDS,
+        sort_by=sort_by,
+    )
+    return render(request, "profiler/report.html", context)
@@ -9,15 +9,22 @@ https://docs.djangoproject.com/en/3.1/howto/deployment/asgi/
 
 import os
 
-from channels.auth import AuthMiddlewareStack
-from channels.routing import ProtocolTypeRouter, URLRouter
-from django.core.asgi import get_asgi_application
+import django
 
-import chat.routing
+from tasktracker.asgi_handler import StreamingASGIHandler
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "tasktracker.settings")
 
-application = ProtocolTypeRouter({"http": get_asgi_application(),
+# set up Django before importing consumers, which import models (the same way get_asgi_application() does)
+django.setup(set_prefix=False)
+django_asgi_application = StreamingASGIHandler()
+
+from channels.auth import AuthMiddlewareStack  # noqa: E402
+from channels.routing import ProtocolTypeRouter, URLRouter  # noqa: E402
+
+import chat.routing  # noqa: E402
+
+application = ProtocolTypeRouter({"http": django_asgi_application,
                                   "websocket": AuthMiddlewareStack(
                                       URLRouter(chat.routing.websocket_urlpatterns)
                                   ),
@@ -0,0 +1,106 @@
+import re
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.utils.cache import patch_vary_headers
+from django.utils.text import compress_sequence, compress_string
+
+try:
+    import brotli
+except ImportError:  # optional, gzip only without it
+    brotli = None
+
+"""
+Compression of responses, overridden by RESPONSE_COMPRESSION dict in project's settings.
+ENABLED - opt-in, when disabled middleware is removed from the chain at startup
+MIN_SIZE - responses shorter than that (bytes) are sent as they are, streaming ones are compressed always
+CONTENT_TYPES - prefixes of compressed content types
+BROTLI - use brotli for clients accepting "br", if brotli package is installed
+BROTLI_QUALITY - 0..11, higher ones are too slow for compression on the fly
+"""
+DEFAULT_RESPONSE_COMPRESSION = {
+    "ENABLED": False,
+    "MIN_SIZE": 1024,
+    "CONTENT_TYPES": ("text/", "application/json", "application/javascript"),
+    "BROTLI": True,
+    "BROTLI_QUALITY": 4,
+}
+ACCEPT_ENCODING_RE = re.compile(r"\b(br|gzip)\b")
+
+
+def get_response_compression_config():
+    config = dict(DEFAULT_RESPONSE_COMPRESSION)
+    config.update(getattr(settings, "RESPONSE_COMPRESSION", {}))
+    return config
+
+
+def get_encoding(accept_encoding, config):
+    accepted = set(ACCEPT_ENCODING_RE.findall(accept_encoding))
+    if "br" in accepted and brotli and config["BROTLI"]:
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return None
+
+
+def compress_brotli_sequence(sequence, quality):
+    compressor = brotli.Compressor(quality=quality)
+    for item in sequence:
+        data = compressor.process(item)
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+class CompressionMiddleware:
+    """
+    Like django's GZipMiddleware, but opt-in, with size threshold, content type filter and brotli
+    """
+
+    def __init__(self, get_response):
+        self.config = get_response_compression_config()
+        if not self.config["ENABLED"]:
+            raise MiddlewareNotUsed
+
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if not self.is_compressible(response):
+            return response
+
+        patch_vary_headers(response, ("Accept-Encoding",))
+        encoding = get_encoding(request.META.get("HTTP_ACCEPT_ENCODING", ""), self.config)
+        if encoding is None:
+            return response
+
+        if response.streaming:
+            if encoding == "br":
+                response.streaming_content = compress_brotli_sequence(response.streaming_content,
+                                                                      self.config["BROTLI_QUALITY"])
+            else:
+                response.streaming_content = compress_sequence(response.streaming_content)
+            del response["Content-Length"]
+        else:
+            if encoding == "br":
+                content = brotli.compress(response.content, quality=self.config["BROTLI_QUALITY"])
+            else:
+                content = compress_string(response.content)
+            if len(content) >= len(response.content):
+                return response
+            response.content = content
+            response["Content-Length"] = str(len(content))
+
+        # body differs from the uncompressed one, so a strong ETag would be wrong
+        etag = response.get("ETag")
+        if etag and etag.startswith('"'):
+            response["ETag"] = "W/" + etag
+        response["Content-Encoding"] = encoding
+        return response
+
+    def is_compressible(self, response):
+        if response.has_header("Content-Encoding") or response.status_code < 200:
+            return False
+        if not response.get("Content-Type", "").startswith(tuple(self.config["CONTENT_TYPES"])):
+            return False
+        return response.streaming or len(response.content) >= self.config["MIN_SIZE"]
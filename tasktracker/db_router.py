@@ -0,0 +1,138 @@
+import random
+from contextlib import contextmanager
+
+from asgiref.local import Local
+from django.conf import settings
+from django.contrib.auth import SESSION_KEY
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+"""
+Read replica routing.
+DATABASE_REPLICAS - aliases of DATABASES to read from, empty - all the queries go to the primary ("default")
+REPLICA_PIN_SECONDS - how long reads of a user are pinned to the primary after the user's write request,
+    so the user reads own writes while replicas catch up. Pins are kept in the cache, by user id,
+    so they work for session and JWT clients alike, but with local memory cache only in the process,
+    which served the write: several workers need shared cache (memcached, file based)
+
+Reads go to replicas only inside of safe method (GET, HEAD, OPTIONS) requests, marked by ReplicaRoutingMiddleware,
+until the first write query of the request. Management commands, consumers etc. use the primary.
+Code which must not read stale data (for example to fill a cache) reads inside of use_primary().
+"""
+PIN_KEY = "replica-pin:{user_id}"
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+# stale session would log the user out or lose the flash messages right after login
+PRIMARY_ONLY_APPS = ("sessions",)
+
+_state = Local()
+
+
+def get_replicas():
+    return getattr(settings, "DATABASE_REPLICAS", [])
+
+
+def read_from_replica(enabled):
+    _state.read_from_replica = enabled
+
+
+def reads_from_replica():
+    return getattr(_state, "read_from_replica", False)
+
+
+@contextmanager
+def use_primary():
+    enabled = reads_from_replica()
+    read_from_replica(False)
+    try:
+        yield
+    finally:
+        read_from_replica(enabled)
+
+
+def switch_to_primary_on_write(execute, sql, params, many, context):
+    """
+    Execute wrapper of the primary's connection: read own writes of the rest of the request
+    """
+    if sql.lstrip()[:6].upper() != "SELECT":
+        read_from_replica(False)
+    return execute(sql, params, many, context)
+
+
+def get_user_id(request):
+    """
+    Id of the session's or JWT's user, without queries: the user itself is loaded later, by the view
+    """
+    session = getattr(request, "session", None)
+    if session is not None and SESSION_KEY in session:
+        return str(session[SESSION_KEY])
+
+    authentication = JWTAuthentication()
+    header = authentication.get_header(request)
+    raw_token = authentication.get_raw_token(header) if header else None
+    if raw_token is None:
+        return None
+    try:
+        return str(authentication.get_validated_token(raw_token)[api_settings.USER_ID_CLAIM])
+    except (InvalidToken, KeyError):
+        return None
+
+
+def pin_to_primary(*user_ids):
+    cache.set_many({PIN_KEY.format(user_id=user_id): True for user_id in user_ids if user_id},
+                   getattr(settings, "REPLICA_PIN_SECONDS", 5))
+
+
+def is_pinned(user_id):
+    return user_id is not None and cache.get(PIN_KEY.format(user_id=user_id), False)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        replicas = get_replicas()
+        if replicas and reads_from_replica() and model._meta.app_label not in PRIMARY_ONLY_APPS:
+            return random.choice(replicas)
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # replicas hold the same data as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return True
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Let safe method requests read from replicas, unless the user has written recently.
+    After a write request the user (the one of the request before and after the view: login, logout,
+    JWT authentication of API view) is pinned to the primary for REPLICA_PIN_SECONDS.
+    Goes after SessionMiddleware.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not get_replicas():
+            return self.get_response(request)
+
+        is_safe = request.method in SAFE_METHODS
+        user_id = get_user_id(request)
+        read_from_replica(is_safe and not is_pinned(user_id))
+
+        try:
+            with connections[DEFAULT_DB_ALIAS].execute_wrapper(switch_to_primary_on_write):
+                response = self.get_response(request)
+        finally:
+            read_from_replica(False)
+
+        if not is_safe:
+            user = getattr(request, "user", None)
+            pin_to_primary(user_id, str(user.id) if user is not None and user.is_authenticated else None)
+        return response
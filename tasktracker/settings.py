@@ -50,11 +50,15 @@ INSTALLED_APPS = [
     "channels",
     "django_filters",
     "backup.apps.BackUpConfig",
+    "profiler.apps.ProfilerConfig",
 ]
 
 MIDDLEWARE = [
+    "profiler.middleware.QueryProfilerMiddleware",
     "django.middleware.security.SecurityMiddleware",
+    "tasktracker.compression.CompressionMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
+    "tasktracker.db_router.ReplicaRoutingMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
@@ -86,13 +90,55 @@ WSGI_APPLICATION = "tasktracker.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/3.1/ref/settings/#databases
 
-DATABASES = {
-    "default": {
-        "ENGINE": "django.db.backends.sqlite3",
-        "NAME": BASE_DIR / "db.sqlite3",
+# DATABASE_ENGINE env switches between tuned SQLite (watch tasktracker/sqlite_backend) and PostgreSQL.
+# Connections are persistent for CONN_MAX_AGE seconds. With PostgreSQL behind a transaction pooler
+# (e.g. pgbouncer on DATABASE_HOST/DATABASE_PORT) set DATABASE_POOLER=1: server side cursors don't survive it.
+DATABASE_ENGINE = os.environ.get("DATABASE_ENGINE", "sqlite")
+CONN_MAX_AGE = int(os.environ.get("DATABASE_CONN_MAX_AGE", 60))
+
+
+def database_settings(location):
+    """
+    location - PostgreSQL host or SQLite file
+    """
+    if DATABASE_ENGINE == "postgres":
+        return {
+            "ENGINE": "django.db.backends.postgresql",
+            "NAME": os.environ.get("DATABASE_NAME", "tasktracker"),
+            "USER": os.environ.get("DATABASE_USER", "tasktracker"),
+            "PASSWORD": os.environ.get("DATABASE_PASSWORD", ""),
+            "HOST": location,
+            "PORT": os.environ.get("DATABASE_PORT", "5432"),
+            "CONN_MAX_AGE": CONN_MAX_AGE,
+            "DISABLE_SERVER_SIDE_CURSORS": os.environ.get("DATABASE_POOLER") == "1",
+            "OPTIONS": {"connect_timeout": 5},
+        }
+
+    return {
+        "ENGINE": "tasktracker.sqlite_backend",
+        "NAME": BASE_DIR / location,
+        "CONN_MAX_AGE": CONN_MAX_AGE,
+        "OPTIONS": {"pragmas": {"busy_timeout": int(os.environ.get("SQLITE_BUSY_TIMEOUT", 5000))}},
     }
+
+
+DATABASES = {
+    "default": database_settings(
+        os.environ.get("DATABASE_HOST", "localhost") if DATABASE_ENGINE == "postgres"
+        else os.environ.get("SQLITE_FILE", "db.sqlite3")
+    ),
 }
 
+# Read replicas (watch tasktracker/db_router.py): comma separated SQLite files or PostgreSQL hosts
+# in DATABASE_REPLICAS env, in tests they mirror "default" (watch tasktracker/settings_replica.py for separate files)
+DATABASE_REPLICAS = []
+for index, replica in enumerate(filter(None, os.environ.get("DATABASE_REPLICAS", "").split(","))):
+    DATABASES[f"replica{index}"] = dict(database_settings(replica), TEST={"MIRROR": "default"})
+    DATABASE_REPLICAS.append(f"replica{index}")
+
+DATABASE_ROUTERS = ["tasktracker.db_router.ReplicaRouter"]
+REPLICA_PIN_SECONDS = 5
+
 # Password validation
 # https://docs.djangoproject.com/en/3.1/ref/settings/#auth-password-validators
 
@@ -132,13 +178,31 @@ STATIC_ROOT = os.path.join(BASE_DIR, "static")
 
 # REST API conf
 REST_FRAMEWORK = {
-    "DEFAULT_PAGINATION_CLASS": "rest_framework.pagination.PageNumberPagination",
+    "DEFAULT_PAGINATION_CLASS": "trackerapp.api.pagination.PrecountedPageNumberPagination",
     "PAGE_SIZE": 5,
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "trackerapp.api.authentication.CachedJWTAuthentication",
+    ),
+    # anonymous clients are throttled by address: X-Forwarded-For is trusted only behind that many proxies,
+    # with 0 REMOTE_ADDR is used, so clients can't dodge limits with forged header
+    "NUM_PROXIES": int(os.environ.get("NUM_PROXIES", 0)),
+    "DEFAULT_THROTTLE_CLASSES": (
+        "trackerapp.api.throttling.UserTokenBucketThrottle",
+        "trackerapp.api.throttling.ScopedTokenBucketThrottle",
     ),
 }
 
+# Token bucket limits of REST API requests per user, SCOPES - per view's throttle_scope
+# (watch trackerapp/api/throttling.py), throttled clients are listed by /api/throttling/
+API_THROTTLE = {
+    "RATE": 10,
+    "BURST": 50,
+    "SCOPES": {
+        "token": {"RATE": 0.1, "BURST": 10},
+    },
+    "CACHE": "default",
+}
+
 MEDIA_ROOT = os.path.join(BASE_DIR, "media")
 MEDIA_URL = "/media/"
 
@@ -161,6 +225,55 @@ CHANNEL_LAYERS = {
     },
 }
 
+# Per-view SQL query count / latency profiling (watch profiler/settings.py), opt-in
+QUERY_PROFILER = {
+    "ENABLED": os.environ.get("QUERY_PROFILER_ENABLED") == "1",
+    "STORAGE": os.environ.get("QUERY_PROFILER_STORAGE", "memory"),
+    "SQLITE_PATH": BASE_DIR / "query_profile.sqlite3",
+}
+
+# Cached task lists are invalidated by per-user version keys, so with several worker processes the cache
+# has to be shared by them (e.g. CACHE_BACKEND=django.core.cache.backends.memcached.MemcachedCache)
+CACHES = {
+    "default": {
+        "BACKEND": os.environ.get("CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"),
+        "LOCATION": os.environ.get("CACHE_LOCATION", ""),
+    }
+}
+TASK_LIST_CACHE_TIMEOUT = 300
+# seconds to keep user resolved by API's JWT authentication, per process with local memory cache: other workers
+# may accept deactivated or deleted user that long (watch trackerapp/api/authentication.py)
+JWT_USER_CACHE_TIMEOUT = 60
+
+# gzip/brotli compression of responses (watch tasktracker/compression.py), opt-in.
+# Compressed pages with CSRF tokens are open to BREACH, enable with that in mind
+RESPONSE_COMPRESSION = {
+    "ENABLED": os.environ.get("RESPONSE_COMPRESSION_ENABLED") == "1",
+    "MIN_SIZE": 1024,
+}
+
+# Retention policy of task/attachment history, applied by "compact_history" command
+# (watch trackerapp/history_retention.py)
+HISTORY_RETENTION = {
+    "COALESCE_WINDOW_MINUTES": 10,
+    "ARCHIVE_AFTER_DAYS": 365,
+}
+
+# Retention policy of chat messages, applied by monthly "archive_chat_messages" command
+# (watch chat/retention.py), room's retention_days overrides RETENTION_DAYS
+CHAT_RETENTION = {
+    "ARCHIVE_AFTER_DAYS": 90,
+    "RETENTION_DAYS": None,
+}
+
+# Limits of chat's websocket connections: inbound token bucket and coalescing of outbound messages
+# (watch chat/throttling.py)
+CHAT_LIMITS = {
+    "INBOUND_RATE": 5,
+    "INBOUND_BURST": 10,
+    "FLUSH_INTERVAL_MS": 20,
+}
+
 SWAGGER_SETTINGS = {
     'SECURITY_DEFINITIONS': {
         "api_key": {
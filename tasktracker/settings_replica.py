@@ -0,0 +1,21 @@
+"""
+Settings to simulate a primary and a read replica with two SQLite files, which are not replicated at all
+(as a replica lagging forever), so only tests of routing itself make sense with them:
+python manage.py test trackerapp.tests.test_db_router --settings=tasktracker.settings_replica
+"""
+from tasktracker.settings import *  # noqa: F401,F403
+from tasktracker.settings import BASE_DIR
+
+DATABASES = {
+    "default": {
+        "ENGINE": "tasktracker.sqlite_backend",
+        "NAME": BASE_DIR / "primary.sqlite3",
+        "TEST": {"NAME": BASE_DIR / "test_primary.sqlite3"},
+    },
+    "replica": {
+        "ENGINE": "tasktracker.sqlite_backend",
+        "NAME": BASE_DIR / "replica.sqlite3",
+        "TEST": {"NAME": BASE_DIR / "test_replica.sqlite3"},
+    },
+}
+DATABASE_REPLICAS = ["replica"]
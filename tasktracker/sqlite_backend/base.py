@@ -0,0 +1,31 @@
+from django.db.backends.sqlite3 import base
+
+"""
+SQLite backend, which tunes every new connection for concurrent web/chat access:
+WAL journal lets readers work while a writer commits, busy_timeout makes writers wait for the lock
+instead of failing with "database is locked", synchronous=NORMAL is safe with WAL and fsyncs less.
+Pragmas are overridden by OPTIONS["pragmas"] of the database settings.
+"""
+DEFAULT_PRAGMAS = {
+    "journal_mode": "WAL",
+    "busy_timeout": 5000,
+    "synchronous": "NORMAL",
+    "mmap_size": 128 * 1024 * 1024,
+}
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def get_connection_params(self):
+        self.pragmas = dict(DEFAULT_PRAGMAS, **self.settings_dict["OPTIONS"].get("pragmas", {}))
+        # sqlite3.connect() doesn't accept pragmas; settings_dict is shared by connections of all threads,
+        # so pragmas are removed from the returned params, not from the settings
+        params = super().get_connection_params()
+        params.pop("pragmas", None)
+        return params
+
+    def get_new_connection(self, conn_params):
+        connection = super().get_new_connection(conn_params)
+        for pragma, value in self.pragmas.items():
+            if value is not None:
+                connection.execute(f"PRAGMA {pragma} = {value}")
+        return connection
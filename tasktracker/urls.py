@@ -19,13 +19,12 @@ from django.contrib import admin
 from django.urls import include
 from django.urls import path
 from rest_framework import routers
-from rest_framework_simplejwt.views import (
-    TokenObtainPairView,
-    TokenRefreshView,
-)
 
 from trackerapp.api import apiviews
-from trackerapp.api.apiviews import AttachmentViewSet, MessageViewSet, TaskHistoryListAPIView
+from trackerapp.api.apiviews import (
+    AttachmentViewSet, MessageViewSet, TaskHistoryListAPIView, ThrottleMetricsAPIView,
+    ThrottledTokenObtainPairView, ThrottledTokenRefreshView,
+)
 from .yasg import urlpatterns as yasg_urls
 
 router = routers.DefaultRouter()
@@ -40,6 +39,7 @@ urlpatterns = [
 
     path("", include("trackerapp.urls")),
     path("chat/", include("chat.urls")),
+    path("admin/profiler/", include("profiler.urls")),
     path("admin/", admin.site.urls),
     path("accounts/", include("django.contrib.auth.urls")),
     path("backup/", include("backup.urls")),
@@ -50,10 +50,11 @@ urlpatterns = [
         path('task/<pk>/attachments/', AttachmentViewSet.as_view({'get': 'list'}), name='task-attachment-list-api'),
         path('task/<pk>/messages/', MessageViewSet.as_view({'get': 'list'}), name='task-message-list-api'),
         path('task/<pk>/history/', TaskHistoryListAPIView.as_view(), name='task-history-list-api'),
+        path('throttling/', ThrottleMetricsAPIView.as_view(), name='throttle-metrics-api'),
         path("auth/", include("rest_framework.urls", namespace="rest_framework")),
         path("token/", include([
-            path("", TokenObtainPairView.as_view(), name="token_obtain_pair"),
-            path("refresh/", TokenRefreshView.as_view(), name="token_refresh"),
+            path("", ThrottledTokenObtainPairView.as_view(), name="token_obtain_pair"),
+            path("refresh/", ThrottledTokenRefreshView.as_view(), name="token_refresh"),
         ]))
     ])),
 ]
@@ -1,20 +1,44 @@
+from functools import lru_cache
+
 from django.urls import path, re_path
-from drf_yasg import openapi
-from drf_yasg.views import get_schema_view
 from rest_framework import permissions
 
-schema_view = get_schema_view(
-    openapi.Info(title="Task Tracker",
-                 default_version='v1',
-                 description="Organize your task intelligently",
-                 license=openapi.License(name="BlackSun License")
-                 ),
-    public=True,
-    permission_classes=(permissions.AllowAny,)
-)
+
+# drf_yasg with its schema generators is heavy, so it's imported by the first request to the docs,
+# not by every worker at startup
+@lru_cache(maxsize=None)
+def get_docs_view(renderer=None):
+    from drf_yasg import openapi
+    from drf_yasg.views import get_schema_view
+
+    schema_view = get_schema_view(
+        openapi.Info(title="Task Tracker",
+                     default_version='v1',
+                     description="Organize your task intelligently",
+                     license=openapi.License(name="BlackSun License")
+                     ),
+        public=True,
+        permission_classes=(permissions.AllowAny,)
+    )
+    if renderer:
+        return schema_view.with_ui(renderer, cache_timeout=0)
+    return schema_view.without_ui(cache_timeout=0)
+
+
+def schema(request, *args, **kwargs):
+    return get_docs_view()(request, *args, **kwargs)
+
+
+def swagger_ui(request, *args, **kwargs):
+    return get_docs_view('swagger')(request, *args, **kwargs)
+
+
+def redoc_ui(request, *args, **kwargs):
+    return get_docs_view('redoc')(request, *args, **kwargs)
+
 
 urlpatterns = [
-    re_path('swagger(?P<format>\.json|\.yaml)', schema_view.without_ui(cache_timeout=0), name='schema-json'),
-    path('swagger/', schema_view.with_ui('swagger', cache_timeout=0), name='schema-swagger-ui'),
-    path('redoc/', schema_view.with_ui('redoc', cache_timeout=0), name='schema-redoc'),
+    re_path('swagger(?P<format>\.json|\.yaml)', schema, name='schema-json'),
+    path('swagger/', swagger_ui, name='schema-swagger-ui'),
+    path('redoc/', redoc_ui, name='schema-redoc'),
 ]
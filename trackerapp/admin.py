@@ -1,6 +1,6 @@
 from django.contrib import admin
 
-from .models import TaskModel, Message, UserProfile, Attachment
+from .models import TaskModel, Message, UserProfile, Attachment, TaskStats, HistoryArchive
 
 
 @admin.register(TaskModel)
@@ -33,3 +33,16 @@ class AttachmentAdmin(admin.ModelAdmin):
 class UserProfileAdmin(admin.ModelAdmin):
     list_display = ("owner", "picture")
     list_filter = ("owner",)
+
+
+@admin.register(TaskStats)
+class TaskStatsAdmin(admin.ModelAdmin):
+    list_display = ("user", "status", "owned_count", "assigned_count")
+    list_filter = ("user", "status")
+
+
+@admin.register(HistoryArchive)
+class HistoryArchiveAdmin(admin.ModelAdmin):
+    list_display = ("model_label", "object_id", "record_count", "first_date", "last_date", "archived_at")
+    list_filter = ("model_label", "archived_at")
+    exclude = ("payload",)
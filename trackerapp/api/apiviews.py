@@ -1,20 +1,26 @@
+import heapq
+
 from django.contrib.auth.models import User, Group
 from django.core.exceptions import PermissionDenied
 from django.db.models import Q
 from rest_framework import viewsets, mixins, permissions, status, response, generics
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.decorators import action
+from rest_framework.permissions import IsAuthenticated, IsAdminUser
+from rest_framework.views import APIView
+from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 
 from trackerapp.api.permissions import (
-    IsOwnerOrAssigneeREST, FullPermissionDenied, IsOwnerREST, IsTaskOwnerOrAssigneeREST,
+    IsOwnerOrAssigneeREST, FullPermissionDenied, IsOwnerREST, IsTaskOwnerOrAssigneeREST, is_task_member,
 )
 from trackerapp.api.serializers import (
     UserSerializer,
     GroupSerializer,
     TaskSerializer,
-    MessageSerializer, ProfileSerializer, AttachmentSerializer, UserRegisterSerializer, TaskHistorySerializer,
-    AttachmentHistorySerializer,
+    MessageSerializer, ProfileSerializer, AttachmentSerializer, UserRegisterSerializer, get_history_serializer_class,
 )
-from trackerapp.models import Message, TaskModel, UserProfile, Attachment
+from trackerapp.api.streaming import StreamingJSONListMixin, iterate_keyset
+from trackerapp.api.throttling import get_throttle_metrics
+from trackerapp.models import Message, TaskModel, UserProfile, Attachment, TaskStats
 
 
 class RelatedModelViewSet(viewsets.ModelViewSet):
@@ -24,17 +30,34 @@ class RelatedModelViewSet(viewsets.ModelViewSet):
     """
     related_model = None  # for example TaskModel
     base_model = None  # for example if related model is TaskModel than base_model - is Attachment or Message
+    precount_field = None  # related model's counter of base model instances, for example "message_count"
+    related_instance = None
     permission_classes = [permissions.IsAuthenticated, IsOwnerOrAssigneeREST]
 
+    def get_precount(self):
+        """
+        Count of base model instances related to the requested related model instance,
+        taken from denormalized counter (used by pagination instead of COUNT query)
+        """
+        if self.precount_field and self.related_instance:
+            return getattr(self.related_instance, self.precount_field)
+        return None
+
     def get_related_instance(self):
         return self.related_model.objects.filter(id__exact=self.kwargs['pk']).first()
 
+    def get_base_queryset(self):
+        """
+        base model instances with relations, which permission checks and serializer read
+        """
+        return self.base_model.objects.select_related("owner", "task__owner", "task__assignee")
+
     def get_object(self):
         """
-        get base model instance
+        get base model instance. Not visible one is fetched too, so the response is 403, not 404
         :return:
         """
-        obj = self.base_model.objects.filter(id=self.kwargs['pk']).first()
+        obj = self.get_base_queryset().filter(id=self.kwargs['pk']).first()
         self.check_object_permissions(self.request, obj)
         return obj
 
@@ -51,23 +74,22 @@ class RelatedModelViewSet(viewsets.ModelViewSet):
         except KeyError:
             pass
 
-        if related_model_instance and not (
-                related_model_instance.owner == request_user or related_model_instance.assignee == request_user):
+        if related_model_instance and not is_task_member(request_user, related_model_instance):
             raise PermissionDenied('Trying request disallowed related {}'.format(type(related_model_instance).__name__))
 
-        request_user = self.request.user
+        self.related_instance = related_model_instance
 
-        query = (
-                Q(task_id=related_model_instance.id) & (
-                Q(task__owner__exact=request_user) | Q(task__assignee__exact=request_user))) \
-            if related_model_instance else (Q(task__owner__exact=request_user) | Q(task__assignee__exact=request_user))
+        query = IsOwnerOrAssigneeREST.get_visibility_filter(request_user)
+        if related_model_instance:
+            query &= Q(task_id=related_model_instance.id)
 
-        return self.base_model.objects.filter(query).order_by("creation_date")
+        return self.get_base_queryset().filter(query).order_by("creation_date")
 
 
 class AttachmentViewSet(RelatedModelViewSet):
     base_model = Attachment
     related_model = TaskModel
+    precount_field = "attachment_count"
     queryset = Attachment.objects.all()
     serializer_class = AttachmentSerializer
 
@@ -85,7 +107,7 @@ class AttachmentViewSet(RelatedModelViewSet):
 
         request_user = self.request.user
 
-        if related_task and (request_user == related_task.get_owner() or request_user == related_task.get_assignee()):
+        if is_task_member(request_user, related_task):
             serializer.save(owner=request_user, task=related_task)
         else:
             raise PermissionDenied("Have no permission to set attachment to the task(id)={}".format(related_task.id))
@@ -97,6 +119,7 @@ class MessageViewSet(RelatedModelViewSet):
     """
     base_model = Message
     related_model = TaskModel
+    precount_field = "message_count"
     queryset = Message.objects.all()
     serializer_class = MessageSerializer
 
@@ -114,7 +137,7 @@ class MessageViewSet(RelatedModelViewSet):
 
         request_user = self.request.user
 
-        if related_task and (request_user == related_task.get_owner() or request_user == related_task.get_assignee()):
+        if is_task_member(request_user, related_task):
             serializer.save(owner=request_user, task=related_task)
         else:
             raise PermissionDenied("Have no permission to set message to the task(id)={}".format(related_task.id))
@@ -152,41 +175,52 @@ class TaskViewSet(viewsets.ModelViewSet):
         """Get owned by / assigned to user tasks"""
         return TaskModel.objects.all().filter(
             Q(owner__exact=self.request.user) | Q(assignee__exact=self.request.user)
-        )
+        ).select_related("owner", "assignee")
 
+    @action(detail=False, methods=['get'])
+    def stats(self, request):
+        """
+        Count of owned by / assigned to user tasks per status. Read from materialized TaskStats,
+        so no task rows are scanned
+        """
+        return response.Response(TaskStats.objects.summary(request.user))
 
-class TaskHistoryListAPIView(generics.ListAPIView):
+
+class TaskHistoryListAPIView(StreamingJSONListMixin, generics.ListAPIView):
     """
     To view list of events in history for task and related to it attachments
     """
-    task_serializer_class = TaskHistorySerializer
-    attachment_serializer_class = AttachmentHistorySerializer
     permission_classes = [permissions.IsAuthenticated, IsTaskOwnerOrAssigneeREST]
+    stream_key = 'history'
 
-    def get_queryset_task(self):
-        return TaskModel.objects.filter(id=self.kwargs['pk'])
+    def get_history_querysets(self):
+        """
+        Historical records of the task and of its attachments, one query per historical model,
+        each ordered by history date (and id of the record), the latest first
+        """
+        return (
+            TaskModel.history.filter(id=self.kwargs['pk']).order_by('-history_date', '-history_id'),
+            Attachment.history.filter(task_id=self.kwargs['pk']).order_by('-history_date', '-history_id'),
+        )
 
-    def get_queryset_attachment(self):
-        return Attachment.objects.filter(task_id__exact=TaskModel.objects.filter(id=self.kwargs['pk']).first().id)
+    def get_stream_rows(self):
+        """
+        Merge of historical records of all the models, read by slices and serialized one at a time
+        """
+        rows = []
+        for queryset in self.get_history_querysets():
+            serializer = get_history_serializer_class(queryset.model)()
+            rows.append(serializer.to_representation(record) for record in iterate_keyset(queryset))
+        return heapq.merge(*rows, key=lambda row: row['history_date'], reverse=True)
 
     def list(self, request, *args, **kwargs):
         """
         Here form result list, which consists of the task's history and
         of the related to the task attachment's history, ordered by history date
         """
-        history_list = []
-        tasks = self.task_serializer_class(self.get_queryset_task(), many=True)
-        attachments = self.attachment_serializer_class(self.get_queryset_attachment(), many=True)
-
-        # Get the history of tasks and attachments from the corresponding query sets
-        # type(task.data) = rest_framework.utils.serializers_helpers.ReturnList
-        # type(tasks.data[0]) = collections.OrderedDict
-        history_list.extend(list(list(tasks.data)[0]['history']))
-        history_list.extend(list(list(attachments.data)[0]['history']))
-
-        history_list.sort(key=lambda a: a['history_date'], reverse=True)
-        print(history_list)
-        return response.Response({'history': history_list})
+        if self.wants_stream(request):
+            return self.get_streaming_response()
+        return response.Response({'history': list(self.get_stream_rows())})
 
 
 class UserViewSet(
@@ -242,3 +276,22 @@ class ProfileViewSet(viewsets.ModelViewSet):
         self.perform_create(serializer)
         headers = self.get_success_headers(serializer.data)
         return response.Response(serializer.data, status=status.HTTP_201_CREATED, headers=headers)
+
+
+class ThrottledTokenObtainPairView(TokenObtainPairView):
+    throttle_scope = "token"
+
+
+class ThrottledTokenRefreshView(TokenRefreshView):
+    throttle_scope = "token"
+
+
+class ThrottleMetricsAPIView(APIView):
+    """
+    Clients, whose requests were throttled, with count of throttled requests
+    """
+    permission_classes = [IsAdminUser]
+    throttle_classes = []
+
+    def get(self, request):
+        return response.Response({'throttled': get_throttle_metrics()})
@@ -0,0 +1,47 @@
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import models
+from django.dispatch import receiver
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+"""
+User resolved by JWT is cached for JWT_USER_CACHE_TIMEOUT seconds, the entry is dropped when the user is saved
+or deleted (watch signals below, connected by TrackerappConfig.ready). The entry is dropped from the cache of
+the process, which saved the user: with local memory cache other worker processes keep authenticating
+deactivated or deleted user until the timeout, only shared cache (memcached, file based) drops it everywhere.
+Changes made by queryset's update() are seen after the timeout as well
+"""
+USER_KEY = "jwt-user:{user_id}"
+
+
+def get_timeout():
+    return getattr(settings, "JWT_USER_CACHE_TIMEOUT", 60)
+
+
+def forget_user(user_id):
+    cache.delete(USER_KEY.format(user_id=user_id))
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken("Token contained no recognizable user identification")
+
+        key = USER_KEY.format(user_id=user_id)
+        user = cache.get(key)
+        if user is None:
+            # raises AuthenticationFailed for unknown and inactive users, so only active ones are cached
+            user = super().get_user(validated_token)
+            cache.set(key, user, get_timeout())
+        return user
+
+
+@receiver(models.signals.post_save, sender=User)
+@receiver(models.signals.post_delete, sender=User)
+def forget_authenticated_user(sender, instance, **kwargs):
+    forget_user(instance.id)
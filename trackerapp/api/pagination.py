@@ -0,0 +1,20 @@
+from functools import partial
+
+from rest_framework.pagination import PageNumberPagination
+
+from trackerapp.extended_generics import PrecountedPaginator
+
+
+class PrecountedPageNumberPagination(PageNumberPagination):
+    """
+    Takes total count of objects from view.get_precount() (if view has it and knows the count),
+    to skip COUNT(*) query
+    """
+
+    def paginate_queryset(self, queryset, request, view=None):
+        count = view.get_precount() if hasattr(view, 'get_precount') else None
+
+        if count is not None:
+            self.django_paginator_class = partial(PrecountedPaginator, count=count)
+
+        return super().paginate_queryset(queryset, request, view=view)
@@ -1,3 +1,4 @@
+from django.db.models import Q
 from rest_framework import permissions
 
 
@@ -9,6 +10,13 @@ class FullPermissionDenied(permissions.BasePermission):
         return False
 
 
+def is_task_member(user, task):
+    """
+    Compare ids, so task's owner and assignee are not loaded
+    """
+    return task is not None and user.id is not None and user.id in (task.owner_id, task.assignee_id)
+
+
 class IsOwnerREST(permissions.BasePermission):
     """
     Custom permission to allow owner manipulate with obj only
@@ -21,8 +29,8 @@ class IsOwnerREST(permissions.BasePermission):
 class IsTaskOwnerOrAssigneeREST(permissions.BasePermission):
     def has_object_permission(self, request, view, obj):
         if view.action == 'retrieve' or view.action == 'partial_update':
-            return obj and (obj.get_owner() == request.user or obj.get_assignee() == request.user)
-        return obj and obj.get_owner() == request.user
+            return is_task_member(request.user, obj)
+        return obj is not None and obj.owner_id == request.user.id
 
 
 class IsOwnerOrAssigneeREST(permissions.BasePermission):
@@ -31,6 +39,13 @@ class IsOwnerOrAssigneeREST(permissions.BasePermission):
     instance user
     """
 
+    @staticmethod
+    def get_visibility_filter(user):
+        """
+        The same rule for querysets: list and detail routes of a viewset see the same instances
+        """
+        return Q(owner=user) | Q(task__owner=user) | Q(task__assignee=user)
+
     def has_object_permission(self, request, view, obj):
-        return obj and (
-                obj.get_owner() == request.user or obj.get_assignee() == request.user or obj.get_related_obj_owner() == request.user)
+        # obj's task is joined by the viewset (watch RelatedModelViewSet.get_object), so no queries here
+        return obj is not None and (obj.owner_id == request.user.id or is_task_member(request.user, obj.task))
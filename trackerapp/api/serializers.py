@@ -38,6 +38,14 @@ class GroupSerializer(serializers.ModelSerializer):
         fields = ("id", "name")
 
 
+def get_history_serializer_class(history_model):
+    """
+    Serializer class for records of simple_history's historical model
+    """
+    meta = type("Meta", (), {"model": history_model, "fields": "__all__"})
+    return type("{}Serializer".format(history_model.__name__), (serializers.ModelSerializer,), {"Meta": meta})
+
+
 def init_history(obj):
     model = obj.history.__dict__['model']
     serializer = HistorySerializer(model, obj.history.all().order_by('-history_date'), many=True)
@@ -70,7 +78,8 @@ class AttachmentHistorySerializer(serializers.ModelSerializer):
 class TaskSerializer(serializers.ModelSerializer):
     class Meta:
         model = TaskModel
-        fields = ("id", "title", "description", "owner", "assignee_username", "assignee", "status", "creation_date")
+        fields = ("id", "title", "description", "owner", "assignee_username", "assignee", "status", "creation_date",
+                  "message_count", "attachment_count", "last_activity_at")
         extra_kwargs = {'assignee': {'write_only': True}}
 
     owner = serializers.ReadOnlyField(source="owner.username")
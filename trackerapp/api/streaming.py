@@ -0,0 +1,81 @@
+import json
+
+from django.db.models import Q
+from django.http import StreamingHttpResponse
+from rest_framework.utils.encoders import JSONEncoder
+
+# rows are sent in chunks of about that size, not one write per row
+CHUNK_SIZE = 16 * 1024
+# rows are read from DB by slices of that size
+SLICE_SIZE = 500
+
+
+def get_after_filter(ordering, row):
+    """
+    Q of rows following the row by the ordering, for example ("-history_date", "-history_id")
+    """
+    condition, equal = Q(), {}
+    for field in ordering:
+        name = field.lstrip("-")
+        lookup = "{}__{}".format(name, "lt" if field.startswith("-") else "gt")
+        condition |= Q(**equal, **{lookup: getattr(row, name)})
+        equal[name] = getattr(row, name)
+    return condition
+
+
+def iterate_keyset(queryset, slice_size=None):
+    """
+    Rows of the queryset read by slices, each one starts after the last row of the previous slice
+    by the queryset's ordering, which must identify a row. No cursor stays open between slices,
+    so they may be read by different threads, one after another
+    """
+    slice_size = slice_size or SLICE_SIZE
+    ordering = queryset.query.order_by
+
+    rows = list(queryset[:slice_size])
+    while rows:
+        yield from rows
+        if len(rows) < slice_size:
+            return
+        rows = list(queryset.filter(get_after_filter(ordering, rows[-1]))[:slice_size])
+
+
+def iterate_json_object(key, rows):
+    """
+    Encode {key: [row, ...]} piece by piece, rows - iterable of serialized rows
+    """
+    encoder = JSONEncoder()
+    chunk = ["{%s: [" % json.dumps(key)]
+    size = 0
+    for number, row in enumerate(rows):
+        encoded = encoder.encode(row)
+        chunk.append("," + encoded if number else encoded)
+        size += len(encoded)
+        if size >= CHUNK_SIZE:
+            yield "".join(chunk)
+            chunk, size = [], 0
+    chunk.append("]}")
+    yield "".join(chunk)
+
+
+class StreamingJSONListMixin:
+    """
+    List view mixin: JSON list is serialized and sent row by row (rows are read by iterate_keyset()),
+    not rendered in memory. Browsable API and other renderers get usual response.
+    Under ASGI body's chunks are produced in a worker thread (watch tasktracker/asgi_handler.py),
+    so rows are read while the response is sent there too
+    """
+    stream_key = "results"
+
+    def get_stream_rows(self):
+        """
+        Iterable of serialized rows
+        """
+        raise NotImplementedError
+
+    def wants_stream(self, request):
+        return getattr(request, "accepted_renderer", None) is not None and request.accepted_renderer.format == "json"
+
+    def get_streaming_response(self):
+        return StreamingHttpResponse(iterate_json_object(self.stream_key, self.get_stream_rows()),
+                                     content_type="application/json")
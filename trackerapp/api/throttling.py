@@ -0,0 +1,131 @@
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.throttling import BaseThrottle
+
+from chat.throttling import TokenBucket
+
+"""
+Default limits of REST API requests, overridden by API_THROTTLE dict in project's settings.
+RATE - requests per second a user (an address for anonymous requests) may send to the whole API,
+    token bucket refill rate
+BURST - requests a user may send at once, token bucket capacity
+SCOPES - stricter per endpoint limits: view's throttle_scope -> {"RATE": ..., "BURST": ...}
+CACHE - alias of the cache, which keeps buckets. Local memory cache limits each worker process separately,
+    file based cache is shared by workers of the host
+METRICS_TIMEOUT - seconds to keep counts of throttled requests since the last throttled request
+METRICS_MAX_CLIENTS - how many the most throttled clients are counted, others are dropped from the metrics
+
+Buckets are read and written back without lock (cache has no compare-and-set), so concurrent requests
+of a client may see the same token count: a client sending requests in parallel could exceed
+the limit by the count of parallel requests, steady abuse is still limited
+"""
+DEFAULT_API_THROTTLE = {
+    "RATE": 10,
+    "BURST": 50,
+    "SCOPES": {},
+    "CACHE": "default",
+    "METRICS_TIMEOUT": 24 * 60 * 60,
+    "METRICS_MAX_CLIENTS": 100,
+}
+BUCKET_KEY = "api-throttle:{scope}:{ident}"
+METRICS_KEY = "api-throttle:metrics"
+
+
+def get_api_throttle_config():
+    config = dict(DEFAULT_API_THROTTLE)
+    config.update(getattr(settings, "API_THROTTLE", {}))
+    return config
+
+
+def get_throttle_metrics():
+    """
+    Throttled clients, the most throttled first
+    """
+    config = get_api_throttle_config()
+    metrics = caches[config["CACHE"]].get(METRICS_KEY, {})
+    return sorted(metrics.values(), key=lambda client: client["throttled"], reverse=True)
+
+
+def record_throttled(config, scope, ident):
+    # read-modify-write without lock: concurrent requests may lose a count, fine for monitoring
+    cache = caches[config["CACHE"]]
+    metrics = cache.get(METRICS_KEY, {})
+    key = f"{scope}:{ident}"
+    if key not in metrics and len(metrics) >= config["METRICS_MAX_CLIENTS"]:
+        # the least throttled client gives its place, so the size of metrics is bounded
+        del metrics[min(metrics, key=lambda name: metrics[name]["throttled"])]
+    client = metrics.setdefault(key, {"scope": scope, "client": ident, "throttled": 0})
+    client["throttled"] += 1
+    client["last_throttled"] = time.time()
+    cache.set(METRICS_KEY, metrics, config["METRICS_TIMEOUT"])
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """
+    Token bucket of a client, kept in the cache between requests. Retry-After header of throttled
+    request's response is set by DRF from wait()
+    """
+
+    def get_limits(self, view, config):
+        """
+        (scope, rate, burst) of the view, None - the view is not throttled
+        """
+        raise NotImplementedError
+
+    def get_client(self, request):
+        if request.user and request.user.is_authenticated:
+            return f"user-{request.user.pk}"
+        return f"address-{self.get_ident(request)}"
+
+    def allow_request(self, request, view):
+        self.wait_time = None
+        config = get_api_throttle_config()
+        limits = self.get_limits(view, config)
+        if limits is None:
+            return True
+
+        scope, rate, burst = limits
+        client = self.get_client(request)
+        key = BUCKET_KEY.format(scope=scope, ident=client)
+        cache = caches[config["CACHE"]]
+
+        # wall clock: the bucket may be used by another worker process
+        bucket = TokenBucket(rate, burst, clock=time.time)
+        state = cache.get(key)
+        if state:
+            bucket.tokens, bucket.updated_at = state
+
+        allowed = bucket.consume()
+        # the bucket is full again after burst / rate seconds, so it isn't needed any longer
+        cache.set(key, (bucket.tokens, bucket.updated_at), int(burst / rate) + 1)
+        if not allowed:
+            self.wait_time = bucket.get_wait_time()
+            record_throttled(config, scope, client)
+        return allowed
+
+    def wait(self):
+        return self.wait_time
+
+
+class UserTokenBucketThrottle(TokenBucketThrottle):
+    """
+    Limit of all API requests of a user
+    """
+
+    def get_limits(self, view, config):
+        return "user", config["RATE"], config["BURST"]
+
+
+class ScopedTokenBucketThrottle(TokenBucketThrottle):
+    """
+    Limit of requests to views with throttle_scope listed in SCOPES
+    """
+
+    def get_limits(self, view, config):
+        scope = getattr(view, "throttle_scope", None)
+        limits = config["SCOPES"].get(scope)
+        if limits is None:
+            return None
+        return scope, limits["RATE"], limits["BURST"]
@@ -10,3 +10,7 @@ class TrackerappConfig(AppConfig):
     TrackerappConfig ...ololo
     """
     name = "trackerapp"
+
+    def ready(self):
+        # signal receivers of API layer
+        from trackerapp.api import authentication  # noqa: F401
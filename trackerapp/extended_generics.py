@@ -1,10 +1,13 @@
 import os
 
-from diff_match_patch import diff_match_patch
+from django.core.cache import cache
+from django.core.paginator import Paginator
 from django.views import generic
 from django_filters.views import FilterView
 
-from trackerapp.models import UserProfile, Message, TaskModel, Attachment
+from tasktracker.db_router import use_primary
+from trackerapp import task_list_cache
+from trackerapp.models import UserProfile, Message, TaskModel, Attachment, TaskStats
 
 ITEMS_ON_PAGE = 5
 
@@ -58,26 +61,125 @@ class ExtendedDeleteView(generic.DeleteView):
         return add_extra_context(self.request.user.id, context_data)
 
 
+class PrecountedPaginator(Paginator):
+    """
+    Paginator, that takes total count of objects from outside (for example from denormalized counter),
+    instead of running COUNT(*) query
+    """
+
+    def __init__(self, *args, count=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if count is not None:
+            self.count = count
+
+
+class CachedTaskListMixin:
+    """
+    Takes page of user's task list with the summary panel data from per-user versioned cache
+    (watch task_list_cache.py), the template caches rendered list by "task_list_cache_key".
+    Cache is filled from the primary: page of lagging replica would be kept until the next version
+    """
+    cache_kind = None  # list name, for example "owned"
+
+    def get_page_key(self):
+        if not hasattr(self, "page_key"):
+            self.page_key = task_list_cache.get_page_key(self.cache_kind, self.request.user.id, self.request.GET)
+        return self.page_key
+
+    def paginate_queryset(self, queryset, page_size):
+        cached = cache.get(self.get_page_key())
+
+        if cached is None:
+            with use_primary():
+                paginator, page, object_list, is_paginated = super().paginate_queryset(queryset, page_size)
+                page.object_list = list(object_list)
+                cached = {
+                    "count": paginator.count,
+                    "number": page.number,
+                    "object_list": page.object_list,
+                    "task_stats": TaskStats.objects.summary(self.request.user),
+                }
+            cache.set(self.get_page_key(), cached, task_list_cache.get_timeout())
+        else:
+            paginator = PrecountedPaginator(queryset, page_size, orphans=self.get_paginate_orphans(),
+                                            allow_empty_first_page=self.get_allow_empty(), count=cached["count"])
+            page = paginator.page(cached["number"])
+            page.object_list = cached["object_list"]
+
+        self.task_stats = cached["task_stats"]
+        return paginator, page, page.object_list, page.has_other_pages()
+
+    def get_context_data(self, **kwargs):
+        context_data = super().get_context_data(**kwargs)
+        context_data["task_stats"] = self.task_stats
+        context_data["task_list_cache_key"] = self.get_page_key()
+        context_data["task_list_cache_timeout"] = task_list_cache.get_timeout()
+        return context_data
+
+
 class ListInDetailView(ExtendedDetailView, generic.list.MultipleObjectMixin):
     """
     To view list of related obj on detail view page of master obj
     """
     paginate_by = ITEMS_ON_PAGE
     defaultModel = Message
+    precount_field = None  # master obj field with count of related objs, for example "message_count"
+
+    def get_paginator(self, queryset, per_page, orphans=0, allow_empty_first_page=True, **kwargs):
+        if self.precount_field:
+            kwargs["count"] = getattr(self.object, self.precount_field)
+        return PrecountedPaginator(queryset, per_page, orphans=orphans,
+                                   allow_empty_first_page=allow_empty_first_page, **kwargs)
 
     def get_context_data(self, **kwargs):
-        object_list = self.defaultModel.objects.filter(task=self.get_object())
+        object_list = self.defaultModel.objects.filter(task=self.object)
         context_data = super().get_context_data(object_list=object_list, **kwargs)
         return add_extra_context(self.request.user.id, context_data)
 
 
 def diff_semantic(text1, text2):
+    # history pages only need it (watch LAZY_PACKAGES of profiler's startup_profile command)
+    from diff_match_patch import diff_match_patch
+
     dmp = diff_match_patch()
     d = dmp.diff_main(text1, text2)
     dmp.diff_cleanupSemantic(d)
     return d
 
 
+def link_previous_records(history_list):
+    """
+    Set "previous_record" attribute of each historical record, the same record that "prev_record" property
+    would query from DB one by one. history_list - all the historical records of the instances
+    """
+    latest_records = {}
+
+    for record in sorted(history_list, key=lambda a: a.history_date):
+        key = (record.instance_type, record.id)
+        record.previous_record = latest_records.get(key)
+        latest_records[key] = record
+
+
+def diff_history_records(record, previous_record):
+    """
+    List of (field name, old value, new value) for changed editable fields of the instance.
+    Same as record.diff_against(previous_record), but compares stored values and does not
+    load related or excluded from history fields from DB
+    """
+    changes = []
+    history_attnames = {field.attname for field in record._meta.concrete_fields}
+
+    for field in record.instance_type._meta.concrete_fields:
+        if field.editable and not field.primary_key and field.attname in history_attnames:
+            old_value = getattr(previous_record, field.attname)
+            new_value = getattr(record, field.attname)
+
+            if old_value != new_value:
+                changes.append((field.name, old_value, new_value))
+
+    return changes
+
+
 class ExtendedTaskHistoryListView(generic.ListView):
     """
     To view list of events in history for task and related to it attachments
@@ -90,15 +192,11 @@ class ExtendedTaskHistoryListView(generic.ListView):
         of the related to the task attachment's history
         """
         history_list = []
-        task = TaskModel.objects.filter(id=self.kwargs['pk']).first()
-        attachments = Attachment.objects.filter(task=task)
-
-        for attachment in attachments:
-            history_list.extend(attachment.history.all())
-
-        if task:
-            history_list.extend(task.history.all())
+        history_list.extend(TaskModel.history.filter(id=self.kwargs['pk']).select_related('owner', 'history_user'))
+        history_list.extend(Attachment.history.filter(task_id=self.kwargs['pk']).select_related('owner',
+                                                                                               'history_user'))
 
+        link_previous_records(history_list)
         history_list.sort(key=lambda a: a.history_date, reverse=True)
         return history_list
 
@@ -119,20 +217,19 @@ class ExtendedTaskHistoryListView(generic.ListView):
         for item in context_data['object_list']:
 
             model_name = 'task' if item.instance_type == TaskModel else 'attachment "{}"'.format(
-                os.path.split(item.instance.file.name)[1])
+                os.path.split(str(item.file))[1])
 
-            if item.prev_record is None:
+            if item.previous_record is None:
                 result = {'model_name': model_name, 'datetime': item.creation_date, 'changed_by': item.owner,
                           'changes': [{'field': '', 'value': self.VALUE_MARKER}]}
 
             else:
-                delta = item.diff_against(item.prev_record)
                 result = {'model_name': model_name, 'datetime': item.history_date, 'changed_by': item.history_user,
                           'changes': []}
 
-                for change in delta.changes:
-                    result['changes'].append({'field': str(change.field),
-                                              'value': diff_semantic(str(change.old), str(change.new)),
+                for field, old_value, new_value in diff_history_records(item, item.previous_record):
+                    result['changes'].append({'field': field,
+                                              'value': diff_semantic(str(old_value), str(new_value)),
                                               })
 
             event_list.append(result)
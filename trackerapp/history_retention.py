@@ -0,0 +1,147 @@
+import json
+import zlib
+from datetime import timedelta
+from itertools import groupby
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils import timezone
+
+from trackerapp.models import TaskModel, Attachment, HistoryArchive
+
+"""
+Default history retention policy, overridden by HISTORY_RETENTION dict in project's settings.
+COALESCE_WINDOW_MINUTES - consecutive edits of an object by the same user within the window
+    are coalesced into the latest one; None - don't coalesce
+ARCHIVE_AFTER_DAYS - records older than that are moved into HistoryArchive table; None - don't archive
+BATCH_SIZE - records deleted/archived per query
+"""
+DEFAULT_RETENTION = {
+    "COALESCE_WINDOW_MINUTES": 10,
+    "ARCHIVE_AFTER_DAYS": 365,
+    "BATCH_SIZE": 1000,
+}
+
+TRACKED_MODELS = {
+    "task": TaskModel,
+    "attachment": Attachment,
+}
+
+RECORD_ORDERING = ("id", "history_date", "history_id")
+
+
+def get_retention_config():
+    config = dict(DEFAULT_RETENTION)
+    config.update(getattr(settings, "HISTORY_RETENTION", {}))
+    return config
+
+
+def batches(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def find_coalesced_records(history_model, window):
+    """
+    Return (history_id, history_date) of change records superseded by the next change record
+    of the same object by the same user, made within window since the first change of the run.
+    Creation and deletion records are always kept.
+    """
+    rows = history_model.objects.order_by(*RECORD_ORDERING).values_list(
+        "history_id", "id", "history_type", "history_user_id", "history_date"
+    )
+
+    superseded = []
+    previous = run_start = None
+    for row in rows.iterator():
+        history_id, object_id, history_type, user_id, history_date = row
+        if (
+                previous is not None
+                and history_type == "~"
+                and previous[2] == "~"
+                and previous[1] == object_id
+                and previous[3] == user_id
+                and history_date - run_start <= window
+        ):
+            superseded.append((previous[0], previous[4]))
+        else:
+            run_start = history_date
+        previous = row
+
+    return superseded
+
+
+def coalesce_history(history_model, superseded, batch_size):
+    for batch in batches([history_id for history_id, _ in superseded], batch_size):
+        history_model.objects.filter(history_id__in=batch).delete()
+
+
+def archive_history(model, before, batch_size):
+    """
+    Move records older than "before" into HistoryArchive, one archive row per object per batch
+    """
+    history_model = model.history.model
+    old_records = history_model.objects.filter(history_date__lt=before).order_by(*RECORD_ORDERING)
+    archived = 0
+
+    while True:
+        with transaction.atomic():
+            records = list(old_records.values()[:batch_size])
+            if not records:
+                return archived
+
+            archives = []
+            for object_id, object_records in groupby(records, key=lambda record: record["id"]):
+                object_records = list(object_records)
+                archives.append(HistoryArchive(
+                    model_label=model._meta.label,
+                    object_id=object_id,
+                    first_date=object_records[0]["history_date"],
+                    last_date=object_records[-1]["history_date"],
+                    record_count=len(object_records),
+                    payload=zlib.compress(json.dumps(object_records, cls=DjangoJSONEncoder).encode()),
+                ))
+            HistoryArchive.objects.bulk_create(archives)
+            history_model.objects.filter(history_id__in=[record["history_id"] for record in records]).delete()
+            archived += len(records)
+
+
+def compact_history(models=None, window_minutes=None, archive_days=None, batch_size=None, dry_run=False,
+                    coalesce=True, archive=True):
+    """
+    Apply retention policy to history of tracked models, missing arguments are taken from config.
+    Return report: list of dicts with count of records before compaction, coalesced and archived records
+    (to be coalesced/archived with dry_run).
+    """
+    config = get_retention_config()
+    window_minutes = config["COALESCE_WINDOW_MINUTES"] if window_minutes is None else window_minutes
+    archive_days = config["ARCHIVE_AFTER_DAYS"] if archive_days is None else archive_days
+    window_minutes = window_minutes if coalesce else None
+    archive_days = archive_days if archive else None
+    batch_size = batch_size or config["BATCH_SIZE"]
+    before = timezone.now() - timedelta(days=archive_days) if archive_days is not None else None
+
+    report = []
+    for name in models or TRACKED_MODELS:
+        model = TRACKED_MODELS[name]
+        history_model = model.history.model
+        row = {"model": name, "records": history_model.objects.count(), "coalesced": 0, "archived": 0}
+
+        superseded = []
+        if window_minutes is not None:
+            superseded = find_coalesced_records(history_model, timedelta(minutes=window_minutes))
+            row["coalesced"] = len(superseded)
+            if not dry_run:
+                coalesce_history(history_model, superseded, batch_size)
+
+        if before is not None:
+            if dry_run:
+                old_superseded = sum(1 for _, history_date in superseded if history_date < before)
+                row["archived"] = history_model.objects.filter(history_date__lt=before).count() - old_superseded
+            else:
+                row["archived"] = archive_history(model, before, batch_size)
+
+        report.append(row)
+
+    return report
@@ -0,0 +1,158 @@
+import json
+import platform
+import time
+from collections import Counter
+
+import django
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count, Q
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from chat.models import ChatRoomModel
+from profiler.storage import percentile
+from trackerapp.models import TaskModel
+
+PERCENTILES = (50, 90, 95, 99)
+
+# endpoint name -> (url name, kwargs name, API endpoint or not)
+ENDPOINTS = {
+    "task-list": ("index", None, False),
+    "assigned-tasks": ("assigned-tasks", None, False),
+    "task-detail": ("task-detail", "task", False),
+    "task-messages": ("comment-list", "task", False),
+    "task-attachments": ("attach-list", "task", False),
+    "task-history": ("task-history-list", "task", False),
+    "room-list": ("room-list", None, False),
+    "chat-room": ("chat-room", "room", False),
+    "api-task-list": ("task-api-list", None, True),
+    "api-task-detail": ("task-api-detail", "task", True),
+    "api-task-stats": ("task-api-stats", None, True),
+    "api-task-messages": ("task-message-list-api", "task", True),
+    "api-task-attachments": ("task-attachment-list-api", "task", True),
+    "api-task-history": ("task-history-list-api", "task", True),
+    "api-comment-list": ("message-api-list", None, True),
+    "api-attachment-list": ("attachment-api-list", None, True),
+}
+
+
+def fetch(client, url):
+    response = client.get(url)
+    # streaming response's body (and its queries) is produced while it's read
+    response.getvalue()
+    return response
+
+
+def measure(client, url, requests):
+    """
+    Send GET requests to url, return latencies (in seconds), status codes and SQL query count of single request
+    """
+    with CaptureQueriesContext(connection) as context:
+        fetch(client, url)
+    queries = len(context)
+
+    latencies = []
+    statuses = Counter()
+    for _ in range(requests):
+        start = time.perf_counter()
+        response = fetch(client, url)
+        latencies.append(time.perf_counter() - start)
+        statuses[response.status_code] += 1
+
+    return latencies, statuses, queries
+
+
+def summarize(url, latencies, statuses, queries):
+    latencies_ms = [latency * 1000 for latency in latencies]
+    total = sum(latencies)
+    summary = {
+        "url": url,
+        "requests": len(latencies),
+        "statuses": {str(status): count for status, count in sorted(statuses.items())},
+        "queries": queries,
+        "throughput_rps": round(len(latencies) / total, 2) if total else None,
+        "latency_ms_mean": round(total * 1000 / len(latencies), 2),
+        "latency_ms_max": round(max(latencies_ms), 2),
+    }
+    for percent in PERCENTILES:
+        summary["latency_ms_p{}".format(percent)] = round(percentile(latencies_ms, percent), 2)
+    return summary
+
+
+class Command(BaseCommand):
+    help = "Send requests to the key views and API endpoints with test client, " \
+           "print throughput, latency percentiles and SQL query count of each endpoint as JSON"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=50, help="timed requests per endpoint")
+        parser.add_argument("--warmup", type=int, default=5, help="not timed requests per endpoint")
+        parser.add_argument("--user", help="username to send requests from (default: owner of the most tasks)")
+        parser.add_argument("--endpoint", action="append", choices=sorted(ENDPOINTS),
+                            help="endpoint to benchmark, could be repeated (default: all)")
+        parser.add_argument("--label", default="", help="label of the run, e.g. release version")
+        parser.add_argument("--output", help="write JSON report to file instead of stdout")
+
+    def handle(self, *args, **options):
+        if options["requests"] < 1:
+            raise CommandError("--requests must be positive")
+
+        user = self.get_user(options["user"])
+        objects = {
+            "task": TaskModel.objects.filter(Q(owner=user) | Q(assignee=user)).order_by("-message_count").first(),
+            "room": ChatRoomModel.objects.filter(owner=user).first(),
+        }
+
+        web_client = Client()
+        web_client.force_login(user)
+        api_client = Client(HTTP_AUTHORIZATION="Bearer {}".format(RefreshToken.for_user(user).access_token))
+
+        report = {
+            "label": options["label"],
+            "date": timezone.now().isoformat(),
+            "python": platform.python_version(),
+            "django": django.get_version(),
+            "database": connection.vendor,
+            "user": user.username,
+            "requests": options["requests"],
+            "endpoints": {},
+        }
+
+        hosts = list(settings.ALLOWED_HOSTS) + ["testserver"]
+        with override_settings(ALLOWED_HOSTS=hosts, DEBUG=False):
+            for endpoint in options["endpoint"] or ENDPOINTS:
+                url_name, kwargs_name, is_api = ENDPOINTS[endpoint]
+                if kwargs_name and objects[kwargs_name] is None:
+                    self.stderr.write("Skip {}: user {} has no {}".format(endpoint, user.username, kwargs_name))
+                    continue
+
+                url = reverse(url_name, kwargs={"pk": objects[kwargs_name].pk} if kwargs_name else None)
+                client = api_client if is_api else web_client
+                for _ in range(options["warmup"]):
+                    fetch(client, url)
+
+                report["endpoints"][endpoint] = summarize(url, *measure(client, url, options["requests"]))
+
+        output = json.dumps(report, indent=2)
+        if options["output"]:
+            with open(options["output"], "w") as file:
+                file.write(output)
+        else:
+            self.stdout.write(output)
+
+    def get_user(self, username):
+        if username:
+            try:
+                return User.objects.get(username=username)
+            except User.DoesNotExist:
+                raise CommandError("User {} does not exist".format(username))
+
+        user = User.objects.annotate(tasks=Count("owned_tasks")).order_by("-tasks", "id").first()
+        if user is None:
+            raise CommandError("No users to benchmark with, run seed_benchmark first")
+        return user
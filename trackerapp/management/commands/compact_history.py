@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+
+from trackerapp.history_retention import TRACKED_MODELS, compact_history
+
+COLUMNS = ("records", "coalesced", "archived", "remaining")
+
+
+class Command(BaseCommand):
+    help = "Coalesce consecutive task/attachment history edits by the same user and archive old history records " \
+           "according to HISTORY_RETENTION settings"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--model", action="append", choices=sorted(TRACKED_MODELS),
+                            help="history to compact, could be repeated (default: all)")
+        parser.add_argument("--window-minutes", type=int, help="coalesce window (default: from settings)")
+        parser.add_argument("--archive-days", type=int, help="archive records older than that (default: from settings)")
+        parser.add_argument("--no-coalesce", action="store_true")
+        parser.add_argument("--no-archive", action="store_true")
+        parser.add_argument("--batch-size", type=int)
+        parser.add_argument("--dry-run", action="store_true", help="only report rows, which would be reclaimed")
+
+    def handle(self, *args, **options):
+        report = compact_history(
+            models=options["model"],
+            window_minutes=options["window_minutes"],
+            archive_days=options["archive_days"],
+            batch_size=options["batch_size"],
+            dry_run=options["dry_run"],
+            coalesce=not options["no_coalesce"],
+            archive=not options["no_archive"],
+        )
+
+        if options["dry_run"]:
+            self.stdout.write("Dry run, nothing changed")
+        self.stdout.write("model".ljust(12) + "".join(column.rjust(12) for column in COLUMNS))
+        for row in report:
+            row["remaining"] = row["records"] - row["coalesced"] - row["archived"]
+            self.stdout.write(row["model"].ljust(12) + "".join(str(row[column]).rjust(12) for column in COLUMNS))
@@ -0,0 +1,107 @@
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db.utils import load_backend
+
+TUNED_ENGINE = "tasktracker.sqlite_backend"
+STOCK_ENGINE = "django.db.backends.sqlite3"
+
+
+def open_connection(engine, path, busy_timeout):
+    """
+    New raw connection to SQLite file, set up by the backend the way Django would do it
+    """
+    wrapper = load_backend(engine).DatabaseWrapper({
+        "ENGINE": engine, "NAME": path, "OPTIONS": {"timeout": busy_timeout / 1000},
+        "TIME_ZONE": None, "AUTOCOMMIT": True, "ATOMIC_REQUESTS": False, "CONN_MAX_AGE": 0,
+    })
+    if engine == TUNED_ENGINE:
+        wrapper.settings_dict["OPTIONS"]["pragmas"] = {"busy_timeout": busy_timeout}
+
+    connection = wrapper.get_new_connection(wrapper.get_connection_params())
+    connection.isolation_level = None  # explicit transactions below
+    return connection
+
+
+def stress(engine, path, writers=4, readers=4, seconds=2.0, busy_timeout=1000, read_hold=0.05):
+    """
+    Run writer threads inserting rows and reader threads holding read transactions open for read_hold seconds,
+    against SQLite file. Return count of done writes, reads and "database is locked" errors.
+    """
+    setup = open_connection(engine, path, busy_timeout)
+    setup.execute("CREATE TABLE IF NOT EXISTS stress (id INTEGER PRIMARY KEY, body TEXT)")
+    setup.close()
+
+    result = {"engine": engine, "writes": 0, "reads": 0, "locked": 0}
+    lock = threading.Lock()
+    deadline = time.monotonic() + seconds
+
+    def count(key):
+        with lock:
+            result[key] += 1
+
+    def write():
+        connection = open_connection(engine, path, busy_timeout)
+        while time.monotonic() < deadline:
+            try:
+                connection.execute("BEGIN IMMEDIATE")
+                connection.execute("INSERT INTO stress (body) VALUES (?)", ("stress " * 10,))
+                connection.execute("COMMIT")
+                count("writes")
+            except sqlite3.OperationalError as error:
+                if connection.in_transaction:
+                    connection.execute("ROLLBACK")
+                if "locked" not in str(error):
+                    raise
+                count("locked")
+        connection.close()
+
+    def read():
+        connection = open_connection(engine, path, busy_timeout)
+        while time.monotonic() < deadline:
+            try:
+                connection.execute("BEGIN")
+                connection.execute("SELECT COUNT(*) FROM stress").fetchone()
+                time.sleep(read_hold)
+                connection.execute("COMMIT")
+                count("reads")
+            except sqlite3.OperationalError as error:
+                if connection.in_transaction:
+                    connection.execute("ROLLBACK")
+                if "locked" not in str(error):
+                    raise
+                count("locked")
+        connection.close()
+
+    threads = [threading.Thread(target=write) for _ in range(writers)]
+    threads += [threading.Thread(target=read) for _ in range(readers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    return result
+
+
+class Command(BaseCommand):
+    help = "Concurrent read/write stress test of stock and WAL tuned SQLite backends on a temporary file, " \
+           "prints count of 'database is locked' errors of each backend as JSON"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--writers", type=int, default=4)
+        parser.add_argument("--readers", type=int, default=4)
+        parser.add_argument("--seconds", type=float, default=3.0, help="duration of each backend's run")
+        parser.add_argument("--busy-timeout", type=int, default=1000, help="milliseconds to wait for a lock")
+
+    def handle(self, *args, **options):
+        report = []
+        for engine in (STOCK_ENGINE, TUNED_ENGINE):
+            with tempfile.TemporaryDirectory() as directory:
+                report.append(stress(engine, os.path.join(directory, "stress.sqlite3"), options["writers"],
+                                     options["readers"], options["seconds"], options["busy_timeout"]))
+        self.stdout.write(json.dumps(report, indent=2))
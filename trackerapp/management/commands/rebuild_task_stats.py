@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from trackerapp.models import TaskStats, recount_task_activity
+
+
+class Command(BaseCommand):
+    help = "Recount materialized per-user task stats and task activity counters from the task/message/attachment tables"
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            rows = TaskStats.objects.rebuild()
+            tasks = recount_task_activity()
+        self.stdout.write(self.style.SUCCESS(f"Task stats rebuilt: {rows} rows. Activity recounted: {tasks} tasks"))
@@ -0,0 +1,179 @@
+import random
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from chat.models import (
+    ChatRoomModel, ChatMessageModel, RoomReadMarker, recount_room_last_message, recount_unread_counts,
+)
+from trackerapp.models import (
+    TaskModel, Message, Attachment, TaskStats, LOAN_STATUS, ATTACHMENT_UPLOAD_TO, recount_task_activity,
+)
+
+# single file shared by all seeded attachments, so seeding doesn't fill the disk
+BENCHMARK_ATTACHMENT = ATTACHMENT_UPLOAD_TO + "benchmark.txt"
+ROOM_MEMBERS = 3
+
+
+def created_after(model, last_id):
+    """
+    Rows inserted by bulk_create after last_id (sqlite doesn't return primary keys of bulk inserted rows)
+    """
+    return list(model.objects.filter(id__gt=last_id or 0).order_by("id"))
+
+
+def last_id(model):
+    return model.objects.aggregate(last=Max("id"))["last"]
+
+
+class Command(BaseCommand):
+    help = "Fill database with generated users, tasks, messages, attachments, history, chat rooms and chat messages " \
+           "using bulk inserts"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=50)
+        parser.add_argument("--tasks", type=int, default=1000)
+        parser.add_argument("--messages", type=int, default=5000)
+        parser.add_argument("--attachments", type=int, default=1000)
+        parser.add_argument("--history", type=int, default=2000, help="task's change records besides creation ones")
+        parser.add_argument("--rooms", type=int, default=50)
+        parser.add_argument("--chat-messages", type=int, default=5000)
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument("--prefix", default="bench", help="prefix of generated usernames and room names")
+        parser.add_argument("--password", default="benchmark", help="password of all generated users")
+        parser.add_argument("--seed", type=int, default=None, help="random seed to generate the same data again")
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options["seed"])
+        self.batch_size = options["batch_size"]
+        prefix = options["prefix"]
+
+        with transaction.atomic():
+            users = self.create_users(prefix, options["users"], options["password"])
+            if not users:
+                self.stdout.write("Nothing to seed: no users")
+                return
+
+            tasks = self.create_tasks(users, options["tasks"])
+            self.create_history(tasks, options["history"])
+            if tasks:
+                self.create_task_items(Message, users, tasks, options["messages"])
+                self.create_task_items(Attachment, users, tasks, options["attachments"])
+            rooms = self.create_rooms(prefix, users, options["rooms"])
+            if rooms:
+                self.create_chat_messages(users, rooms, options["chat_messages"])
+
+            # bulk inserts bypass signals, which keep denormalized counters
+            TaskStats.objects.rebuild()
+            recount_task_activity()
+            recount_room_last_message()
+            recount_unread_counts()
+
+        self.stdout.write(self.style.SUCCESS(
+            "Seeded: {users} users, {tasks} tasks, {messages} messages, {attachments} attachments, "
+            "{history} history records, {rooms} rooms, {chat_messages} chat messages".format(**options)))
+
+    def create_users(self, prefix, count, password):
+        start = last_id(User)
+        # hash password once, hashing is too slow to repeat it for every user
+        password = make_password(password)
+        User.objects.bulk_create(
+            [User(username="{}_user_{}".format(prefix, (start or 0) + i), password=password) for i in range(count)],
+            batch_size=self.batch_size,
+        )
+        return created_after(User, start)
+
+    def create_tasks(self, users, count):
+        start = last_id(TaskModel)
+        statuses = [status for status, _ in LOAN_STATUS]
+        assignees = users + [None]
+        TaskModel.objects.bulk_create(
+            [
+                TaskModel(
+                    title="benchmark task {}".format(i),
+                    description="benchmark task description {}".format(i),
+                    status=self.random.choice(statuses),
+                    owner=self.random.choice(users),
+                    assignee=self.random.choice(assignees),
+                )
+                for i in range(count)
+            ],
+            batch_size=self.batch_size,
+        )
+        tasks = created_after(TaskModel, start)
+        TaskModel.history.bulk_history_create(tasks, batch_size=self.batch_size)
+        return tasks
+
+    def create_history(self, tasks, count):
+        if not tasks:
+            return
+
+        changed = []
+        for i in range(count):
+            task = TaskModel(**{field.attname: getattr(self.random.choice(tasks), field.attname)
+                                for field in TaskModel._meta.concrete_fields})
+            task.description = "benchmark task description, change {}".format(i)
+            changed.append(task)
+        TaskModel.history.bulk_history_create(changed, batch_size=self.batch_size, update=True)
+
+    def create_task_items(self, model, users, tasks, count):
+        if model is Attachment and count and not default_storage.exists(BENCHMARK_ATTACHMENT):
+            default_storage.save(BENCHMARK_ATTACHMENT, ContentFile(b"benchmark attachment"))
+
+        items = []
+        for i in range(count):
+            task = self.random.choice(tasks)
+            owner = self.random.choice([task.owner_id, task.assignee_id or task.owner_id, self.random.choice(users).id])
+            if model is Message:
+                items.append(Message(body="benchmark message {}".format(i), task=task, owner_id=owner))
+            else:
+                items.append(Attachment(description="benchmark attachment {}".format(i), task=task, owner_id=owner,
+                                        file=BENCHMARK_ATTACHMENT))
+        model.objects.bulk_create(items, batch_size=self.batch_size)
+
+    def create_rooms(self, prefix, users, count):
+        start = last_id(ChatRoomModel)
+        ChatRoomModel.objects.bulk_create(
+            [
+                ChatRoomModel(name="{}_room_{}".format(prefix, (start or 0) + i), is_private=self.random.random() < 0.5,
+                              owner=self.random.choice(users))
+                for i in range(count)
+            ],
+            batch_size=self.batch_size,
+        )
+        rooms = created_after(ChatRoomModel, start)
+
+        membership = ChatRoomModel.member.through
+        members = [
+            membership(chatroommodel_id=room.id, user_id=user.id)
+            for room in rooms
+            for user in self.random.sample(users, min(ROOM_MEMBERS, len(users)))
+        ]
+        membership.objects.bulk_create(members, batch_size=self.batch_size)
+
+        # owners and members follow rooms' unread counts (markers are created by signals, which bulk inserts bypass)
+        now = timezone.now()
+        RoomReadMarker.objects.bulk_create(
+            [RoomReadMarker(user_id=room.owner_id, room_id=room.id, last_read_at=now) for room in rooms]
+            + [RoomReadMarker(user_id=member.user_id, room_id=member.chatroommodel_id, last_read_at=now)
+               for member in members],
+            batch_size=self.batch_size,
+            ignore_conflicts=True,
+        )
+        return rooms
+
+    def create_chat_messages(self, users, rooms, count):
+        ChatMessageModel.objects.bulk_create(
+            [
+                ChatMessageModel(body="benchmark chat message {}".format(i), room=self.random.choice(rooms),
+                                 owner=self.random.choice(users))
+                for i in range(count)
+            ],
+            batch_size=self.batch_size,
+        )
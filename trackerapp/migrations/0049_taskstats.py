@@ -0,0 +1,46 @@
+# Generated by Django 3.1.7 on 2026-10-19 12:29
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_task_stats(apps, schema_editor):
+    TaskModel = apps.get_model('trackerapp', 'TaskModel')
+    TaskStats = apps.get_model('trackerapp', 'TaskStats')
+    counters = {}
+
+    for role, index in (('owner', 0), ('assignee', 1)):
+        for row in TaskModel.objects.values(role, 'status').annotate(count=models.Count('id')).order_by():
+            if row[role]:
+                counters.setdefault((row[role], row['status']), [0, 0])[index] = row['count']
+
+    TaskStats.objects.bulk_create(
+        TaskStats(user_id=user_id, status=status, owned_count=owned, assigned_count=assigned)
+        for (user_id, status), (owned, assigned) in counters.items()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('trackerapp', '0048_auto_20210521_1040'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TaskStats',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('waiting to start', 'waiting to start'), ('in work', 'in work'), ('completed', 'completed')], max_length=16)),
+                ('owned_count', models.IntegerField(default=0)),
+                ('assigned_count', models.IntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='task_stats', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('user', 'status')},
+            },
+        ),
+        migrations.RunPython(fill_task_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 3.1.7 on 2026-10-19 12:32
+
+from django.db import migrations, models
+
+
+def fill_task_activity(apps, schema_editor):
+    TaskModel = apps.get_model('trackerapp', 'TaskModel')
+    activity = {}
+
+    for model_name, counter_field in (('Message', 'message_count'), ('Attachment', 'attachment_count')):
+        related_model = apps.get_model('trackerapp', model_name)
+        rows = related_model.objects.filter(task__isnull=False).values('task').annotate(
+            count=models.Count('id'), last=models.Max('creation_date')).order_by()
+
+        for row in rows:
+            values = activity.setdefault(row['task'], {})
+            values[counter_field] = row['count']
+            values['last_activity_at'] = max(filter(None, (values.get('last_activity_at'), row['last'])), default=None)
+
+    for task_id, values in activity.items():
+        TaskModel.objects.filter(pk=task_id).update(**values)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trackerapp', '0049_taskstats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='taskmodel',
+            name='attachment_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='taskmodel',
+            name='last_activity_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='taskmodel',
+            name='message_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(fill_task_activity, migrations.RunPython.noop),
+    ]
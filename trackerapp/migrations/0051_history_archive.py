@@ -0,0 +1,33 @@
+# Generated by Django 3.1.7 on 2026-10-19 12:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trackerapp', '0050_task_activity_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HistoryArchive',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model_label', models.CharField(max_length=100)),
+                ('object_id', models.IntegerField()),
+                ('first_date', models.DateTimeField()),
+                ('last_date', models.DateTimeField()),
+                ('record_count', models.IntegerField()),
+                ('payload', models.BinaryField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['model_label', 'object_id', 'first_date'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='historyarchive',
+            index=models.Index(fields=['model_label', 'object_id'], name='trackerapp__model_l_b3e1c2_idx'),
+        ),
+    ]
@@ -1,16 +1,25 @@
+import json
 import os
 import uuid
+import zlib
 
 from django.contrib.auth.models import User
 from django.core.validators import validate_image_file_extension
-from django.db import models
+from django.db import DatabaseError, IntegrityError, models, transaction
+from django.db.models import Count, F, OuterRef, Subquery, Max, Value
+from django.db.models.fields.files import FieldFile
+from django.db.models.functions import Coalesce, Greatest
 from django.dispatch import receiver
 from django.urls import reverse_lazy
 from simple_history.models import HistoricalRecords
 
+from trackerapp import task_list_cache
+
 TASK_TITLE_MAX_LENGTH = 200
 DESCRIPTION_MAX_LENGTH = 1000
 DESCRIPTION_AS_TITLE_LENGTH = 40
+# denormalized task's counters, changed by queryset updates only (watch Message/Attachment signals below)
+TASK_ACTIVITY_FIELDS = ("message_count", "attachment_count", "last_activity_at")
 PROFILE_IMG_UPLOAD_TO = "uploads/userprofile/"
 ATTACHMENT_UPLOAD_TO = "attachments/"
 
@@ -21,7 +30,77 @@ LOAN_STATUS = (
 )
 
 
-class UserProfile(models.Model):
+class ChangeTrackingMixin:
+    """
+    Keeps snapshot of field values loaded from DB. Save of the loaded instance writes changed fields only
+    and is skipped at all (with its signals, so no history record) when nothing has changed.
+    untracked_fields - never written by save of existing row, changed by queryset updates only
+    """
+
+    untracked_fields = ()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = {
+            name: cls._meta.get_field(name).get_prep_value(value) for name, value in zip(field_names, values)
+        }
+        return instance
+
+    def take_snapshot(self):
+        self._loaded_values = {
+            field.attname: field.get_prep_value(getattr(self, field.attname))
+            for field in self._meta.concrete_fields if field.attname in self.__dict__
+        }
+
+    def refresh_from_db(self, *args, **kwargs):
+        super().refresh_from_db(*args, **kwargs)
+        self.take_snapshot()
+
+    def has_changed(self, attname):
+        snapshot = getattr(self, "_loaded_values", None)
+        if snapshot is None or attname not in snapshot:
+            return True
+
+        value = self.__dict__.get(attname)
+        # new file is not uploaded yet, so it's name means nothing
+        if isinstance(value, FieldFile) and not value._committed:
+            return True
+        return self._meta.get_field(attname).get_prep_value(value) != snapshot[attname]
+
+    def get_changed_fields(self):
+        return [
+            field.attname for field in self._meta.concrete_fields
+            if not field.primary_key and field.name not in self.untracked_fields and field.attname in self.__dict__
+            and self.has_changed(field.attname)
+        ]
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get("update_fields") is None and not kwargs.get("force_insert"):
+            changed_fields = self.get_changed_fields()
+            if not changed_fields:
+                return
+            kwargs["update_fields"] = changed_fields
+            self._saving_changed_fields = True
+        try:
+            super().save(*args, **kwargs)
+        finally:
+            self._saving_changed_fields = False
+        self.take_snapshot()
+
+    def _save_table(self, raw=False, cls=None, force_insert=False, force_update=False, using=None,
+                    update_fields=None):
+        try:
+            return super()._save_table(raw, cls, force_insert, force_update, using, update_fields)
+        except DatabaseError:
+            # update of changed fields hasn't affected any rows: the row is deleted meanwhile, it's inserted
+            # the way plain save does. Caught here, before save_base marks the transaction for rollback
+            if not getattr(self, "_saving_changed_fields", False):
+                raise
+            return super()._save_table(raw, cls, force_insert, force_update, using)
+
+
+class UserProfile(ChangeTrackingMixin, models.Model):
     owner = models.OneToOneField(User, on_delete=models.CASCADE, null=True)
     picture = models.ImageField(
         upload_to=PROFILE_IMG_UPLOAD_TO,
@@ -68,17 +147,19 @@ class TaskModelManager(models.Manager):
         return self.get(back_up_id=back_up_id)
 
 
-class TaskModel(models.Model):
+class TaskModel(ChangeTrackingMixin, models.Model):
     """
     Model describes task properties
     """
 
     objects = TaskModelManager
+    # do not overwrite activity counters with possibly stale values of this instance
+    untracked_fields = TASK_ACTIVITY_FIELDS
 
     class Meta:
         ordering = ["-creation_date"]
 
-    history = HistoricalRecords(cascade_delete_history=True)
+    history = HistoricalRecords(cascade_delete_history=True, excluded_fields=TASK_ACTIVITY_FIELDS)
     title = models.CharField(max_length=TASK_TITLE_MAX_LENGTH, help_text="Enter title of your task)")
     description = models.fields.TextField(
         max_length=DESCRIPTION_MAX_LENGTH, help_text="Enter a brief description of the task."
@@ -107,6 +188,9 @@ class TaskModel(models.Model):
         null=True,
     )
     backup_id = models.UUIDField(default=uuid.uuid4, editable=False, unique=True)
+    message_count = models.IntegerField(default=0, editable=False)
+    attachment_count = models.IntegerField(default=0, editable=False)
+    last_activity_at = models.DateTimeField(null=True, blank=True, editable=False)
 
     def natural_key(self):
         return (self.backup_id)
@@ -130,12 +214,148 @@ class TaskModel(models.Model):
         return self.assignee
 
 
+class TaskStatsManager(models.Manager):
+    def increment(self, user_id, status, owned=0, assigned=0):
+        """
+        Add deltas to user's counters for the status. Rows are created on demand
+        for positive deltas only, so decrements never resurrect rows of deleted users.
+        """
+        if not user_id or not (owned or assigned):
+            return
+
+        counters = self.filter(user_id=user_id, status=status)
+        deltas = {"owned_count": F("owned_count") + owned, "assigned_count": F("assigned_count") + assigned}
+        if counters.update(**deltas) or not (owned > 0 or assigned > 0):
+            return
+
+        try:
+            with transaction.atomic():
+                self.create(user_id=user_id, status=status, owned_count=owned, assigned_count=assigned)
+        except IntegrityError:
+            # the row is created by concurrent first increment meanwhile
+            counters.update(**deltas)
+
+    def summary(self, user):
+        """
+        Returns dict: status -> {'owned': n, 'assigned': n}, for every available status
+        """
+        result = {status: {"owned": 0, "assigned": 0} for status, _ in LOAN_STATUS}
+
+        for stats in self.filter(user=user):
+            result[stats.status] = {"owned": stats.owned_count, "assigned": stats.assigned_count}
+
+        return result
+
+    def rebuild(self):
+        """
+        Recount all the stats from TaskModel table.
+        Task lists of the users show the stats, they are invalidated when the transaction is committed
+        """
+        user_ids = set(self.values_list("user_id", flat=True))
+        counters = {}
+
+        for role, index in (("owner", 0), ("assignee", 1)):
+            for row in TaskModel.objects.values(role, "status").annotate(count=Count("id")).order_by():
+                if row[role]:
+                    counters.setdefault((row[role], row["status"]), [0, 0])[index] = row["count"]
+
+        self.all().delete()
+        self.bulk_create(
+            self.model(user_id=user_id, status=status, owned_count=owned, assigned_count=assigned)
+            for (user_id, status), (owned, assigned) in counters.items()
+        )
+        user_ids.update(user_id for user_id, _ in counters)
+        transaction.on_commit(lambda: task_list_cache.bump_versions(*user_ids))
+        return len(counters)
+
+
+class TaskStats(models.Model):
+    """
+    Materialized count of user's owned/assigned tasks per status.
+    Kept current by TaskModel's save/delete signals (watch below)
+    """
+
+    class Meta:
+        unique_together = ("user", "status")
+
+    objects = TaskStatsManager()
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="task_stats")
+    status = models.CharField(max_length=16, choices=LOAN_STATUS)
+    owned_count = models.IntegerField(default=0)
+    assigned_count = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"Stats: {self.user_id}, {self.status}"
+
+
+def apply_task_stats_key(key, delta):
+    owner_id, assignee_id, status = key
+    TaskStats.objects.increment(owner_id, status, owned=delta)
+    TaskStats.objects.increment(assignee_id, status, assigned=delta)
+
+
+@receiver(models.signals.pre_save, sender=TaskModel)
+def remember_task_stats_key(sender, instance, **kwargs):
+    """
+    Store (owner_id, assignee_id, status) the task has in DB before saving,
+    to know which counters have to be changed after save
+    """
+    instance._stats_key = None
+
+    # counted fields are not in update_fields, so their values in DB stay as they are
+    if not instance._state.adding and not any(
+            instance.has_changed(attname) for attname in ("owner_id", "assignee_id", "status")):
+        instance._stats_key = (instance.owner_id, instance.assignee_id, instance.status)
+    elif instance.pk:
+        previous = TaskModel.objects.filter(pk=instance.pk).values_list("owner_id", "assignee_id", "status").first()
+        if previous:
+            instance._stats_key = previous
+
+
+# registered before update_task_stats_on_save, which replaces _stats_key with the current one
+@receiver(models.signals.post_save, sender=TaskModel)
+@receiver(models.signals.post_delete, sender=TaskModel)
+def invalidate_task_lists(sender, instance, **kwargs):
+    """
+    Invalidate cached task lists of the owner and the assignee the task has and had before save
+    """
+    previous_owner_id, previous_assignee_id, _ = getattr(instance, "_stats_key", None) or (None, None, None)
+    task_list_cache.bump_versions(instance.owner_id, instance.assignee_id, previous_owner_id, previous_assignee_id)
+
+
+@receiver(models.signals.post_save, sender=User)
+def reset_task_list_version(sender, instance, created, **kwargs):
+    # id of deleted user may be reused, so cached lists of that user must not be taken by the new one
+    if created:
+        task_list_cache.bump_versions(instance.id)
+
+
+@receiver(models.signals.post_save, sender=TaskModel)
+def update_task_stats_on_save(sender, instance, **kwargs):
+    previous_key = getattr(instance, "_stats_key", None)
+    current_key = (instance.owner_id, instance.assignee_id, instance.status)
+
+    if previous_key == current_key:
+        return
+
+    if previous_key:
+        apply_task_stats_key(previous_key, -1)
+    apply_task_stats_key(current_key, 1)
+    instance._stats_key = current_key
+
+
+@receiver(models.signals.post_delete, sender=TaskModel)
+def update_task_stats_on_delete(sender, instance, **kwargs):
+    apply_task_stats_key((instance.owner_id, instance.assignee_id, instance.status), -1)
+
+
 class AttachmentModelManager(models.Manager):
     def get_by_natural_key(self, back_up_id):
         return self.get(back_up_id=back_up_id)
 
 
-class Attachment(models.Model):
+class Attachment(ChangeTrackingMixin, models.Model):
     class Meta:
         ordering = [
             "-creation_date"
@@ -177,6 +397,14 @@ class Attachment(models.Model):
     def get_assignee(self):
         return self.task.assignee
 
+    # create together with task's activity counters (watch post_save signal below)
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            return super(Attachment, self).save(*args, **kwargs)
+
+        with transaction.atomic():
+            super(Attachment, self).save(*args, **kwargs)
+
     def __str__(self):
         return f"Attachment: {self.file.name}"
 
@@ -200,7 +428,7 @@ def auto_delete_file_on_change(sender, instance, **kwargs):
     when corresponding `MediaFile` object is updated
     with new file.
     """
-    if not instance.pk:
+    if not instance.pk or not instance.has_changed("file"):
         return False
 
     try:
@@ -248,6 +476,11 @@ class Message(models.Model):
     def get_assignee(self):
         return self.task.assignee
 
+    # save together with task's activity counters (watch post_save signal below)
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            super(Message, self).save(*args, **kwargs)
+
     def __str__(self):
         return f'Task message:\n{self.body}\n'
 
@@ -255,3 +488,122 @@ class Message(models.Model):
         ordering = [
             "creation_date"
         ]
+
+
+def recount_task_activity(task_ids=None):
+    """
+    Recount activity counters of the tasks (all of them by default) from messages/attachments tables
+    with single UPDATE query, for example after bulk inserts, which bypass signals
+    """
+    messages = Message.objects.filter(task=OuterRef("pk")).order_by().values("task")
+    attachments = Attachment.objects.filter(task=OuterRef("pk")).order_by().values("task")
+    last_message = Subquery(messages.annotate(last=Max("creation_date")).values("last"))
+    last_attachment = Subquery(attachments.annotate(last=Max("creation_date")).values("last"))
+
+    tasks = TaskModel.objects.all() if task_ids is None else TaskModel.objects.filter(pk__in=task_ids)
+    return tasks.update(
+        message_count=Coalesce(Subquery(messages.annotate(count=Count("id")).values("count")), Value(0)),
+        attachment_count=Coalesce(Subquery(attachments.annotate(count=Count("id")).values("count")), Value(0)),
+        # Greatest of NULL is NULL, so replace missing date with the other one
+        last_activity_at=Greatest(Coalesce(last_message, last_attachment), Coalesce(last_attachment, last_message)),
+    )
+
+
+ACTIVITY_COUNTER_FIELD = {
+    Message: "message_count",
+    Attachment: "attachment_count",
+}
+
+
+def change_task_activity(task_id, counter_field, delta, activity_date=None):
+    """
+    Change task's denormalized counter with single UPDATE query, without saving the task
+    (so no history record is created)
+    """
+    if not task_id:
+        return
+
+    values = {counter_field: F(counter_field) + delta}
+    if activity_date:
+        values["last_activity_at"] = activity_date
+
+    TaskModel.objects.filter(pk=task_id).update(**values)
+
+
+@receiver(models.signals.pre_save, sender=Message)
+@receiver(models.signals.pre_save, sender=Attachment)
+def remember_activity_task(sender, instance, **kwargs):
+    """
+    Store task_id the message/attachment has in DB before saving,
+    to move its activity to the other task after save
+    """
+    instance._previous_task_id = instance.task_id
+
+    if not instance.pk or isinstance(instance, ChangeTrackingMixin) and not instance.has_changed("task_id"):
+        return
+
+    previous = sender.objects.filter(pk=instance.pk).values_list("task_id", flat=True).first()
+    if previous:
+        instance._previous_task_id = previous
+
+
+@receiver(models.signals.post_save, sender=Message)
+@receiver(models.signals.post_save, sender=Attachment)
+def increment_task_activity(sender, instance, created, **kwargs):
+    if created:
+        change_task_activity(instance.task_id, ACTIVITY_COUNTER_FIELD[sender], 1, instance.creation_date)
+        invalidate_task_lists_of(instance.task_id)
+        return
+
+    previous_task_id = getattr(instance, "_previous_task_id", instance.task_id)
+    if previous_task_id != instance.task_id:
+        # last activity of the previous task is unknown without the moved row, so both tasks are recounted
+        recount_task_activity([task_id for task_id in (previous_task_id, instance.task_id) if task_id])
+        invalidate_task_lists_of(previous_task_id)
+        invalidate_task_lists_of(instance.task_id)
+
+
+@receiver(models.signals.post_delete, sender=Message)
+@receiver(models.signals.post_delete, sender=Attachment)
+def decrement_task_activity(sender, instance, **kwargs):
+    change_task_activity(instance.task_id, ACTIVITY_COUNTER_FIELD[sender], -1)
+    invalidate_task_lists_of(instance.task_id)
+
+
+# task lists show activity counters
+def invalidate_task_lists_of(task_id):
+    users = TaskModel.objects.filter(pk=task_id).values_list("owner_id", "assignee_id").first()
+    if users:
+        task_list_cache.bump_versions(*users)
+
+
+class HistoryArchive(models.Model):
+    """
+    Historical records of one tracked object moved out of the history table by retention policy
+    (watch history_retention.py), stored as zlib compressed JSON list of records' values
+    """
+
+    class Meta:
+        indexes = [models.Index(fields=["model_label", "object_id"])]
+        ordering = ["model_label", "object_id", "first_date"]
+
+    model_label = models.CharField(max_length=100)
+    object_id = models.IntegerField()
+    first_date = models.DateTimeField()
+    last_date = models.DateTimeField()
+    record_count = models.IntegerField()
+    payload = models.BinaryField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.model_label} #{self.object_id}: {self.record_count} records"
+
+    def get_records(self):
+        return json.loads(zlib.decompress(self.payload))
+
+
+# archived history follows cascade_delete_history of tracked models
+@receiver(models.signals.post_delete, sender=TaskModel)
+@receiver(models.signals.post_delete, sender=Attachment)
+def delete_history_archive(sender, instance, **kwargs):
+    HistoryArchive.objects.filter(model_label=sender._meta.label, object_id=instance.pk).delete()
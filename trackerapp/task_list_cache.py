@@ -0,0 +1,40 @@
+import hashlib
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+
+"""
+Per-user versioned cache of task list pages. Entries are keyed by user's list version, so bumping the version
+(on change of any task the user owns or is assigned to, watch signals in models.py) invalidates all of them at once,
+stale entries just expire.
+TASK_LIST_CACHE_TIMEOUT - seconds to keep page data / rendered fragment
+"""
+VERSION_KEY = "task-list-version:{user_id}"
+PAGE_KEY = "task-list:{kind}:{user_id}:{version}:{params}"
+
+
+def get_timeout():
+    return getattr(settings, "TASK_LIST_CACHE_TIMEOUT", 300)
+
+
+def get_version(user_id):
+    version = cache.get(VERSION_KEY.format(user_id=user_id))
+    if version is None:
+        # random, not counter: evicted version must not revive entries of the previous one
+        version = uuid.uuid4().hex
+        cache.set(VERSION_KEY.format(user_id=user_id), version, None)
+    return version
+
+
+def bump_versions(*user_ids):
+    cache.delete_many([VERSION_KEY.format(user_id=user_id) for user_id in set(user_ids) if user_id])
+
+
+def get_page_key(kind, user_id, query_params):
+    """
+    kind - list name, query_params - request.GET: filter parameters and page
+    """
+    params = "&".join(f"{key}={value}" for key, values in sorted(query_params.lists()) for value in values)
+    return PAGE_KEY.format(kind=kind, user_id=user_id, version=get_version(user_id),
+                           params=hashlib.md5(params.encode()).hexdigest())
@@ -2,6 +2,7 @@ import os
 import shutil
 
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.core.files import File
 from django.test import override_settings
 from django.utils import timezone
@@ -61,6 +62,8 @@ def get_item(model_class, task, msg, owner, assignee, f, status):
 
 def set_credentials(self, user_credentials):
     self.client.login(username=user_credentials[0], password=user_credentials[1])
+    # token requests of all tests come from the same address, forget their API throttling buckets
+    cache.clear()
     # obtain JWT token.
     url = reverse_lazy('token_obtain_pair')
     data = {'username': user_credentials[0], 'password': user_credentials[1]}
@@ -0,0 +1,89 @@
+"""
+Helpers to check that a request runs a bounded number of SQL queries:
+the count must not exceed the declared budget and must not grow with the count of related rows
+"""
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, URLResolver
+
+from chat.models import ChatRoomModel, ChatMessageModel
+from trackerapp.models import TaskModel, Message, Attachment
+from trackerapp.tests import initiators
+
+SEED_COUNT = 2  # rows of each kind seeded first, then SEED_GROWTH times more
+SEED_GROWTH = 10
+SEED_ATTACHMENT_NAME = "attachments/query_budget.jpg"
+
+
+def get_url_names(patterns):
+    """
+    Names of all the url patterns, including nested ones
+    """
+    names = set()
+
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            names.update(get_url_names(pattern.url_patterns))
+        elif isinstance(pattern, URLPattern) and pattern.name:
+            names.add(pattern.name)
+
+    return names
+
+
+def seed_related_rows(self, count):
+    """
+    Add "count" rows of each kind related to user1: tasks, task messages, attachments,
+    task's history records, chat rooms and chat messages
+    """
+    self.seeded = getattr(self, "seeded", 0)
+
+    for i in range(self.seeded, self.seeded + count):
+        initiators.get_item(TaskModel, None, "task {}".format(i), self.user1, self.user2, None,
+                            initiators.INITIAL_STATUS[i % len(initiators.INITIAL_STATUS)])
+        initiators.get_item(Message, self.task1, "message {}".format(i), self.user1, None, None, None)
+        initiators.get_item(Attachment, self.task1, "attachment {}".format(i), self.user2, None,
+                            SEED_ATTACHMENT_NAME, None)
+
+        room = ChatRoomModel.objects.create(name="room {}".format(i), is_private=bool(i % 2), owner=self.user1)
+        room.member.add(self.user2)
+        ChatMessageModel.objects.create(body="chat message {}".format(i), owner=self.user2, room=self.room)
+
+        self.task1.description = "test description {}".format(i)
+        self.task1.save()
+
+    self.seeded += count
+
+
+class QueryBudgetMixin:
+    """
+    Test case mixin with query count assertions for GET requests sent by self.client
+    """
+
+    def count_queries(self, url, status_code=200):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+            # streaming response runs its queries while it's read
+            response.getvalue()
+
+        self.assertEqual(response.status_code, status_code, "Unexpected response status of {}".format(url))
+        return len(context)
+
+    def assertQueryBudget(self, url, budget, status_code=200):
+        count = self.count_queries(url, status_code)
+        self.assertLessEqual(count, budget, "{} runs {} queries, budget is {}".format(url, count, budget))
+        return count
+
+    def assertQueryCountDoesNotGrow(self, url, seed, budget, status_code=200):
+        """
+        Check query count with seeded SEED_COUNT related rows, then with SEED_GROWTH times more rows.
+        seed - callable, which adds given count of related rows
+        status_code - expected response status
+        """
+        seed(SEED_COUNT)
+        count = self.assertQueryBudget(url, budget, status_code)
+
+        seed(SEED_COUNT * (SEED_GROWTH - 1))
+        grown_count = self.assertQueryBudget(url, budget, status_code)
+
+        self.assertEqual(count, grown_count, "{} query count grows with related rows: {} -> {}".format(
+            url, count, grown_count))
@@ -0,0 +1,45 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse_lazy
+from rest_framework.test import APITestCase
+
+from trackerapp.tests import initiators
+
+
+class CachedJWTAuthenticationTestCase(APITestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        initiators.initial_test_conditions(self)
+        initiators.set_credentials(self, initiators.USER1_CREDENTIALS)
+
+    def get_tasks(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse_lazy("task-api-list"))
+        user_queries = [query for query in queries if query["sql"].startswith('SELECT "auth_user"')]
+        return response, user_queries
+
+    def test_user_is_loaded_once(self):
+        _, first_user_queries = self.get_tasks()
+        response, user_queries = self.get_tasks()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(first_user_queries), 1)
+        self.assertEqual(user_queries, [])
+
+    def test_deactivated_user_is_rejected(self):
+        self.get_tasks()
+
+        self.user1.is_active = False
+        self.user1.save()
+
+        response, _ = self.get_tasks()
+        self.assertEqual(response.status_code, 401)
+
+    def test_deleted_user_is_rejected(self):
+        self.get_tasks()
+
+        self.user1.delete()
+
+        response, _ = self.get_tasks()
+        self.assertEqual(response.status_code, 401)
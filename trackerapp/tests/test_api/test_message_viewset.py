@@ -1,8 +1,10 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse_lazy
 from rest_framework.test import APITestCase
 
 from trackerapp.api.serializers import MessageSerializer
-from trackerapp.models import Message
+from trackerapp.models import Message, TaskModel
 from trackerapp.tests import initiators
 
 
@@ -95,6 +97,30 @@ class MessageDetailTestCase(APITestCase):
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response.data['id'], self.pk, "Initial obj mismatched with response obj")
 
+    def test_permission_check_loads_no_relations(self):
+        initiators.set_credentials(self, initiators.USER2_CREDENTIALS)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.get_url())
+
+        self.assertEqual(response.status_code, 200)
+        task_queries = [query for query in queries if query["sql"].startswith('SELECT "trackerapp_taskmodel"')]
+        self.assertEqual(task_queries, [])
+
+    def test_list_and_detail_agree(self):
+        # user1 wrote the message, but isn't related to the task anymore
+        TaskModel.objects.filter(pk=self.task1.pk).update(owner=self.user2, assignee=self.user2)
+        initiators.set_credentials(self, initiators.USER1_CREDENTIALS)
+
+        response = self.client.get(self.get_url())
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get(reverse_lazy('message-api-list'))
+        self.assertEqual([message['id'] for message in response.data['results']], [self.pk])
+
+        initiators.set_credentials(self, initiators.HACKER_CREDENTIALS)
+        self.assertEqual(self.client.get(self.get_url()).status_code, 403)
+        self.assertEqual(self.client.get(reverse_lazy('message-api-list')).data['results'], [])
+
 
 class MessageCreateTestCase(APITestCase):
     def setUp(self) -> None:
@@ -1,9 +1,15 @@
+import json
+from unittest import mock
+
+from channels.testing import ApplicationCommunicator
 from django.urls import reverse_lazy
 from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import RefreshToken
 
 from trackerapp.api.serializers import TaskSerializer
-from trackerapp.models import TaskModel
+from trackerapp.models import TaskModel, Attachment
 from trackerapp.tests import initiators
+from tasktracker.asgi import application
 
 
 class TaskViewSetListTestCase(APITestCase):
@@ -171,3 +177,96 @@ class TaskViewSetUpdateDeleteTestCase(APITestCase):
 
         response = self.get_delete_response()
         self.assertEqual(response.status_code, 403)
+
+
+class TaskViewSetStatsTestCase(APITestCase):
+    def setUp(self) -> None:
+        initiators.initial_test_conditions(self)
+
+    def test_valid_user_get_stats(self):
+        initiators.set_credentials(self, initiators.USER1_CREDENTIALS)
+        TaskModel.objects.create(owner=self.user1, title='task3', description='test description', status='completed')
+
+        response = self.client.get(reverse_lazy('task-api-stats'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['completed'], {'owned': 1, 'assigned': 0})
+        self.assertEqual(response.data[initiators.DEFAULT_STATUS], {'owned': 1, 'assigned': 1})
+
+    def test_unauthorized_user_get_stats(self):
+        response = self.client.get(reverse_lazy('task-api-stats'))
+        self.assertEqual(response.status_code, 401)
+
+
+class TaskHistoryStreamingTestCase(APITestCase):
+    def setUp(self) -> None:
+        initiators.initial_test_conditions(self)
+        initiators.set_credentials(self, initiators.USER1_CREDENTIALS)
+        for number in range(3):
+            self.task1.title = 'title {}'.format(number)
+            self.task1.save()
+            Attachment.objects.create(task=self.task1, description='attachment {}'.format(number), owner=self.user1)
+
+    def get_history(self, **params):
+        return self.client.get(reverse_lazy('task-history-list-api', kwargs={'pk': self.task1.pk}), params)
+
+    def test_json_history_is_streamed(self):
+        # small chunks: a chunk per row
+        with mock.patch('trackerapp.api.streaming.CHUNK_SIZE', 1):
+            response = self.get_history()
+            chunks = list(response.streaming_content)
+
+        history = json.loads(b''.join(chunks))['history']
+        # task's creation and 3 changes, 3 attachments; the last chunk closes the list
+        self.assertEqual(len(history), 7)
+        self.assertEqual(len(chunks), 8)
+        dates = [record['history_date'] for record in history]
+        self.assertEqual(dates, sorted(dates, reverse=True))
+
+    def test_history_is_read_by_slices(self):
+        expected = json.loads(b''.join(self.get_history().streaming_content))['history']
+        # records of the same date are ordered by id, slices must not skip them
+        history_date = TaskModel.history.filter(id=self.task1.pk).latest().history_date
+        TaskModel.history.filter(id=self.task1.pk).update(history_date=history_date)
+
+        with mock.patch('trackerapp.api.streaming.SLICE_SIZE', 2):
+            history = json.loads(b''.join(self.get_history().streaming_content))['history']
+
+        self.assertEqual(len(history), 7)
+        self.assertEqual(sorted(record['history_id'] for record in history),
+                         sorted(record['history_id'] for record in expected))
+
+    def test_browsable_api_gets_the_same_history(self):
+        streamed = json.loads(b''.join(self.get_history().streaming_content))['history']
+
+        response = self.get_history(format='api')
+        self.assertFalse(response.streaming)
+        self.assertEqual(json.loads(json.dumps(response.data['history'])), streamed)
+
+    async def test_history_is_streamed_through_asgi(self):
+        # rows are read by slices while the body is sent, a chunk per row
+        patchers = [mock.patch('trackerapp.api.streaming.SLICE_SIZE', 2),
+                    mock.patch('trackerapp.api.streaming.CHUNK_SIZE', 1)]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        url = str(reverse_lazy('task-history-list-api', kwargs={'pk': self.task1.pk}))
+        token = RefreshToken.for_user(self.user1).access_token
+        communicator = ApplicationCommunicator(application, {
+            'type': 'http', 'http_version': '1.1', 'method': 'GET', 'path': url, 'query_string': b'',
+            'headers': [(b'host', b'testserver'), (b'accept', b'application/json'),
+                        (b'authorization', 'Bearer {}'.format(token).encode())],
+        })
+        await communicator.send_input({'type': 'http.request', 'body': b''})
+
+        start = await communicator.receive_output(timeout=5)
+        body = []
+        while True:
+            message = await communicator.receive_output(timeout=5)
+            body.append(message.get('body', b''))
+            if not message.get('more_body'):
+                break
+
+        self.assertEqual(start['status'], 200)
+        self.assertEqual(len(json.loads(b''.join(body))['history']), 7)
+        # 7 rows, closing of the list and the final empty message
+        self.assertEqual(len(body), 9)
@@ -0,0 +1,85 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import override_settings
+from django.urls import reverse_lazy
+from rest_framework.test import APITestCase
+
+from trackerapp.api.throttling import get_throttle_metrics
+from trackerapp.tests import initiators
+
+API_THROTTLE = {"RATE": 1, "BURST": 2, "SCOPES": {"token": {"RATE": 0.5, "BURST": 1}}}
+
+
+@override_settings(API_THROTTLE=API_THROTTLE)
+class ApiThrottlingTestCase(APITestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        initiators.initial_test_conditions(self)
+        self.now = 1000.0
+        patcher = mock.patch("trackerapp.api.throttling.time.time", lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def get_tasks(self):
+        return self.client.get(reverse_lazy("task-api-list"))
+
+    def test_user_bucket(self):
+        self.client.force_authenticate(self.user1)
+
+        self.assertEqual([self.get_tasks().status_code for _ in range(3)], [200, 200, 429])
+        self.assertEqual(self.get_tasks()["Retry-After"], "1")
+
+        self.now += 1
+        self.assertEqual(self.get_tasks().status_code, 200)
+
+    def test_users_are_limited_separately(self):
+        self.client.force_authenticate(self.user1)
+        for _ in range(3):
+            self.get_tasks()
+
+        self.client.force_authenticate(self.user2)
+        self.assertEqual(self.get_tasks().status_code, 200)
+
+    def test_endpoint_scope(self):
+        data = {"username": initiators.USER1_CREDENTIALS[0], "password": initiators.USER1_CREDENTIALS[1]}
+        url = reverse_lazy("token_obtain_pair")
+
+        self.assertEqual(self.client.post(url, data, format="json").status_code, 200)
+        response = self.client.post(url, data, format="json")
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response["Retry-After"], "2")
+
+    def test_forwarded_for_header_is_not_trusted(self):
+        data = {"username": initiators.USER1_CREDENTIALS[0], "password": "wrong password"}
+        url = reverse_lazy("token_obtain_pair")
+
+        statuses = [self.client.post(url, data, format="json", HTTP_X_FORWARDED_FOR="10.0.0.{}".format(number))
+                    .status_code for number in range(3)]
+        self.assertEqual(statuses, [401, 429, 429])
+
+    def test_metrics(self):
+        self.client.force_authenticate(self.user1)
+        for _ in range(4):
+            self.get_tasks()
+
+        self.client.force_authenticate(self.hacker)
+        self.assertEqual(self.client.get(reverse_lazy("throttle-metrics-api")).status_code, 403)
+
+        self.hacker.is_staff = True
+        self.hacker.save()
+        response = self.client.get(reverse_lazy("throttle-metrics-api"))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([(client["scope"], client["client"], client["throttled"])
+                          for client in response.data["throttled"]],
+                         [("user", f"user-{self.user1.pk}", 2)])
+
+    @override_settings(API_THROTTLE=dict(API_THROTTLE, RATE=0.001, BURST=1, METRICS_MAX_CLIENTS=2))
+    def test_metrics_size_is_bounded(self):
+        for user, requests in ((self.user1, 4), (self.user2, 3), (self.hacker, 2)):
+            self.client.force_authenticate(user)
+            for _ in range(requests):
+                self.get_tasks()
+
+        self.assertEqual([(client["client"], client["throttled"]) for client in get_throttle_metrics()],
+                         [(f"user-{self.user1.pk}", 3), (f"user-{self.hacker.pk}", 1)])
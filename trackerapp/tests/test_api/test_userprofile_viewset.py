@@ -4,6 +4,7 @@ import shutil
 from PIL import Image
 from django.contrib.auth import get_user_model
 from django.contrib.auth.models import User
+from django.core.cache import cache
 from django.core.exceptions import ValidationError
 from django.test import override_settings
 from django.urls import reverse_lazy
@@ -38,6 +39,8 @@ def profile_initial_conditions(self):
 
 def set_credentials(self, user_credentials):
     self.client.login(username=user_credentials[0], password=user_credentials[1])
+    # token requests of all tests come from the same address, forget their API throttling buckets
+    cache.clear()
     # obtain JWT token.
     url = reverse_lazy('token_obtain_pair')
     data = {'username': user_credentials[0], 'password': user_credentials[1]}
@@ -0,0 +1,58 @@
+import gzip
+from unittest import skipUnless
+
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from tasktracker.compression import CompressionMiddleware, brotli
+
+BODY = b'{"history": [' + b",".join(b'{"id": %d}' % number for number in range(500)) + b"]}"
+
+
+@override_settings(RESPONSE_COMPRESSION={"ENABLED": True, "MIN_SIZE": 100})
+class CompressionMiddlewareTestCase(SimpleTestCase):
+    def get(self, response, accept_encoding="gzip, deflate, br"):
+        middleware = CompressionMiddleware(lambda request: response)
+        return middleware(RequestFactory().get("/", HTTP_ACCEPT_ENCODING=accept_encoding))
+
+    def test_gzip(self):
+        response = self.get(HttpResponse(BODY, content_type="application/json"), accept_encoding="gzip")
+
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertEqual(response["Vary"], "Accept-Encoding")
+        self.assertEqual(int(response["Content-Length"]), len(response.content))
+        self.assertEqual(gzip.decompress(response.content), BODY)
+
+    def test_small_and_binary_responses_are_not_compressed(self):
+        response = self.get(HttpResponse(b"{}", content_type="application/json"))
+        self.assertFalse(response.has_header("Content-Encoding"))
+
+        response = self.get(HttpResponse(BODY, content_type="application/zip"))
+        self.assertFalse(response.has_header("Content-Encoding"))
+
+    def test_client_without_compression(self):
+        response = self.get(HttpResponse(BODY, content_type="text/html"), accept_encoding="identity")
+
+        self.assertFalse(response.has_header("Content-Encoding"))
+        self.assertEqual(response["Vary"], "Accept-Encoding")
+        self.assertEqual(response.content, BODY)
+
+    @override_settings(RESPONSE_COMPRESSION={"ENABLED": True, "BROTLI": False})
+    def test_streaming_gzip(self):
+        response = self.get(StreamingHttpResponse([BODY[:100], BODY[100:]], content_type="application/json"))
+
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertEqual(gzip.decompress(b"".join(response.streaming_content)), BODY)
+
+    @skipUnless(brotli, "brotli is optional")
+    def test_brotli(self):
+        response = self.get(HttpResponse(BODY, content_type="application/json"))
+
+        self.assertEqual(response["Content-Encoding"], "br")
+        self.assertEqual(brotli.decompress(response.content), BODY)
+
+    @override_settings(RESPONSE_COMPRESSION={"ENABLED": False})
+    def test_disabled(self):
+        with self.assertRaises(MiddlewareNotUsed):
+            CompressionMiddleware(lambda request: HttpResponse())
@@ -0,0 +1,129 @@
+from unittest import skipUnless
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse_lazy
+from rest_framework_simplejwt.tokens import AccessToken
+
+from tasktracker.db_router import (
+    ReplicaRouter, ReplicaRoutingMiddleware, read_from_replica, reads_from_replica, switch_to_primary_on_write,
+    use_primary,
+)
+from trackerapp.models import TaskModel
+from trackerapp.tests import initiators
+
+
+@override_settings(DATABASE_REPLICAS=["replica"], REPLICA_PIN_SECONDS=5)
+class ReplicaRouterTestCase(SimpleTestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        self.router = ReplicaRouter()
+        self.addCleanup(read_from_replica, False)
+        self.user = User(id=1, username="user")
+
+    def route(self, method, user=None, **headers):
+        """
+        Return whether reads of the view go to replica. View authenticates the user like API views do
+        """
+        request = getattr(RequestFactory(), method.lower())("/", **headers)
+        routed = {}
+
+        def view(request):
+            routed["replica"] = reads_from_replica()
+            if user is not None:
+                request.user = user
+            return HttpResponse()
+
+        ReplicaRoutingMiddleware(view)(request)
+        return routed["replica"]
+
+    def test_reads_outside_of_request_use_primary(self):
+        self.assertEqual(self.router.db_for_read(TaskModel), "default")
+
+    def test_safe_request_reads_from_replica(self):
+        read_from_replica(True)
+        self.assertEqual(self.router.db_for_read(TaskModel), "replica")
+        self.assertEqual(self.router.db_for_read(Session), "default")
+
+    def test_routing_write_does_not_change_reads(self):
+        read_from_replica(True)
+
+        self.assertEqual(self.router.db_for_write(TaskModel), "default")
+        self.assertEqual(self.router.db_for_read(TaskModel), "replica")
+
+    def test_write_query_pins_rest_of_request_to_primary(self):
+        read_from_replica(True)
+        execute = lambda sql, params, many, context: None  # noqa: E731
+
+        switch_to_primary_on_write(execute, "SELECT 1", (), False, {})
+        self.assertTrue(reads_from_replica())
+        switch_to_primary_on_write(execute, "UPDATE trackerapp_taskmodel SET title = ''", (), False, {})
+        self.assertFalse(reads_from_replica())
+
+    def test_use_primary(self):
+        read_from_replica(True)
+
+        with use_primary():
+            self.assertEqual(self.router.db_for_read(TaskModel), "default")
+        self.assertTrue(reads_from_replica())
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_without_replicas(self):
+        read_from_replica(True)
+        self.assertEqual(self.router.db_for_read(TaskModel), "default")
+
+    def test_middleware(self):
+        self.assertTrue(self.route("GET"))
+        self.assertFalse(reads_from_replica())
+        self.assertFalse(self.route("POST"))
+
+    def test_jwt_user_reads_own_writes(self):
+        authorization = {"HTTP_AUTHORIZATION": f"Bearer {AccessToken.for_user(self.user)}"}
+        self.assertTrue(self.route("GET", **authorization))
+
+        self.route("POST", user=self.user, **authorization)
+
+        self.assertFalse(self.route("GET", **authorization))
+        self.assertTrue(self.route("GET"))
+
+
+@skipUnless("replica" in settings.DATABASES, "run with --settings=tasktracker.settings_replica")
+class ReplicaDatabaseTestCase(TestCase):
+    """
+    Primary and replica are separate SQLite files, which are never synchronized
+    """
+
+    databases = "__all__"
+
+    def setUp(self) -> None:
+        cache.clear()
+        initiators.initial_test_conditions(self)
+        # replica has the user, but lags behind with the tasks
+        User.objects.using("replica").create(id=self.user1.id, username=self.user1.username,
+                                             password=self.user1.password)
+        self.client.force_login(self.user1)
+
+    def task_titles(self):
+        response = self.client.get(reverse_lazy("index"))
+        return [task.title for task in response.context_data["object_list"]]
+
+    def test_jwt_client_reads_own_writes(self):
+        self.client.logout()
+        authorization = {"HTTP_AUTHORIZATION": f"Bearer {AccessToken.for_user(self.user1)}"}
+        self.assertEqual(self.client.get(reverse_lazy("task-api-list"), **authorization).data["results"], [])
+
+        self.client.post(reverse_lazy("task-api-list"), data={"title": "new task", "description": "description",
+                                                              "status": initiators.DEFAULT_STATUS}, **authorization)
+
+        response = self.client.get(reverse_lazy("task-api-list"), **authorization)
+        self.assertIn("new task", [task["title"] for task in response.data["results"]])
+
+    def test_cached_list_is_read_from_primary(self):
+        TaskModel.objects.create(title="new task", description="description", owner=self.user1,
+                                 status=initiators.DEFAULT_STATUS)
+
+        self.assertIn("new task", self.task_titles())
@@ -0,0 +1,146 @@
+from django.contrib.auth.models import Group
+from django.urls import reverse
+from rest_framework.test import APITestCase
+
+from chat import urls as chat_urls
+from chat.models import ChatRoomModel
+from tasktracker import urls as project_urls
+from trackerapp import urls as trackerapp_urls
+from trackerapp.models import UserProfile, Message, Attachment
+from trackerapp.tests import initiators
+from trackerapp.tests.query_budget import QueryBudgetMixin, get_url_names, seed_related_rows
+
+
+def task(self):
+    return {"pk": self.task1.pk}
+
+
+def message(self):
+    return {"pk": self.message.pk}
+
+
+def attachment(self):
+    return {"pk": self.attachment.pk}
+
+
+def room(self):
+    return {"pk": self.room.pk}
+
+
+def profile(self):
+    return {"pk": self.profile.pk}
+
+
+def group(self):
+    return {"pk": self.group.pk}
+
+
+# url name -> (url kwargs factory, max query count)
+ENDPOINTS = {
+    # trackerapp.urls
+    "index": (None, 6),
+    "sign-up": (None, 2),
+    "assigned-tasks": (None, 6),
+    "create-task": (None, 4),
+    "task-detail": (task, 13),
+    "delete-task": (task, 6),
+    "update-task": (task, 7),
+    "update-task-status": (task, 8),
+    "comment-list": (task, 9),
+    "message-create": (task, 3),
+    "attach-list": (task, 9),
+    "attach-create": (task, 3),
+    "task-history-list": (task, 10),
+    "user-profile-detail": (None, 5),
+    "user-profile-update": (None, 6),
+    "user-profile-create": (None, 3),
+    "comment-detail": (message, 14),
+    "message-delete": (message, 6),
+    "message-update": (message, 6),
+    "attach-detail": (attachment, 15),
+    "attach-update": (attachment, 6),
+    "attach-delete": (attachment, 6),
+
+    # chat.urls
+    "room-list": (None, 7),
+    "create-room": (None, 4),
+    "chat-room": (room, 9),
+    "delete-room": (room, 6),
+    "update-room": (room, 8),
+    "room-history": (room, 7),
+
+    # REST API
+    "api-root": (None, 0),
+    "profile-api-list": (None, 3),
+    "profile-api-detail": (profile, 2),
+    "group-api-list": (None, 2),
+    "group-api-detail": (group, 3),
+    "task-api-list": (None, 2),
+    "task-api-detail": (task, 3),
+    "task-api-stats": (None, 1),
+    "message-api-list": (None, 2),
+    "message-api-detail": (message, 6),
+    "attachment-api-list": (None, 2),
+    "attachment-api-detail": (attachment, 5),
+    "task-attachment-list-api": (task, 4),
+    "task-message-list-api": (task, 4),
+    "task-history-list-api": (task, 2),
+    "throttle-metrics-api": (None, 0),
+}
+
+# url name -> response status, other endpoints must answer 200
+EXPECTED_STATUS = {
+    # user1 already has a profile, so creation page redirects to it
+    "user-profile-create": 302,
+}
+
+# named urls of REST API, that are not part of router
+EXTRA_API_URL_NAMES = {"task-attachment-list-api", "task-message-list-api", "task-history-list-api",
+                       "throttle-metrics-api"}
+
+
+class EndpointQueryBudgetTestCase(QueryBudgetMixin, APITestCase):
+    """
+    One test per named url (generated below), each checks the url's query budget
+    and that query count does not grow with count of related rows
+    """
+
+    def setUp(self) -> None:
+        initiators.initial_test_conditions(self)
+        # throttle metrics are shown to staff only
+        self.user1.is_staff = True
+        self.user1.save()
+        self.profile = UserProfile.objects.create(owner=self.user1)
+        self.group = Group.objects.create(name="budget group")
+        self.room = ChatRoomModel.objects.create(name="budget room", owner=self.user1)
+        self.message = Message.objects.create(task=self.task1, body="test message", owner=self.user1)
+        self.attachment = Attachment.objects.create(task=self.task1, description="test attachment",
+                                                    file="attachments/test.jpg", owner=self.user1)
+        initiators.set_credentials(self, initiators.USER1_CREDENTIALS)
+        # API's user is loaded once and then taken from the cache (watch trackerapp/api/authentication.py)
+        self.client.get(reverse("api-root"))
+
+    def check_endpoint(self, url_name):
+        kwargs_factory, budget = ENDPOINTS[url_name]
+        kwargs = kwargs_factory(self) if kwargs_factory else {}
+        url = reverse(url_name, kwargs=kwargs)
+        self.assertQueryCountDoesNotGrow(url, lambda count: seed_related_rows(self, count), budget,
+                                         EXPECTED_STATUS.get(url_name, 200))
+
+    def test_all_endpoints_have_budget(self):
+        url_names = get_url_names(trackerapp_urls.urlpatterns) | get_url_names(chat_urls.urlpatterns) | \
+                    get_url_names(project_urls.router.urls) | EXTRA_API_URL_NAMES
+
+        self.assertSetEqual(url_names - set(ENDPOINTS), set(), "Declare query budget for new urls")
+
+
+def make_endpoint_test(url_name):
+    def test(self):
+        self.check_endpoint(url_name)
+
+    return test
+
+
+for endpoint_name in ENDPOINTS:
+    setattr(EndpointQueryBudgetTestCase, "test_{}_query_budget".format(endpoint_name.replace("-", "_")),
+            make_endpoint_test(endpoint_name))
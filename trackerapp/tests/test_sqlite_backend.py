@@ -0,0 +1,63 @@
+import os
+import sqlite3
+import tempfile
+
+from django.db.utils import load_backend
+from django.test import SimpleTestCase
+
+from trackerapp.management.commands.db_stress import STOCK_ENGINE, TUNED_ENGINE, open_connection, stress
+
+
+class SqliteBackendTestCase(SimpleTestCase):
+    def setUp(self) -> None:
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "test.sqlite3")
+
+    def write_while_reading(self, engine):
+        reader = open_connection(engine, self.path, busy_timeout=50)
+        writer = open_connection(engine, self.path, busy_timeout=50)
+        self.addCleanup(reader.close)
+        self.addCleanup(writer.close)
+        writer.execute("CREATE TABLE item (id INTEGER PRIMARY KEY)")
+
+        reader.execute("BEGIN")
+        reader.execute("SELECT COUNT(*) FROM item").fetchone()
+        writer.execute("BEGIN IMMEDIATE")
+        writer.execute("INSERT INTO item DEFAULT VALUES")
+        writer.execute("COMMIT")
+
+    def test_pragmas(self):
+        connection = open_connection(TUNED_ENGINE, self.path, busy_timeout=1234)
+        self.addCleanup(connection.close)
+
+        self.assertEqual(connection.execute("PRAGMA journal_mode").fetchone()[0], "wal")
+        self.assertEqual(connection.execute("PRAGMA busy_timeout").fetchone()[0], 1234)
+        self.assertEqual(connection.execute("PRAGMA synchronous").fetchone()[0], 1)  # NORMAL
+
+    def test_settings_are_not_changed(self):
+        options = {"timeout": 1, "pragmas": {"busy_timeout": 10}}
+        wrapper = load_backend(TUNED_ENGINE).DatabaseWrapper({
+            "ENGINE": TUNED_ENGINE, "NAME": self.path, "OPTIONS": options,
+            "TIME_ZONE": None, "AUTOCOMMIT": True, "ATOMIC_REQUESTS": False, "CONN_MAX_AGE": 0,
+        })
+
+        params = wrapper.get_connection_params()
+
+        self.assertNotIn("pragmas", params)
+        self.assertIs(wrapper.settings_dict["OPTIONS"], options)
+        self.assertEqual(options["pragmas"], {"busy_timeout": 10})
+
+    def test_stock_backend_locks_writer_out(self):
+        with self.assertRaisesMessage(sqlite3.OperationalError, "database is locked"):
+            self.write_while_reading(STOCK_ENGINE)
+
+    def test_tuned_backend_writes_while_reading(self):
+        self.write_while_reading(TUNED_ENGINE)
+
+    def test_stress_without_lock_errors(self):
+        result = stress(TUNED_ENGINE, self.path, writers=3, readers=3, seconds=0.5)
+
+        self.assertEqual(result["locked"], 0)
+        self.assertGreater(result["writes"], 0)
+        self.assertGreater(result["reads"], 0)
@@ -0,0 +1,85 @@
+import json
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase
+from simple_history.utils import get_history_model_for_model
+
+from chat.models import ChatRoomModel, ChatMessageModel, RoomReadMarker
+from trackerapp.models import TaskModel, Message, Attachment, TaskStats
+
+
+class SeedBenchmarkTestCase(TestCase):
+    def seed(self, **options):
+        call_command("seed_benchmark", stdout=StringIO(), seed=1, **options)
+
+    def test_seed_counts(self):
+        self.seed(users=4, tasks=10, messages=30, attachments=5, history=7, rooms=3, chat_messages=20, batch_size=4)
+
+        self.assertEqual(User.objects.count(), 4)
+        self.assertEqual(TaskModel.objects.count(), 10)
+        self.assertEqual(Message.objects.count(), 30)
+        self.assertEqual(Attachment.objects.count(), 5)
+        self.assertEqual(get_history_model_for_model(TaskModel).objects.count(), 10 + 7)
+        self.assertEqual(ChatRoomModel.objects.count(), 3)
+        self.assertEqual(ChatRoomModel.member.through.objects.count(), 3 * 3)
+        self.assertEqual(ChatMessageModel.objects.count(), 20)
+
+    def test_seed_keeps_denormalized_counters(self):
+        self.seed(users=3, tasks=5, messages=20, attachments=10, history=0, rooms=0, chat_messages=0)
+
+        self.assertEqual(sum(TaskStats.objects.values_list("owned_count", flat=True)), 5)
+        for task in TaskModel.objects.all():
+            self.assertEqual(task.message_count, task.message_set.count())
+            self.assertEqual(task.attachment_count, task.attachment_set.count())
+
+    def test_seed_sets_rooms_last_message(self):
+        self.seed(users=3, tasks=0, messages=0, attachments=0, history=0, rooms=3, chat_messages=20)
+
+        for room in ChatRoomModel.objects.all():
+            last = room.chatmessagemodel_set.order_by("-creation_date", "-id").first()
+            self.assertEqual(room.last_message_at, last.creation_date if last else None)
+            self.assertEqual(room.last_message_preview, last.body if last else "")
+
+    def test_seed_creates_read_markers(self):
+        self.seed(users=3, tasks=0, messages=0, attachments=0, history=0, rooms=3, chat_messages=20)
+
+        for room in ChatRoomModel.objects.all():
+            followers = {room.owner_id} | set(room.member.values_list("id", flat=True))
+            markers = dict(room.read_markers.values_list("user_id", "unread_count"))
+            self.assertEqual(set(markers), followers)
+            for user_id, count in markers.items():
+                self.assertEqual(count, room.chatmessagemodel_set.exclude(owner_id=user_id).count())
+
+    def test_seed_twice(self):
+        self.seed(users=2, tasks=1, messages=0, attachments=0, history=0, rooms=2, chat_messages=0)
+        self.seed(users=2, tasks=1, messages=0, attachments=0, history=0, rooms=2, chat_messages=0)
+
+        self.assertEqual(User.objects.count(), 4)
+        self.assertEqual(ChatRoomModel.objects.count(), 4)
+
+
+class BenchTestCase(TestCase):
+    def setUp(self) -> None:
+        call_command("seed_benchmark", stdout=StringIO(), seed=1, users=2, tasks=4, messages=8, attachments=2,
+                     history=2, rooms=2, chat_messages=4)
+
+    def test_bench_report(self):
+        out = StringIO()
+        call_command("bench", stdout=out, stderr=StringIO(), requests=3, warmup=0, label="test")
+        report = json.loads(out.getvalue())
+
+        self.assertEqual(report["label"], "test")
+        self.assertIn("api-task-detail", report["endpoints"])
+        for endpoint, summary in report["endpoints"].items():
+            self.assertEqual(summary["requests"], 3)
+            self.assertEqual(list(summary["statuses"]), ["200"], endpoint)
+            self.assertLessEqual(summary["latency_ms_p50"], summary["latency_ms_p99"])
+            self.assertGreater(summary["queries"], 0)
+
+    def test_bench_selected_endpoints(self):
+        out = StringIO()
+        call_command("bench", stdout=out, requests=1, warmup=0, endpoint=["task-list", "api-task-list"])
+
+        self.assertEqual(set(json.loads(out.getvalue())["endpoints"]), {"task-list", "api-task-list"})
@@ -0,0 +1,87 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from trackerapp.history_retention import compact_history
+from trackerapp.models import TaskModel, HistoryArchive
+from trackerapp.tests import initiators
+
+HistoricalTaskModel = TaskModel.history.model
+
+
+class HistoryRetentionTestCase(TestCase):
+    def setUp(self) -> None:
+        initiators.initial_test_conditions(self)
+        # creation record of each task is followed by the change record of initiators' second save
+        HistoricalTaskModel.objects.all().delete()
+
+    def edit(self, task, user, description, minutes_ago):
+        task.description = description
+        task._history_user = user
+        task.save()
+        HistoricalTaskModel.objects.filter(history_id=task.history.latest().history_id).update(
+            history_date=timezone.now() - timedelta(minutes=minutes_ago))
+
+    def descriptions(self, task):
+        return list(HistoricalTaskModel.objects.filter(id=task.id).order_by("history_date")
+                    .values_list("description", flat=True))
+
+    def test_coalesce_consecutive_edits_of_user(self):
+        self.edit(self.task1, self.user1, "first", 30)
+        self.edit(self.task1, self.user1, "second", 28)
+        self.edit(self.task1, self.user1, "third", 25)
+        self.edit(self.task1, self.user2, "by another user", 24)
+        self.edit(self.task1, self.user2, "after window", 5)
+
+        report = compact_history(models=["task"], window_minutes=10, archive_days=None)
+
+        self.assertEqual(report, [{"model": "task", "records": 5, "coalesced": 2, "archived": 0}])
+        self.assertEqual(self.descriptions(self.task1), ["third", "by another user", "after window"])
+
+    def test_coalesce_doesnt_merge_objects(self):
+        self.edit(self.task1, self.user1, "task1", 3)
+        self.edit(self.task2, self.user1, "task2", 2)
+
+        compact_history(models=["task"], window_minutes=10, archive_days=None)
+
+        self.assertEqual(self.descriptions(self.task1), ["task1"])
+        self.assertEqual(self.descriptions(self.task2), ["task2"])
+
+    def test_archive_old_records(self):
+        self.edit(self.task1, self.user1, "old", 60 * 24 * 40)
+        self.edit(self.task1, self.user2, "older", 60 * 24 * 50)
+        self.edit(self.task1, self.user1, "recent", 5)
+
+        report = compact_history(models=["task"], window_minutes=None, archive_days=30)
+
+        self.assertEqual(report[0]["archived"], 2)
+        self.assertEqual(self.descriptions(self.task1), ["recent"])
+        archive = HistoryArchive.objects.get()
+        self.assertEqual((archive.model_label, archive.object_id, archive.record_count),
+                         ("trackerapp.TaskModel", self.task1.id, 2))
+        self.assertEqual([record["description"] for record in archive.get_records()], ["older", "old"])
+
+    def test_archive_deleted_with_object(self):
+        self.edit(self.task1, self.user1, "old", 60 * 24 * 40)
+        compact_history(models=["task"], window_minutes=None, archive_days=30)
+
+        self.task1.delete()
+
+        self.assertFalse(HistoryArchive.objects.exists())
+
+    def test_dry_run(self):
+        self.edit(self.task1, self.user1, "first", 60 * 24 * 40 + 2)
+        self.edit(self.task1, self.user1, "second", 60 * 24 * 40)
+        self.edit(self.task1, self.user1, "recent", 5)
+        out = StringIO()
+
+        call_command("compact_history", "--dry-run", "--model=task", "--window-minutes=10", "--archive-days=30",
+                     stdout=out)
+
+        self.assertIn("Dry run", out.getvalue())
+        self.assertEqual(out.getvalue().splitlines()[-1].split(), ["task", "3", "1", "1", "1"])
+        self.assertEqual(HistoricalTaskModel.objects.count(), 3)
+        self.assertFalse(HistoryArchive.objects.exists())
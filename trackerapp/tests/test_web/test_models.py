@@ -2,8 +2,11 @@ import os
 from datetime import date
 
 from django.contrib.auth.models import User
+from django.db import connection
 from django.test import TestCase
 from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse_lazy
 
 from tasktracker import settings
 from trackerapp.models import UserProfile, TaskModel, Message, Attachment
@@ -104,3 +107,115 @@ class AttachmentTestCase(TestCase):
 
     def test_get_assignee(self):
         self.assertEqual(Attachment.objects.get(id=1).get_assignee(), User.objects.get(email__exact=ASSIGNEE_EMAIL))
+
+
+class TaskActivityCountersTestCase(TestCase):
+    @override_settings(MEDIA_ROOT=TEST_MEDIA_PATH)
+    def setUp(self) -> None:
+        create_models()
+        self.task = TaskModel.objects.get(id=1)
+
+    def test_counters_on_create(self):
+        self.assertEqual(self.task.message_count, 1)
+        self.assertEqual(self.task.attachment_count, 1)
+        self.assertEqual(self.task.last_activity_at, Attachment.objects.get(id=1).creation_date)
+
+    def test_counters_on_delete(self):
+        Message.objects.get(id=1).delete()
+        self.assertEqual(TaskModel.objects.get(id=1).message_count, 0)
+
+    def test_counters_on_task_change(self):
+        other_task = TaskModel.objects.create(title="other task", owner=self.task.owner, assignee=self.task.owner)
+        attachment = Attachment.objects.get(id=1)
+
+        for item in (Message.objects.get(id=1), attachment):
+            item.task = other_task
+            item.save()
+
+        task = TaskModel.objects.get(id=1)
+        other_task = TaskModel.objects.get(pk=other_task.pk)
+        self.assertEqual((task.message_count, task.attachment_count, task.last_activity_at), (0, 0, None))
+        self.assertEqual((other_task.message_count, other_task.attachment_count), (1, 1))
+        self.assertEqual(other_task.last_activity_at, attachment.creation_date)
+
+    def test_task_save_keeps_counters(self):
+        stale_task = TaskModel.objects.get(id=1)
+        Message.objects.create(body="one more message", owner=stale_task.owner, task=stale_task)
+
+        stale_task.title = "new title"
+        stale_task.save()
+
+        task = TaskModel.objects.get(id=1)
+        self.assertEqual(task.title, "new title")
+        self.assertEqual(task.message_count, 2)
+
+    def test_counters_do_not_create_history(self):
+        history_count = self.task.history.count()
+        Message.objects.create(body="one more message", owner=self.task.owner, task=self.task)
+        self.assertEqual(self.task.history.count(), history_count)
+
+    def test_detail_page_without_count_query(self):
+        self.client.force_login(self.task.owner)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse_lazy("task-detail", kwargs={"pk": self.task.pk}))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context_data["paginator"].count, 1)
+        self.assertFalse([query for query in queries if "COUNT(" in query["sql"]])
+
+
+class ChangeTrackingTestCase(TestCase):
+    @override_settings(MEDIA_ROOT=TEST_MEDIA_PATH)
+    def setUp(self) -> None:
+        create_models()
+        self.task = TaskModel.objects.get(id=1)
+
+    def test_unchanged_save_is_skipped(self):
+        history_count = self.task.history.count()
+
+        with CaptureQueriesContext(connection) as queries:
+            self.task.save()
+            Attachment.objects.get(id=1).save()
+
+        self.assertEqual(len(queries), 1)  # loading of attachment only
+        self.assertEqual(self.task.history.count(), history_count)
+
+    def test_changed_fields_only_are_updated(self):
+        self.task.status = "completed"
+
+        with CaptureQueriesContext(connection) as queries:
+            self.task.save()
+
+        update = [query["sql"] for query in queries if query["sql"].startswith("UPDATE")][0]
+        self.assertIn('"status"', update)
+        self.assertNotIn('"title"', update)
+        self.assertEqual(TaskModel.objects.get(id=1).status, "completed")
+        self.assertEqual(self.task.history.first().status, "completed")
+
+    def test_save_after_save_is_skipped(self):
+        self.task.title = "new title"
+        self.task.save()
+        history_count = self.task.history.count()
+
+        self.task.save()
+
+        self.assertEqual(self.task.history.count(), history_count)
+
+    def test_save_of_deleted_row_inserts_it(self):
+        TaskModel.objects.filter(id=1).delete()
+        self.task.title = "new title"
+
+        self.task.save()
+
+        self.assertEqual(TaskModel.objects.get(id=1).title, "new title")
+
+    def test_status_update_view_without_changes(self):
+        self.client.force_login(self.task.owner)
+        history_count = self.task.history.count()
+
+        response = self.client.post(reverse_lazy("update-task-status", kwargs={"pk": self.task.pk}),
+                                    data={"status": self.task.status})
+
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.task.history.count(), history_count)
@@ -0,0 +1,90 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse_lazy
+
+from trackerapp.models import TaskModel, Message
+from trackerapp.tests import initiators
+
+
+class TaskListCacheTestCase(TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        initiators.initial_test_conditions(self)
+        self.client.force_login(self.user1)
+
+    def get(self, url_name, **params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse_lazy(url_name), params)
+        self.assertEqual(response.status_code, 200)
+        task_queries = [query for query in queries if 'FROM "trackerapp_taskmodel"' in query["sql"]]
+        return response, task_queries
+
+    def test_repeat_view_is_served_from_cache(self):
+        first_response, first_queries = self.get("index")
+        response, queries = self.get("index")
+
+        self.assertTrue(first_queries)
+        self.assertEqual(queries, [])
+        self.assertEqual(response.content, first_response.content)
+        self.assertEqual(list(response.context_data["object_list"]), [self.task1])
+
+    def test_filter_parameters_are_cached_separately(self):
+        self.get("index")
+
+        response, queries = self.get("index", status="completed")
+
+        self.assertTrue(queries)
+        self.assertEqual(list(response.context_data["object_list"]), [])
+
+    def test_task_change_invalidates_owner_and_assignee_lists(self):
+        self.get("index")
+        self.client.force_login(self.user2)
+        self.get("assigned-tasks")
+
+        self.task1.title = "new title"
+        self.task1.save()
+
+        response, queries = self.get("assigned-tasks")
+        self.assertTrue(queries)
+        self.assertContains(response, "new title")
+        self.client.force_login(self.user1)
+        response, queries = self.get("index")
+        self.assertContains(response, "new title")
+
+    def test_previous_assignee_list_is_invalidated(self):
+        self.client.force_login(self.user2)
+        self.get("assigned-tasks")
+
+        task = TaskModel.objects.get(pk=self.task1.pk)
+        task.assignee = self.hacker
+        task.save()
+
+        response, _ = self.get("assigned-tasks")
+        self.assertNotContains(response, self.task1.title)
+
+    def test_task_delete_invalidates_list(self):
+        self.get("index")
+
+        self.task1.delete()
+
+        response, _ = self.get("index")
+        self.assertEqual(list(response.context_data["object_list"]), [])
+
+    def test_new_message_invalidates_counters(self):
+        self.get("index")
+
+        Message.objects.create(body="message", owner=self.user2, task=self.task1)
+
+        response, queries = self.get("index")
+        self.assertTrue(queries)
+        self.assertEqual(response.context_data["object_list"][0].message_count, 1)
+
+    def test_other_users_lists_stay_cached(self):
+        self.get("index")
+
+        initiators.get_item(TaskModel, None, "other task", self.user2, self.hacker, None, initiators.DEFAULT_STATUS)
+
+        _, queries = self.get("index")
+        self.assertEqual(queries, [])
@@ -0,0 +1,85 @@
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.db.models import QuerySet
+from django.test import TestCase
+from django.urls import reverse_lazy
+
+from trackerapp import task_list_cache
+from trackerapp.models import TaskModel, TaskStats
+from trackerapp.tests import initiators
+
+
+class TaskStatsTestCase(TestCase):
+    def setUp(self) -> None:
+        initiators.initial_test_conditions(self)
+
+    def assertStats(self, user, status, owned, assigned):
+        counts = TaskStats.objects.summary(user)[status]
+        self.assertEqual(counts, {'owned': owned, 'assigned': assigned})
+
+    def test_stats_on_create(self):
+        self.assertStats(self.user1, initiators.DEFAULT_STATUS, 1, 1)
+        self.assertStats(self.user2, initiators.DEFAULT_STATUS, 1, 1)
+        self.assertStats(self.hacker, initiators.DEFAULT_STATUS, 0, 0)
+
+    def test_stats_on_status_update_view(self):
+        self.client.login(username=self.user2.username, password=initiators.USER2_CREDENTIALS[1])
+        self.client.post(reverse_lazy("update-task-status", kwargs={'pk': self.task1.pk}), data={'status': 'completed'})
+
+        self.assertStats(self.user1, initiators.DEFAULT_STATUS, 0, 1)
+        self.assertStats(self.user1, 'completed', 1, 0)
+        self.assertStats(self.user2, initiators.DEFAULT_STATUS, 1, 0)
+        self.assertStats(self.user2, 'completed', 0, 1)
+
+    def test_stats_on_reassign_and_delete(self):
+        self.task1.assignee = self.hacker
+        self.task1.save()
+        self.assertStats(self.user2, initiators.DEFAULT_STATUS, 1, 0)
+        self.assertStats(self.hacker, initiators.DEFAULT_STATUS, 0, 1)
+
+        self.task1.delete()
+        self.assertStats(self.user1, initiators.DEFAULT_STATUS, 0, 1)
+        self.assertStats(self.hacker, initiators.DEFAULT_STATUS, 0, 0)
+
+    def test_rebuild_command(self):
+        TaskModel.objects.filter(pk=self.task1.pk).update(status='in work')
+        call_command('rebuild_task_stats', stdout=StringIO())
+
+        self.assertStats(self.user1, initiators.DEFAULT_STATUS, 0, 1)
+        self.assertStats(self.user1, 'in work', 1, 0)
+        self.assertStats(self.user2, 'in work', 0, 1)
+
+    def test_concurrent_first_increment(self):
+        # the row is created by another request right after the first update has found nothing
+        TaskStats.objects.create(user=self.hacker, status='completed', owned_count=1)
+        update = QuerySet.update
+        calls = []
+
+        def update_before_concurrent_create(queryset, **kwargs):
+            calls.append(kwargs)
+            return 0 if len(calls) == 1 else update(queryset, **kwargs)
+
+        with mock.patch.object(QuerySet, 'update', update_before_concurrent_create):
+            TaskStats.objects.increment(self.hacker.id, 'completed', owned=1)
+
+        self.assertStats(self.hacker, 'completed', 2, 0)
+
+    def test_rebuild_invalidates_task_lists(self):
+        version = task_list_cache.get_version(self.user1.id)
+
+        # TestCase's transaction is never committed
+        with mock.patch('trackerapp.models.transaction.on_commit', lambda callback: callback()):
+            call_command('rebuild_task_stats', stdout=StringIO())
+
+        self.assertNotEqual(task_list_cache.get_version(self.user1.id), version)
+
+    def test_summary_panel_in_task_list(self):
+        self.client.login(username=self.user1.username, password=initiators.USER1_CREDENTIALS[1])
+
+        for url in (reverse_lazy("index"), reverse_lazy("assigned-tasks")):
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.context_data['task_stats'][initiators.DEFAULT_STATUS],
+                             {'owned': 1, 'assigned': 1})
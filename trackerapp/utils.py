@@ -1,7 +1,6 @@
 import os
 from io import BytesIO
 
-from PIL import Image
 from django.core.files import File
 from django.db.models.fields.files import ImageFieldFile
 
@@ -9,6 +8,9 @@ MAX_WIDTH, MAX_HEIGHT = 250, 250
 
 
 def resize(image: ImageFieldFile):
+    # profile picture upload only needs it (watch LAZY_PACKAGES of profiler's startup_profile command)
+    from PIL import Image
+
     width_size = MAX_WIDTH
     height_size = MAX_HEIGHT
 
@@ -12,7 +12,7 @@ from .extended_generics import (
     ExtendedCreateView,
     ExtendedUpdateView,
     ExtendedDeleteView,
-    ListInDetailView, ExtendedTaskHistoryListView, ExtendedFilterListView,
+    ListInDetailView, ExtendedTaskHistoryListView, ExtendedFilterListView, CachedTaskListMixin,
 )
 from .forms import (
     UserProfileEditionForm,
@@ -27,7 +27,7 @@ from .permissions import (
 ITEMS_ON_PAGE = 5
 
 
-class TaskListView(LoginRequiredMixin, ExtendedFilterListView):
+class TaskListView(LoginRequiredMixin, CachedTaskListMixin, ExtendedFilterListView):
     """
     ListView of created by user tasks, contains form to filter tasks
     """
@@ -36,6 +36,7 @@ class TaskListView(LoginRequiredMixin, ExtendedFilterListView):
     filterset_class = filters.TaskFilter
     paginate_by = ITEMS_ON_PAGE
     template_name = "trackerapp/taskmodel_list.html"
+    cache_kind = "owned"
 
     def get_queryset(self):
         tasklist = self.model.objects.filter(owner=self.request.user)
@@ -43,7 +44,7 @@ class TaskListView(LoginRequiredMixin, ExtendedFilterListView):
         return filtered_list.qs
 
 
-class AssigneeTaskListView(LoginRequiredMixin, ExtendedFilterListView):
+class AssigneeTaskListView(LoginRequiredMixin, CachedTaskListMixin, ExtendedFilterListView):
     """
     ListView of assigned to user tasks, contains form to filter tasks
     """
@@ -53,6 +54,7 @@ class AssigneeTaskListView(LoginRequiredMixin, ExtendedFilterListView):
     context_object_name = "assigned_tasks"
     template_name = "trackerapp/assigned_list.html"
     paginate_by = ITEMS_ON_PAGE
+    cache_kind = "assigned"
 
     def get_queryset(self):
         tasklist = self.model.objects.filter(assignee=self.request.user)
@@ -63,11 +65,12 @@ class AssigneeTaskListView(LoginRequiredMixin, ExtendedFilterListView):
 class TaskDetail(IsTaskOwnerOrAssignee, ListInDetailView):
     model = permission_model = TaskModel
     defaultModel = Message
+    precount_field = "message_count"
 
-    # Add attachment list to context
+    # Add attachment list to context, the full list is available on the attachment list page
     def get_context_data(self, **kwargs):
         context_data = super().get_context_data(**kwargs)
-        context_data['attachment_list'] = Attachment.objects.filter(task=self.get_object())
+        context_data['attachment_list'] = Attachment.objects.filter(task=self.object)[:ITEMS_ON_PAGE]
         return context_data
 
 
@@ -135,7 +138,7 @@ class MessageListView(IsTaskOwnerOrAssignee, ExtendedFilterListView):
             Q(task_id__exact=self.kwargs.get("pk")),
             Q(task__owner__exact=self.request.user)
             | Q(task__assignee__exact=self.request.user),
-        ).order_by("creation_date")
+        ).select_related("owner").order_by("creation_date")
 
         filtered_list = filters.MessageDateFilter(self.request.GET, queryset=message_list)
         return filtered_list.qs
@@ -198,7 +201,7 @@ class AttachmentList(IsTaskOwnerOrAssignee, ExtendedFilterListView):
             Q(task_id__exact=self.kwargs.get("pk")),
             Q(task__owner__exact=self.request.user)
             | Q(task__assignee__exact=self.request.user),
-        ).order_by("creation_date")
+        ).select_related("owner").order_by("creation_date")
 
         filtered_list = filters.AttachmentDateFilter(self.request.GET, queryset=attachment_list)
         return filtered_list.qs